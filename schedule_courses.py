@@ -1,45 +1,69 @@
 import argparse
 import os
-import pandas as pd
-from typing import Dict, List
-import yaml  # type: ignore[import]
-import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
 
 from src.constants import (
     CONFIG_FOLDER,
-    CS_AI_PROGRAM_FILE,
     DEPARTMENT_REQUIREMENT,
     INDEX_QUARTER,
 )
 from src.courses_deterministic import CoursesDeterministic
-from src.course import Course, ExploreCourse
-from src.search_problem import FindCourses, UniformCostSearch
-from src.csp import SchedulingCSPConstructor, BacktrackingSearch
-from src.program_requirements.cs_ai_program import CSAIProgram
-
-
-def get_course_id_to_name(courses_by_quarter):
-    course_id_to_name = {}
-    for _, courses in courses_by_quarter.items():
-        for course in courses:
-            course_id = f"{course.course_subject} {course.course_number}"
-            course_id_to_name[course_id] = course.course_name
-    return course_id_to_name
-
-
-def get_one_unit_seminar_courses(courses_by_quarter):
-    seminars = {}
-    for quarter_index, courses in courses_by_quarter.items():
-        seminars[quarter_index] = []
-        for course in courses:
-            course_id = f"{course.course_subject} {course.course_number}"
-            if (
-                CSAIProgram._is_seminar_course(course_id)
-                and course.units[0] >= 1
-                and course.units[0] <= 2
-            ):
-                seminars[quarter_index].append(course)
-    return seminars
+from src.course import ExploreCourse
+
+# pandas, yaml and the search/CSP modules are imported by the model that uses them, so that
+# startup and course loading don't pay for them
+
+
+def make_csp_cache(directory: Optional[str]):
+    """
+    Returns a CSPCache in the directory, or None if no directory is given.
+    """
+    if directory is None:
+        return None
+    from src.csp_cache import CSPCache
+
+    return CSPCache(directory)
+
+
+def make_solution_cache(directory: Optional[str]):
+    """
+    Returns a SolutionCache that persists to the directory, or None if no directory is given.
+    """
+    if directory is None:
+        return None
+    from src.solution_cache import SolutionCache
+
+    return SolutionCache(directory)
+
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def print_progress(event: Dict[str, Any]) -> None:
+    """
+    Print a progress event of the CSP search over the previous one on stderr, see
+    BacktrackingSearch.report_progress.
+    """
+    eta = "?" if event["eta"] is None else format_seconds(event["eta"])
+    weight = "none" if event["incumbent_weight"] is None else event["incumbent_weight"]
+    max_depth = max(
+        depth for depth, count in enumerate(event["depth_histogram"]) if count > 0
+    )
+    line = (
+        f"CSP search: {format_seconds(event['elapsed'])}, {event['nodes']:,} nodes "
+        f"({event['nodes_per_second']:,.0f}/s), depth {event['depth']} (max {max_depth}), "
+        f"{event['explored_fraction']:.2%} explored, ETA {eta}, best weight {weight}"
+    )
+    # Return to the start of the line and clear the previous event after the new one
+    sys.stderr.write(f"\r{line}\x1b[K")
+    if event["done"]:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
 
 
 def main(
@@ -52,6 +76,16 @@ def main(
     config_name: str = "profile1.yaml",
     internship: bool = True,
     verbose: int = 4,
+    search_algorithm: str = "ucs",
+    memory_cap: int = 100000,
+    num_workers: int = 0,
+    prune_dominated: bool = False,
+    offline: bool = False,
+    csp_cache: Optional[str] = None,
+    seed: Optional[int] = None,
+    solution_cache: Optional[str] = None,
+    checkpoint: Optional[str] = None,
+    progress_interval: float = 1.0,
 ):
     """
     Runs the course scheduling program.
@@ -60,12 +94,36 @@ def main(
     data_directory (str) - The local directory where course data is stored.
     program (str) - the academic year that the course is offered.
     years (List[str]) - The program years.
+    search_algorithm (str) - "ucs" for uniform cost search, "ida" for memory-bounded
+        iterative deepening search or "hda" for parallel hash-distributed search. Only used
+        by the search model.
+    memory_cap (int) - The maximum number of states the "ida" search remembers, besides its current path, to
+        skip states it reaches again. Applies with or without prune_dominated.
+    num_workers (int) - The number of "hda" worker processes. 0 uses every core.
+    prune_dominated (bool) - Drop search states whose quarter and requirement progress were already
+        reached at a lower cost. Explores fewer states, but is a heuristic that may miss the optimal schedule.
+    offline (bool) - Never connect to explorecourses. The course data of every year must already be
+        in data_directory.
+    csp_cache (str) - A directory to cache the constructed CSPs in, see src/csp_cache.py. Needs a seed.
+    seed (int) - Seed of the course rewards and of the CSP construction, so the same profile always builds
+        the same problem.
+    solution_cache (str) - A directory to cache the solutions in, see src/solution_cache.py. Needs a seed
+        to hit, as the problems are random otherwise.
+    checkpoint (str) - A file to checkpoint the CSP search or the "ucs" search to every few seconds, see
+        src/checkpoint.py. A run that was stopped resumes from it. Needs a seed, as the problems are random
+        otherwise.
+    progress_interval (float) - Seconds between updates of the progress line of the CSP search, which
+        estimates how much of the search is left. 0 or less disables it.
     """
     print(f"BEGIN Course Scheduling for program: {program} and years: {years}.")
 
     # Step 1: Load in the course data.
     course_loader = CoursesDeterministic(
-        output_dir=data_directory, departments=[program], years=years
+        output_dir=data_directory,
+        departments=[program],
+        years=years,
+        offline=offline,
+        seed=seed,
     )
     course_by_quarter = course_loader.run()
     print(f"Populated {len(course_by_quarter)} quarters.")
@@ -76,6 +134,14 @@ def main(
     # This second argument to ExploreCourse is never used; we could probably do
     # away with ExploreCourse and just pass course_by_quarter to FindCourses
     if model == "search":
+        from src.search_problem import (
+            FindCourses,
+            HashDistributedSearch,
+            IterativeDeepeningSearch,
+            UniformCostSearch,
+        )
+        from src.solution_cache import solve_search
+
         explore_course = ExploreCourse(course_by_quarter, {})
         department_requirement = DEPARTMENT_REQUIREMENT[program]
         search_problem = FindCourses(
@@ -86,13 +152,47 @@ def main(
             internship=internship,
             verbose=verbose,
         )
-        ucs = UniformCostSearch(verbose=verbose)
+        if checkpoint is not None and search_algorithm != "ucs":
+            raise Exception(f"search algorithm {search_algorithm} can't checkpoint!")
+        ucs: Union[UniformCostSearch, IterativeDeepeningSearch, HashDistributedSearch]
+        if search_algorithm == "ucs":
+            ucs = UniformCostSearch(
+                verbose=verbose,
+                prune_dominated=prune_dominated,
+                checkpoint_path=checkpoint,
+            )
+        elif search_algorithm == "ida":
+            ucs = IterativeDeepeningSearch(
+                verbose=verbose, memory_cap=memory_cap, prune_dominated=prune_dominated
+            )
+        elif search_algorithm == "hda":
+            ucs = HashDistributedSearch(
+                verbose=verbose,
+                num_workers=num_workers,
+                prune_dominated=prune_dominated,
+            )
+        else:
+            raise Exception(f"search algorithm {search_algorithm} not implemented!")
 
         # Step 3: Run UCS to get the optimal schedule.
-        print("BEGIN UCS.")
-        ucs.solve(search_problem)
+        print(f"BEGIN {search_algorithm.upper()}.")
+        cache = make_solution_cache(solution_cache)
+        if cache is not None:
+            search_options = {
+                "algorithm": search_algorithm,
+                "memory_cap": memory_cap if search_algorithm == "ida" else None,
+                "prune_dominated": prune_dominated,
+            }
+            if solve_search(ucs, search_problem, cache, search_options):
+                print("Found the solution in the solution cache.")
+        else:
+            ucs.solve(search_problem)
         found_solution = ucs.actions is not None and len(ucs.actions) > 0
-        print("END UCS. Found {} solution.".format("a" if found_solution else "no"))
+        print(
+            "END {}. Found {} solution.".format(
+                search_algorithm.upper(), "a" if found_solution else "no"
+            )
+        )
 
         # Step 4: Store and analyze the output.
         if ucs.actions is not None:
@@ -116,168 +216,37 @@ def main(
             print("END Course Scheduling.")
 
     elif model == "CSP":
+        from src.profile_solver import ProfileSolver, load_profile
+
         # Load config from yaml file
         config_filepath = os.path.join(CONFIG_FOLDER, config_name)
+        student_config = load_profile(config_filepath)
 
-        if not os.path.exists(config_filepath):
-            raise Exception(f"Invalid config path! {config_filepath} does not exist!")
-
-        with open(config_filepath, "r") as file:
-            student_config = yaml.safe_load(file)
-
-        internship = student_config["internship"]
-        breadth_to_satisfy = student_config["breadth_areas"]
-        foundations_not_satisfied = (
-            student_config["foundations_not_satisfied"]
-            if student_config["foundations_not_satisfied"]
-            else []
-        )
-        custom_requests = (
-            student_config["subject_requests"]
-            if student_config["subject_requests"]
-            else {}
-        )
-
-        if len(breadth_to_satisfy) != 2:
-            raise Exception(
-                f"Must specify 2 breadth areas! Got {len(breadth_to_satisfy)}"
-            )
-
-        if len(foundations_not_satisfied) > 2:
-            raise Exception(
-                f"Can only handle up to 2 unsatisfied foundations! Got {len(foundations_not_satisfied)}"
-            )
-
-        # Filter to courses that satisfy CS program requirements (not including electives)
-        df_requirements = pd.read_csv(CS_AI_PROGRAM_FILE)
-
-        # Remove foundations that are already satisfied
-        foundations_satisfied = {
-            "logic",
-            "probability",
-            "algorithm",
-            "organ",
-            "foundation systems",
-        } - set(foundations_not_satisfied)
-        df_requirements = df_requirements.loc[
-            ~df_requirements["Subcategory"].isin(foundations_satisfied)
-        ]
-
-        courses_by_quarter_filtered: Dict[int, List[Course]] = {}
-        requirement_courses = set(df_requirements["Course"])
-        for quarter_index, courses in course_by_quarter.items():
-            courses_by_quarter_filtered[quarter_index] = []
-
-            for course in courses:
-                course_code = f"{course.course_subject} {course.course_number}"
-                if course_code in requirement_courses:
-                    courses_by_quarter_filtered[quarter_index].append(course)
-
-        # No summer quarter after second year
-        del courses_by_quarter_filtered[8]
-
-        # Remove the summer quarter if student is doing an internship
-        if internship:
-            del courses_by_quarter_filtered[4]
-
-        natural_language_keywords = [
-            "natural language",
-            "language understanding",
-            "linguist",
-        ]
-        nlp_courses = set()
-        for quarter_index, courses in courses_by_quarter_filtered.items():
-            for course in courses:
-                for keyword in natural_language_keywords:
-                    if keyword in course.course_description.lower():
-                        nlp_courses.add(
-                            f"{course.course_subject} {course.course_number}"
-                        )
-                        break
-
-        robotics_keywords = ["robot"]
-        robotics_courses = set()
-        for quarter_index, courses in courses_by_quarter_filtered.items():
-            for course in courses:
-                for keyword in robotics_keywords:
-                    if keyword in course.course_name.lower():
-                        robotics_courses.add(
-                            f"{course.course_subject} {course.course_number}"
-                        )
-                        break
-
-        vision_keywords = ["vision", "visual"]
-        vision_courses = set()
-        for quarter_index, courses in courses_by_quarter_filtered.items():
-            for course in courses:
-                for keyword in vision_keywords:
-                    if keyword in course.course_name.lower():
-                        vision_courses.add(
-                            f"{course.course_subject} {course.course_number}"
-                        )
-                        break
-
-        health_keywords = ["disease", "health", "biomedical", "biomedin"]
-        health_courses = set()
-        for quarter_index, courses in courses_by_quarter_filtered.items():
-            for course in courses:
-                for keyword in health_keywords:
-                    if keyword in course.course_name.lower():
-                        health_courses.add(
-                            f"{course.course_subject} {course.course_number}"
-                        )
-                        break
-
-        print("START constructing CSP")
-        cspConstructor = SchedulingCSPConstructor(
-            courses_by_quarter_filtered,
-            df_requirements,
-            breadth_to_satisfy,
-            foundations_not_satisfied,
-            nlp_courses,
-            robotics_courses,
-            vision_courses,
-            health_courses,
-            custom_requests,
+        solver = ProfileSolver(
+            course_by_quarter,
+            verbose=verbose,
+            csp_cache=make_csp_cache(csp_cache),
+            seed=seed,
+            solution_cache=make_solution_cache(solution_cache),
+            progress_callback=print_progress if progress_interval > 0 else None,
+            progress_interval=progress_interval,
         )
-        csp = cspConstructor.get_csp()
-        print("FINISHED constructing CSP")
-
-        print("START solving CSP")
-        alg = BacktrackingSearch()
-        alg.solve(csp, mcv=True, ac3=True)
-        print("FINISHED solving CSP")
-
-        if len(alg.allOptimalAssignments) >= 1:
-            assignment = alg.allOptimalAssignments[0]
-            course_id_to_name = get_course_id_to_name(courses_by_quarter_filtered)
-            seminar_courses_one_unit = get_one_unit_seminar_courses(course_by_quarter)
-            seminars_taken = set()
+        result = solver.solve(student_config, checkpoint_path=checkpoint)
 
+        if result["solved"]:
             print("PRINTING course schedule...")
             print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>\n")
-            for i in range(7):
-
-                season = INDEX_QUARTER[i % len(INDEX_QUARTER)]
-                print(f"** Quarter: {i + 1}, Season: {season} **")
+            for quarter in result["schedule"]:
+                print(
+                    f"** Quarter: {quarter['quarter']}, Season: {quarter['season']} **"
+                )
 
-                quarter_schedule = assignment.get(f"Quarter {i + 1} classes")
-
-                if not quarter_schedule:
+                if not quarter["courses"]:
                     print("Taking this quarter off!")
-                else:
-                    for course in quarter_schedule:
-                        print(
-                            f"Course: {course} {course_id_to_name[course]} || Units: 4"
-                        )
-
-                    take_seminar = random.random() <= 0.5
-                    seminar_courses_quarter = seminar_courses_one_unit[i + 1]
-                    if take_seminar and len(seminar_courses_quarter) > 0:
-                        seminar = random.sample(seminar_courses_quarter, 1)[0]
-                        seminar_id = f"{seminar.course_subject} {seminar.course_number}"
-                        print(f"Course: {seminar_id} {seminar.course_name} || Units: 1")
-                        seminars_taken.add(seminar)
+                for course in quarter["courses"]:
+                    print(
+                        f"Course: {course['course']} {course['name']} || Units: {course['units']}"
+                    )
 
                 print()
 
@@ -287,11 +256,136 @@ def main(
             print("CSP is unsolvable!")
 
 
+def batch(
+    data_directory: str = "data",
+    program: str = "CS",
+    years: List[str] = ["2021-2022", "2022-2023"],
+    profiles: Optional[List[str]] = None,
+    output_directory: str = "schedules",
+    num_workers: int = 0,
+    offline: bool = False,
+    csp_cache: Optional[str] = None,
+    seed: Optional[int] = None,
+    solution_cache: Optional[str] = None,
+    **kwargs,
+):
+    """
+    Solves the CSP model for many student profiles, loading the course data, program requirements and
+    course topics once for all of them. Writes one JSON result per profile, with timings, to
+    output_directory, named by the profile path relative to the directory that holds all the profiles.
+
+    Arguments:
+    profiles (List[str]) - Profile files or directories of profile files. Defaults to the configs folder.
+    output_directory (str) - The directory the results are written to.
+    num_workers (int) - The number of worker processes. 0 uses every core.
+    csp_cache (str), seed (int), solution_cache (str) - See main.
+    """
+    from src.profile_solver import ProfileSolver, find_profiles, solve_profiles
+
+    profile_paths = find_profiles(profiles if profiles else [CONFIG_FOLDER])
+    print(f"BEGIN Batch Course Scheduling for {len(profile_paths)} profiles.")
+
+    start = time.perf_counter()
+    course_loader = CoursesDeterministic(
+        output_dir=data_directory,
+        departments=[program],
+        years=years,
+        offline=offline,
+        seed=seed,
+    )
+    solver = ProfileSolver(
+        course_loader.run(),
+        csp_cache=make_csp_cache(csp_cache),
+        seed=seed,
+        solution_cache=make_solution_cache(solution_cache),
+    )
+    print(f"Loaded shared data in {time.perf_counter() - start:.2f}s.")
+
+    results = solve_profiles(solver, profile_paths, output_directory, num_workers)
+    for result in results:
+        status = "solved" if result["solved"] else result["error"] or "unsolvable"
+        if result.get("cached"):
+            status += ", cached"
+        print(f"{result['profile']}: {status} ({result['timings']['total']:.2f}s)")
+    print(
+        f"END Batch Course Scheduling. Solved {sum(result['solved'] for result in results)}/{len(results)} "
+        f"profiles in {time.perf_counter() - start:.2f}s, results in {output_directory}."
+    )
+
+
+def serve(
+    data_directory: str = "data",
+    program: str = "CS",
+    years: List[str] = ["2021-2022", "2022-2023"],
+    num_workers: int = 0,
+    offline: bool = False,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    request_timeout: float = 60.0,
+    verbose: int = 4,
+    csp_cache: Optional[str] = None,
+    seed: Optional[int] = None,
+    solution_cache: Optional[str] = None,
+    **kwargs,
+):
+    """
+    Serves the CSP model over HTTP, keeping the course data, program requirements and course topics
+    loaded between requests. See src/schedule_server.py for the endpoints.
+
+    Arguments:
+    num_workers (int) - The number of worker processes. 0 uses every core.
+    host (str), port (int) - The address to listen on.
+    request_timeout (float) - The maximum number of seconds a request may take.
+    csp_cache (str), seed (int), solution_cache (str) - See main.
+    """
+    from src.profile_solver import ProfileSolver
+    from src.schedule_server import ScheduleServer
+
+    course_loader = CoursesDeterministic(
+        output_dir=data_directory,
+        departments=[program],
+        years=years,
+        offline=offline,
+        seed=seed,
+    )
+    solver = ProfileSolver(
+        course_loader.run(),
+        csp_cache=make_csp_cache(csp_cache),
+        seed=seed,
+        solution_cache=make_solution_cache(solution_cache),
+    )
+
+    server = ScheduleServer(
+        (host, port),
+        solver,
+        num_workers=num_workers if num_workers > 0 else os.cpu_count() or 1,
+        request_timeout=request_timeout,
+        verbose=verbose,
+    )
+    print(f"Serving course schedules on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="ScheduleCourses",
         description="Create a course schedule for a two year Stanford MS program.",
     )
+    parser.add_argument(
+        "command",
+        type=str,
+        nargs="?",
+        default="run",
+        choices=["run", "batch", "serve"],
+        help='"run" schedules a single student profile, "batch" solves the CSP model for many student '
+        'profiles (see --profiles) and "serve" solves the CSP model for profiles sent over HTTP (see --port). '
+        'Defaults to "run".',
+    )
     parser.add_argument(
         "-d",
         "--data_directory",
@@ -349,6 +443,132 @@ if __name__ == "__main__":
         default=4,
         help="Whether to run UCS in verbose mode.",
     )
+    parser.add_argument(
+        "-sa",
+        "--search_algorithm",
+        type=str,
+        default="ucs",
+        help='The search algorithm for the search model. Should be in {ucs, ida, hda}. "ida" is a '
+        'memory-bounded iterative deepening search for long horizons and "hda" a parallel hash-distributed '
+        'search. Defaults to "ucs".',
+    )
+    parser.add_argument(
+        "-mc",
+        "--memory_cap",
+        type=int,
+        default=100000,
+        help="The maximum number of states the ida search algorithm remembers, besides its current path, to "
+        "skip states it reaches again. Applies with or without --prune_dominated.",
+    )
+    parser.add_argument(
+        "-nw",
+        "--num_workers",
+        type=int,
+        default=0,
+        help="The number of worker processes for the hda search algorithm, batch and serve. Defaults to one per core.",
+    )
+    parser.add_argument(
+        "-pd",
+        "--prune_dominated",
+        action="store_true",
+        help="Drop search states whose quarter and requirement progress were already reached at a lower cost. "
+        "Explores fewer states, but is a heuristic that may miss the optimal schedule.",
+    )
+    parser.add_argument(
+        "-o",
+        "--offline",
+        action="store_true",
+        help="Never connect to explorecourses. Fails if the course data of a year is missing from the data directory.",
+    )
+    parser.add_argument(
+        "-cc",
+        "--csp_cache",
+        type=str,
+        default=None,
+        help="A directory to cache the constructed CSPs in, so a profile seen before skips the construction. "
+        "Only used with --seed.",
+    )
+    parser.add_argument(
+        "-s",
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the course rewards and of the CSP construction, so the same profile always builds the "
+        "same problem.",
+    )
+    parser.add_argument(
+        "-sc",
+        "--solution_cache",
+        type=str,
+        default=None,
+        help="A directory to cache the solutions in, so solving an unchanged problem again returns the cached "
+        "solution. Only hits with --seed, as the problems are random otherwise.",
+    )
+    parser.add_argument(
+        "-ck",
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="A file to checkpoint the CSP search or the ucs search to every few seconds. A run that was "
+        "stopped resumes from it. Only resumes with --seed, as the problems are random otherwise.",
+    )
+    parser.add_argument(
+        "-pi",
+        "--progress_interval",
+        type=float,
+        default=1.0,
+        help="Seconds between updates of the progress line of the CSP search, with the nodes per second, the "
+        "estimated fraction of the search left and its ETA. 0 disables it. Defaults to 1.",
+    )
+
+    parser.add_argument(
+        "-pf",
+        "--profiles",
+        type=str,
+        default=None,
+        help="The student profiles for batch: config files or directories of config files. Defaults to the "
+        "configs folder.",
+        nargs="+",
+    )
+    parser.add_argument(
+        "-od",
+        "--output_directory",
+        type=str,
+        default="schedules",
+        help='The directory batch writes one JSON result per profile to. Defaults to "schedules/".',
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help='The address serve listens on. Defaults to "127.0.0.1".',
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="The port serve listens on. Defaults to 8000.",
+    )
+    parser.add_argument(
+        "-rt",
+        "--request_timeout",
+        type=float,
+        default=60.0,
+        help="The maximum number of seconds serve spends on a request. Defaults to 60.",
+    )
 
-    args = parser.parse_args()
-    main(**vars(args))
+    args = vars(parser.parse_args())
+    command = args.pop("command")
+    if command != "run":
+        args.pop("checkpoint")
+        args.pop("progress_interval")
+        args.pop("prune_dominated")
+    if command == "batch":
+        batch(**args)
+    elif command == "serve":
+        serve(**args)
+    else:
+        for name in ["profiles", "output_directory", "host", "port", "request_timeout"]:
+            args.pop(name)
+        main(**args)
@@ -0,0 +1,75 @@
+import os
+import pickle
+import time
+from typing import Any, Dict, Optional
+
+from .io_util import atomic_write
+
+# Bump when the saved search state changes, so old checkpoints are never resumed
+CHECKPOINT_VERSION = 3
+
+
+class Checkpointer:
+    """
+    Saves the state of a long-running search to a file every few seconds, so that a search that was
+    stopped can resume from its last checkpoint. A checkpoint is only resumed by a search of the same
+    problem, identified by the signature the search computes from it.
+
+    Every checkpoint is written to a temporary file that replaces the previous one, so a crash during a
+    write leaves the previous checkpoint. A checkpoint of a large search state can take a while to
+    pickle, so the next one is at least 10 times its write time away, which keeps the writes under 10%
+    of the search time.
+    """
+
+    def __init__(self, path: str, signature: str, interval: float = 5.0) -> None:
+        """
+        Arguments:
+        path - the checkpoint file
+        signature - identifies the problem that is searched, eg a hash of the CSP
+        interval - the minimum number of seconds between checkpoints
+        """
+        self.path = path
+        self.signature = signature
+        self.interval = interval
+        self.num_saves = 0
+        self.next_save = time.monotonic() + interval
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the saved search state, or None if there is no checkpoint of this problem.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                checkpoint = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if (
+            checkpoint.get("version") != CHECKPOINT_VERSION
+            or checkpoint.get("signature") != self.signature
+        ):
+            return None
+        return checkpoint["state"]
+
+    def is_due(self) -> bool:
+        return time.monotonic() >= self.next_save
+
+    def save(self, state: Dict[str, Any]) -> None:
+        start = time.monotonic()
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "signature": self.signature,
+            "state": state,
+        }
+        atomic_write(
+            self.path, pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self.num_saves += 1
+        end = time.monotonic()
+        self.next_save = end + max(self.interval, 10 * (end - start))
+
+    def remove(self) -> None:
+        """
+        Remove the checkpoint once the search is done, so it isn't resumed.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 # TODO: this is an over-simplification of the degree requirements. For the next version, we need to incorporate
@@ -19,3 +19,14 @@ MAX_UNITS_PER_QUARTER = 12
 MAX_CLASS_REWARD = 5
 
 CONFIG_FOLDER = "configs"
+
+# Topics of the subject requests in the student configs: topic -> (course field, keywords)
+COURSE_TOPICS: Dict[str, Tuple[str, List[str]]] = {
+    "nlp": (
+        "course_description",
+        ["natural language", "language understanding", "linguist"],
+    ),
+    "robotics": ("course_name", ["robot"]),
+    "vision": ("course_name", ["vision", "visual"]),
+    "health": ("course_name", ["disease", "health", "biomedical", "biomedin"]),
+}
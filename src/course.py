@@ -1,9 +1,12 @@
+import sys
 from typing import Dict, Set, Tuple
 
 
 class Course:
     """_summary_
-
+    A course offering. Courses are identified by their course_id, eg "CS 221", which is interned and
+    computed once on construction, so courses hash and compare by course_id and hot paths don't have to
+    format it again. The dense integer index of a course is its row in a CourseCatalog.
 
     Args:
         reward (float): _description_
@@ -15,6 +18,19 @@ class Course:
         quarter_indices (tuple): _description_
     """
 
+    # Courses are created for every course in the catalogs, so skip the per-instance __dict__
+    __slots__ = (
+        "reward",
+        "units",
+        "course_number",
+        "course_name",
+        "course_subject",
+        "course_category",
+        "course_description",
+        "quarter_indices",
+        "course_id",
+    )
+
     def __init__(
         self,
         reward: float,
@@ -31,11 +47,24 @@ class Course:
         self.units = units
         self.course_number = course_number
         self.course_name = course_name
-        self.course_subject = course_subject
+        self.course_subject = sys.intern(course_subject)
         self.course_category = course_category
         self.course_description = course_description
         self.quarter_indices = quarter_indices
 
+        self.course_id = sys.intern(f"{course_subject} {course_number}")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Course):
+            return NotImplemented
+        return self.course_id == other.course_id
+
+    def __hash__(self) -> int:
+        return hash(self.course_id)
+
+    def __repr__(self) -> str:
+        return f"Course({self.course_id})"
+
 
 class ExploreCourse:
     def __init__(
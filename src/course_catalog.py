@@ -0,0 +1,258 @@
+import hashlib
+import json
+import numpy as np
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from .course import Course
+
+# Quarters are stored as bits of an int64 quarters_mask, bit quarter - 1 for quarter indices 1, 2, ...
+MAX_QUARTERS = 63
+
+
+def course_number_value(course_number: str) -> int:
+    """
+    Returns the numeric part of a course number, eg 224 for "224N", or 0 if it has no digits.
+    """
+    digits = "".join(filter(str.isdigit, course_number))
+    return int(digits) if digits else 0
+
+
+class CourseCatalog:
+    """
+    Struct-of-arrays store for the courses of a class database: every course is a row of parallel
+    NumPy columns, so filters on units, subjects, course numbers and quarters are vectorized. Course
+    objects are only created, once per row, when they are asked for.
+
+    Columns:
+        units_min, units_max (np.ndarray[int16]): the unit bounds of the course
+        subject_codes (np.ndarray[int16]): index of the course subject in self.subjects
+        course_number_values (np.ndarray[int32]): numeric part of the course number, eg 224 for "224N"
+        rewards (np.ndarray[float64]): the reward of the course
+        quarters_mask (np.ndarray[int64]): bit quarter - 1 is set if the course is offered in the quarter
+        course_numbers, course_names, course_categories, course_descriptions (np.ndarray[object])
+    """
+
+    def __init__(
+        self,
+        rewards: Sequence[float],
+        units_min: Sequence[int],
+        units_max: Sequence[int],
+        course_numbers: Sequence[str],
+        course_names: Sequence[str],
+        course_subjects: Sequence[str],
+        course_categories: Sequence[str],
+        course_descriptions: Sequence[str],
+        quarters_mask: Sequence[int],
+        quarter_courses: Optional[Mapping[int, Sequence[int]]] = None,
+    ) -> None:
+        """
+        Args:
+            rewards ... quarters_mask: one entry per course, see the class docstring
+            quarter_courses (Mapping[int, Sequence[int]], optional): the rows offered in every quarter, in
+                the order they should be listed. Defaults to the rows of quarters_mask in row order.
+        """
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.units_min = np.asarray(units_min, dtype=np.int16)
+        self.units_max = np.asarray(units_max, dtype=np.int16)
+        self.quarters_mask = np.asarray(quarters_mask, dtype=np.int64)
+
+        self.course_numbers = np.asarray(course_numbers, dtype=object)
+        self.course_names = np.asarray(course_names, dtype=object)
+        self.course_categories = np.asarray(course_categories, dtype=object)
+        self.course_descriptions = np.asarray(course_descriptions, dtype=object)
+        self.course_number_values = np.array(
+            [course_number_value(number) for number in course_numbers], dtype=np.int32
+        )
+
+        self.subjects: List[str] = sorted(set(course_subjects))
+        subject_index = {subject: i for i, subject in enumerate(self.subjects)}
+        self.subject_codes = np.array(
+            [subject_index[subject] for subject in course_subjects], dtype=np.int16
+        )
+
+        self.quarter_courses: Dict[int, np.ndarray] = {}
+        if quarter_courses is None:
+            for quarter in range(1, MAX_QUARTERS + 1):
+                rows = np.flatnonzero(self.quarters_mask & (1 << (quarter - 1)))
+                if len(rows) > 0:
+                    self.quarter_courses[quarter] = rows.astype(np.int64)
+        else:
+            for quarter, quarter_rows in quarter_courses.items():
+                self.quarter_courses[quarter] = np.asarray(quarter_rows, dtype=np.int64)
+
+        self._views: List[Optional[Course]] = [None] * len(self.rewards)
+        # Derived per-row data computed for the catalog, eg by TopicTagger
+        self.topic_tags: Dict[tuple, Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def from_class_database(
+        cls, class_database: Mapping[int, Iterable[Course]]
+    ) -> "CourseCatalog":
+        """
+        Build a catalog from a dict[quarter] = courses offered in the quarter, eg
+        ExploreCourse.class_database. The quarters keep the order of their courses and the Course objects
+        are reused as the views of their rows.
+        """
+        rows: Dict[Course, int] = {}
+        courses: List[Course] = []
+        quarters_mask: List[int] = []
+        quarter_courses: Dict[int, List[int]] = {}
+        for quarter, course_list in class_database.items():
+            if not 1 <= quarter <= MAX_QUARTERS:
+                raise Exception(f"Quarter {quarter} is not in [1, {MAX_QUARTERS}]!")
+
+            quarter_rows = []
+            for course in course_list:
+                row = rows.get(course)
+                if row is None:
+                    row = len(courses)
+                    rows[course] = row
+                    courses.append(course)
+                    quarters_mask.append(0)
+                quarters_mask[row] |= 1 << (quarter - 1)
+                quarter_rows.append(row)
+            quarter_courses[quarter] = quarter_rows
+
+        catalog = cls(
+            [course.reward for course in courses],
+            [course.units[0] for course in courses],
+            [course.units[1] for course in courses],
+            [course.course_number for course in courses],
+            [course.course_name for course in courses],
+            [course.course_subject for course in courses],
+            [course.course_category for course in courses],
+            [course.course_description for course in courses],
+            quarters_mask,
+            quarter_courses,
+        )
+        catalog._views = list(courses)
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.rewards)
+
+    def quarters(self) -> List[int]:
+        """
+        Returns the quarters that offer any course, in the order they were given.
+        """
+        return list(self.quarter_courses)
+
+    def quarter_indices(self, row: int) -> tuple:
+        """
+        Returns the quarters the course in the row is offered in.
+        """
+        quarters_mask = int(self.quarters_mask[row])
+        return tuple(
+            quarter
+            for quarter in range(1, MAX_QUARTERS + 1)
+            if quarters_mask & (1 << (quarter - 1))
+        )
+
+    def course(self, row: int) -> Course:
+        """
+        Returns the Course of a row, creating it the first time it is asked for.
+        """
+        course = self._views[row]
+        if course is None:
+            course = Course(
+                float(self.rewards[row]),
+                (int(self.units_min[row]), int(self.units_max[row])),
+                self.course_numbers[row],
+                self.course_names[row],
+                self.subjects[self.subject_codes[row]],
+                self.course_categories[row],
+                self.course_descriptions[row],
+                self.quarter_indices(row),
+            )
+            self._views[row] = course
+        return course
+
+    def courses(self, rows: Iterable[int]) -> List[Course]:
+        """
+        Returns the Courses of the rows, see course.
+        """
+        return [self.course(row) for row in rows]
+
+    def filter(
+        self,
+        quarter: Optional[int] = None,
+        subjects: Optional[Iterable[str]] = None,
+        min_units: Optional[int] = None,
+        max_units: Optional[int] = None,
+        min_number: Optional[int] = None,
+        max_number: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Returns the rows of the courses that pass every given filter, in the order of the quarter if one
+        is given and in row order otherwise.
+
+        Args:
+            quarter (int, optional): the course is offered in the quarter
+            subjects (Iterable[str], optional): the course subject is one of the subjects
+            min_units (int, optional): the course can't be taken for fewer units, ie units_min >= min_units
+            max_units (int, optional): the course can't be taken for more units, ie units_max <= max_units
+            min_number, max_number (int, optional): bounds on the numeric part of the course number
+
+        Returns:
+            np.ndarray: the rows of the courses
+        """
+        if quarter is not None:
+            rows = self.quarter_courses.get(quarter, np.zeros(0, dtype=np.int64))
+        else:
+            rows = np.arange(len(self), dtype=np.int64)
+
+        keep = np.ones(len(rows), dtype=bool)
+        if subjects is not None:
+            subject_codes = [
+                self.subjects.index(subject)
+                for subject in set(subjects)
+                if subject in self.subjects
+            ]
+            keep &= np.isin(self.subject_codes[rows], subject_codes)
+        if min_units is not None:
+            keep &= self.units_min[rows] >= min_units
+        if max_units is not None:
+            keep &= self.units_max[rows] <= max_units
+        if min_number is not None:
+            keep &= self.course_number_values[rows] >= min_number
+        if max_number is not None:
+            keep &= self.course_number_values[rows] <= max_number
+
+        return rows[keep]
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash of every column and of the rows of every quarter, in order, so two catalogs with
+        the same fingerprint list the same courses in the same quarters.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        numeric_columns: List[np.ndarray] = [
+            self.rewards,
+            self.units_min,
+            self.units_max,
+            self.quarters_mask,
+        ]
+        for column in numeric_columns:
+            digest.update(column.tobytes())
+        text_columns = [
+            self.course_numbers,
+            self.course_names,
+            np.asarray(self.subjects, dtype=object)[self.subject_codes],
+            self.course_categories,
+            self.course_descriptions,
+        ]
+        for column in text_columns:
+            digest.update(json.dumps([str(value) for value in column]).encode())
+        for quarter, rows in self.quarter_courses.items():
+            digest.update(quarter.to_bytes(1, "little"))
+            digest.update(rows.tobytes())
+        return digest.hexdigest()
+
+    def to_class_database(self) -> Dict[int, List[Course]]:
+        """
+        Returns dict[quarter] = list of the courses offered in the quarter.
+        """
+        return {
+            quarter: self.courses(rows.tolist())
+            for quarter, rows in self.quarter_courses.items()
+        }
@@ -8,6 +8,8 @@ class State:
         current_quarter (int): _description_
         course_taken (Set): _description_
         remaining_units (Dict[str, int]): _description_
+        program_object (DegreeProgram): remaining program requirements
+        course_taken_mask (int): bitset of the course numbers in course_taken
     """
 
     def __init__(
@@ -16,11 +18,13 @@ class State:
         course_taken: List,
         remaining_units: Dict[str, int],
         program_object,
+        course_taken_mask: int = 0,
     ) -> None:
         self.current_quarter = current_quarter
         self.course_taken = course_taken
         self.remaining_units = remaining_units
         self.program_object = program_object
+        self.course_taken_mask = course_taken_mask
 
     def print_state(self):
         print(">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
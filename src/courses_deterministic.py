@@ -1,13 +1,26 @@
 import collections
+import csv
+import hashlib
+import io
+import json
+import numpy as np
 import os
-import pandas as pd
-from explorecourses import CourseConnection
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .course import Course
+from .course_catalog import CourseCatalog
+from .io_util import atomic_write
 
-from ast import literal_eval
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import random
 
+# pandas and the explorecourses network layer are slow to import and only needed to parse a new
+# catalog file or fetch a missing one, so they are imported by the stages that use them
+if TYPE_CHECKING:
+    import pandas as pd
+    from explorecourses import CourseConnection
+
 QUARTER_TO_INDEX = {
     "Autumn": 1,
     "Winter": 2,
@@ -15,6 +28,52 @@ QUARTER_TO_INDEX = {
     "Summer": 4,
 }
 
+# Bump when the layout of the cached catalog columns changes
+CATALOG_CACHE_VERSION = 2
+# Records when every catalog in output_dir was last fetched and what the last fetch changed
+CATALOG_MANIFEST_FILE = "catalog_manifest.json"
+# Map (requirement file path, size, mtime) -> compiled requirement index, shared by every loader
+_REQUIREMENT_INDEX_CACHE: Dict[Tuple[str, int, int], Dict[str, str]] = {}
+
+CATALOG_TEXT_COLUMNS = [
+    "course_number",
+    "course_name",
+    "course_subject",
+    "course_description",
+]
+CATALOG_HASHED_COLUMNS = (
+    ["units_min", "units_max"] + CATALOG_TEXT_COLUMNS + ["quarters_mask"]
+)
+
+
+def make_course_connection(timeout: float) -> "CourseConnection":
+    """
+    Create a CourseConnection whose requests time out after `timeout` seconds.
+    """
+    from explorecourses import CourseConnection
+    from requests.adapters import HTTPAdapter
+
+    class TimeoutHTTPAdapter(HTTPAdapter):
+        """
+        HTTPAdapter that applies a default timeout to every request. CourseConnection sends its requests
+        without a timeout, so a stalled explorecourses response would otherwise block a fetch forever.
+        """
+
+        def __init__(self, timeout: float, *args, **kwargs):
+            self.timeout = timeout
+            super().__init__(*args, **kwargs)
+
+        def send(self, request, **kwargs):
+            if kwargs.get("timeout") is None:
+                kwargs["timeout"] = self.timeout
+            return super().send(request, **kwargs)
+
+    connection = CourseConnection()
+    adapter = TimeoutHTTPAdapter(timeout)
+    connection._session.mount("http://", adapter)
+    connection._session.mount("https://", adapter)
+    return connection
+
 
 class CoursesDeterministic:
     """
@@ -29,6 +88,15 @@ class CoursesDeterministic:
         departments=["CS", "EE", "CME"],
         output_dir="course_info",
         read_file_loc="./data/cs_requirements.csv",
+        cache_dir=None,
+        max_workers=8,
+        request_timeout=30.0,
+        max_retries=3,
+        retry_backoff=1.0,
+        connection_factory=None,
+        offline=False,
+        max_catalog_age=None,
+        seed=None,
     ):
         """
         years: a list of possible academic year that the course is offered. Every year interval should be 1 year.
@@ -36,23 +104,58 @@ class CoursesDeterministic:
         departments: a list of departments that we want to extract for course planning.
 
         output_dir: the directory that saves the extracted course info
+
+        cache_dir: the directory that saves the parsed course info as binary columns. Defaults to
+        output_dir/.catalog_cache
+
+        max_workers: the maximum number of department/year catalogs fetched from explorecourses at once
+
+        request_timeout: the number of seconds to wait for an explorecourses response
+
+        max_retries: the number of times a failed fetch is retried before giving up
+
+        retry_backoff: the number of seconds to wait before the first retry, doubled on every retry
+
+        connection_factory: a function of request_timeout that creates a connection to explorecourses.
+        Every fetch thread creates its own connection since requests sessions are not thread safe. The
+        connection is only created when a catalog has to be fetched.
+
+        offline: never connect to explorecourses. Every {year}_{dept}.csv file must already be in output_dir.
+
+        max_catalog_age: the number of seconds after which an existing {year}_{dept}.csv file is fetched
+        again. Existing files are never refreshed if None.
+
+        seed: seed of the random placeholder rewards of the courses, so that every load gives the same
+        rewards. The rewards differ on every load if None.
         """
-        self.connect = CourseConnection()
+        self.connection_factory = (
+            connection_factory if connection_factory else make_course_connection
+        )
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.offline = offline
+        self.max_catalog_age = max_catalog_age
+        self.seed = seed
+        self._thread_local = threading.local()
         # Sort the years first so that the following course mapping is in sequence
         self.years = sorted(years)
         self.depts = departments
         self.output_dir = output_dir
+        self.cache_dir = (
+            cache_dir if cache_dir else os.path.join(output_dir, ".catalog_cache")
+        )
         # self.all_courses is used for easier lookup between course number and course object
         self.all_courses = {}
 
         self.read_file_loc = read_file_loc
-        # self.requirement_file loads all the requirements for cs_tracks
+        # self.requirement_index loads all the requirements for cs_tracks
         # requirement_path = "./data/cs_requirements.csv"  # TODO later, change this to accommodate for all the deparments
 
-        if os.path.exists(self.read_file_loc):
-            self.requirement_file = pd.read_csv(self.read_file_loc)
-        else:
+        if not os.path.exists(self.read_file_loc):
             raise FileNotFoundError("Missing department requirement file!")
+        self.requirement_index = self.compile_requirement_index(self.read_file_loc)
 
     def run(self):
         """
@@ -67,6 +170,9 @@ class CoursesDeterministic:
             print("Creating new path to ", self.output_dir)
             os.makedirs(self.output_dir)
 
+        manifest = self.read_catalog_manifest()
+        missing_catalogs = []
+        stale_catalogs = []
         for year in self.years:
             for dept in self.depts:
 
@@ -76,125 +182,469 @@ class CoursesDeterministic:
                     print(
                         f"No file available for {year} {dept}, will extract from explorecourses."
                     )
-                    print("Connecting to explorecourses...")
+                    missing_catalogs.append((year, dept))
+                elif (
+                    not self.offline
+                    and self.max_catalog_age is not None
+                    and self.catalog_age(year, dept, manifest) > self.max_catalog_age
+                ):
+                    print(
+                        f"File for {year} {dept} is out of date, will refresh from explorecourses."
+                    )
+                    stale_catalogs.append((year, dept))
+                else:
+                    print(f"Using existing file for {year} {dept}.")
+
+        if missing_catalogs and self.offline:
+            missing_files = [f"{year}_{dept}.csv" for year, dept in missing_catalogs]
+            raise FileNotFoundError(
+                f"Running offline but {', '.join(missing_files)} not found in {self.output_dir}!"
+            )
+        if missing_catalogs or stale_catalogs:
+            self.fetch_catalogs(missing_catalogs + stale_catalogs)
+
+        print("Extraction ended! Start processing courses...")
+
+        # convert courses to class Course by quarter
+        return self.course_to_class_database()
+
+    def fetch_catalogs(
+        self, catalogs: List[Tuple[str, str]]
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Fetch the (year, department) catalogs from explorecourses concurrently and save each one to
+        self.output_dir/{year}_{dept}.csv. The changes of every fetched catalog (see fetch_catalog) are
+        recorded in the catalog manifest, even if another catalog could not be fetched.
 
-                    cur_courses = self.connect.get_courses_by_department(
-                        dept, year=year
+        Returns:
+        changes - A dict from "{year}_{dept}" to the changes made to the catalog.
+        """
+        print("Connecting to explorecourses...")
+        changes: Dict[str, Dict[str, List[str]]] = {}
+        num_workers = max(1, min(self.max_workers, len(catalogs)))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = {
+                executor.submit(self.fetch_catalog, year, dept): (year, dept)
+                for year, dept in catalogs
+            }
+            try:
+                for future in as_completed(futures):
+                    year, dept = futures[future]
+                    changes[f"{year}_{dept}"] = future.result()
+                    print(
+                        "File saved to ",
+                        os.path.join(self.output_dir, f"{year}_{dept}.csv"),
                     )
-                    course_by_dept_list = []
-                    for i in range(len(cur_courses)):
-                        course = cur_courses[i]
-                        # TODO: what to put in reward, putting 0 for placeholder
-                        """
-                        reward: float,
-                        units: tuple of (min_unit, max_unit)
-                        course_number: string of unique course ID
-                        course_name: string of full name of the course
-                        quarter_indices: tuple of available quarters,
-                        """
-                        single_course_object = {
-                            "units_min": course.units_min,
-                            "units_max": course.units_max,
-                            "course_number": str(course.code),
-                            "course_name": course.title,
-                            "course_subject": course.subject,
-                            "course_description": course.description,
-                        }
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                if changes:
+                    self.write_catalog_manifest(changes)
 
-                        total_term = set()
-                        for j in range(len(course.sections)):
-                            _, term = course.sections[j].term.split()
-                            total_term.add(term)
+        return changes
 
-                        # If the course isn't offered any of the terms, don't add it.
-                        if not total_term:
-                            continue
+    def fetch_catalog(self, year: str, dept: str) -> Dict[str, List[str]]:
+        """
+        Fetch a single catalog from explorecourses, retrying with exponential backoff, and write it to
+        self.output_dir/{year}_{dept}.csv. If the catalog didn't change, the existing file is kept so
+        that nothing cached from it is invalidated.
 
-                        single_course_object["quarters"] = list(total_term)
-                        course_by_dept_list.append(single_course_object)
+        Returns:
+        changes - The courses that were added, removed, changed quarters or changed otherwise, see
+            diff_catalog_columns.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                cur_courses = self._get_connection().get_courses_by_department(
+                    dept, year=year
+                )
+                break
+            except Exception as error:
+                if attempt == self.max_retries:
+                    raise Exception(
+                        f"Failed to fetch {year} {dept} from explorecourses after {attempt + 1} attempts"
+                    ) from error
+                # The connection may be left in a bad state by the failed request
+                self._thread_local.connection = None
+                time.sleep(self.retry_backoff * 2**attempt)
+
+        catalog_data = self.courses_to_dataframe(cur_courses).to_csv().encode("utf-8")
+        new_columns = self.parse_catalog_file(io.BytesIO(catalog_data))
+
+        year_dept_filepath = os.path.join(self.output_dir, f"{year}_{dept}.csv")
+        old_columns = None
+        if os.path.exists(year_dept_filepath):
+            try:
+                old_columns = self.load_catalog_columns(year, dept)
+            except Exception:
+                # Unreadable catalog, replace it as a whole
+                pass
+
+        changes = self.diff_catalog_columns(old_columns, new_columns)
+        if old_columns is None or not np.array_equal(
+            old_columns["content_hash"], new_columns["content_hash"]
+        ):
+            # Write then rename, so an interrupted fetch never leaves a partial file behind that run()
+            # would mistake for a complete catalog
+            atomic_write(year_dept_filepath, catalog_data)
+        return changes
+
+    @staticmethod
+    def diff_catalog_columns(
+        old_columns: Optional[Dict[str, np.ndarray]], new_columns: Dict[str, np.ndarray]
+    ) -> Dict[str, List[str]]:
+        """
+        Compare two versions of a catalog by course code (eg "CS 221"), using the content hash of every
+        course row. Everything in new_columns counts as added if there is no old_columns.
 
-                    course_by_dept = pd.DataFrame(course_by_dept_list)
+        Returns:
+        changes - A dict with the sorted course codes that were "added", "removed", offered in different
+            quarters ("quarters_changed") or changed in any other way ("content_changed").
+        """
 
-                    course_by_dept.to_csv(year_dept_filepath)
-                    print("File saved to ", year_dept_filepath)
-                else:
-                    print(f"Using existing file for {year} {dept}.")
+        def rows_by_code(columns):
+            rows: Dict[str, Tuple[int, int]] = {}
+            if columns is None:
+                return rows
+            for subject, number, content_hash, quarters_mask in zip(
+                columns["course_subject"].tolist(),
+                columns["course_number"].tolist(),
+                columns["content_hash"].tolist(),
+                columns["quarters_mask"].tolist(),
+            ):
+                rows.setdefault(f"{subject} {number}", (content_hash, quarters_mask))
+            return rows
+
+        old_rows = rows_by_code(old_columns)
+        new_rows = rows_by_code(new_columns)
+
+        changes: Dict[str, List[str]] = {
+            "added": sorted(new_rows.keys() - old_rows.keys()),
+            "removed": sorted(old_rows.keys() - new_rows.keys()),
+            "quarters_changed": [],
+            "content_changed": [],
+        }
+        for code in sorted(old_rows.keys() & new_rows.keys()):
+            old_hash, old_quarters_mask = old_rows[code]
+            new_hash, new_quarters_mask = new_rows[code]
+            if old_quarters_mask != new_quarters_mask:
+                changes["quarters_changed"].append(code)
+            elif old_hash != new_hash:
+                changes["content_changed"].append(code)
+        return changes
+
+    def read_catalog_manifest(self) -> Dict:
+        """
+        Returns the catalog manifest of self.output_dir, or an empty manifest if there is none yet.
+        """
+        manifest_filepath = os.path.join(self.output_dir, CATALOG_MANIFEST_FILE)
+        if os.path.exists(manifest_filepath):
+            try:
+                with open(manifest_filepath) as manifest_file:
+                    return json.load(manifest_file)
+            except (OSError, ValueError):
+                # Unreadable manifest, the catalog ages fall back to the file modification times
+                pass
+        return {"refreshed_at": None, "refreshed": [], "catalogs": {}}
+
+    def write_catalog_manifest(self, changes: Dict[str, Dict[str, List[str]]]) -> None:
+        """
+        Record a refresh in the catalog manifest of self.output_dir. "refreshed" lists the catalogs
+        fetched by this refresh, and every catalog in "catalogs" has the time it was last fetched and the
+        changes that fetch made, eg
+            {"refreshed_at": 1666137600.0, "refreshed": ["2022-2023_CS"], "catalogs": {"2022-2023_CS":
+            {"fetched_at": 1666137600.0, "added": ["CS 229"], "removed": [], "quarters_changed": [],
+            "content_changed": []}}}
+        so that anything built from the catalogs only has to be rebuilt for the courses listed.
+        """
+        refreshed_at = time.time()
+        manifest = self.read_catalog_manifest()
+        manifest["refreshed_at"] = refreshed_at
+        manifest["refreshed"] = sorted(changes)
+        for catalog, catalog_changes in changes.items():
+            manifest["catalogs"][catalog] = dict(
+                fetched_at=refreshed_at, **catalog_changes
+            )
+
+        manifest_filepath = os.path.join(self.output_dir, CATALOG_MANIFEST_FILE)
+        atomic_write(
+            manifest_filepath, json.dumps(manifest, indent=2, sort_keys=True).encode()
+        )
+
+    def catalog_age(self, year: str, dept: str, manifest: Dict) -> float:
+        """
+        Returns the number of seconds since {year}_{dept}.csv was last fetched, according to the catalog
+        manifest or otherwise the modification time of the file.
+        """
+        catalog = manifest["catalogs"].get(f"{year}_{dept}")
+        if catalog is not None:
+            fetched_at = catalog["fetched_at"]
+        else:
+            fetched_at = os.path.getmtime(
+                os.path.join(self.output_dir, f"{year}_{dept}.csv")
+            )
+        return time.time() - fetched_at
 
-        print("Extraction ended! Start processing courses...")
+    def _get_connection(self):
+        """
+        Returns the explorecourses connection of the calling thread, creating it if needed.
+        """
+        connection = getattr(self._thread_local, "connection", None)
+        if connection is None:
+            connection = self.connection_factory(self.request_timeout)
+            self._thread_local.connection = connection
+        return connection
+
+    @staticmethod
+    def courses_to_dataframe(cur_courses) -> "pd.DataFrame":
+        """
+        Convert the courses returned by explorecourses to a DataFrame with one row per course that is
+        offered in at least one term.
+        """
+        import pandas as pd
+
+        course_by_dept_list = []
+        for i in range(len(cur_courses)):
+            course = cur_courses[i]
+            # TODO: what to put in reward, putting 0 for placeholder
+            """
+            reward: float,
+            units: tuple of (min_unit, max_unit)
+            course_number: string of unique course ID
+            course_name: string of full name of the course
+            quarter_indices: tuple of available quarters,
+            """
+            single_course_object = {
+                "units_min": course.units_min,
+                "units_max": course.units_max,
+                "course_number": str(course.code),
+                "course_name": course.title,
+                "course_subject": course.subject,
+                "course_description": course.description,
+            }
+
+            total_term = set()
+            for j in range(len(course.sections)):
+                _, term = course.sections[j].term.split()
+                total_term.add(term)
+
+            # If the course isn't offered any of the terms, don't add it.
+            if not total_term:
+                continue
+
+            single_course_object["quarters"] = list(total_term)
+            course_by_dept_list.append(single_course_object)
+
+        return pd.DataFrame(course_by_dept_list)
+
+    @staticmethod
+    def compile_requirement_index(read_file_loc: str) -> Dict[str, str]:
+        """
+        Compile the requirement file into a dict from course to category. Every course is stored
+        under its subject-qualified code (eg "CS 221") and, if no earlier entry took it, under its
+        bare course number (eg "221"). The index is built once per version of the file and shared
+        across loaders, years and departments.
+        """
+        source = os.stat(read_file_loc)
+        cache_key = (os.path.abspath(read_file_loc), source.st_size, source.st_mtime_ns)
+        if cache_key in _REQUIREMENT_INDEX_CACHE:
+            return _REQUIREMENT_INDEX_CACHE[cache_key]
+
+        requirement_index: Dict[str, str] = {}
+        with open(read_file_loc, newline="") as requirement_file:
+            # The requirement file has no header: every line is a '"<SUBJECT> <NUMBER>" <category>' entry
+            entries = [row[0] for row in csv.reader(requirement_file) if row]
+        for entry in entries:
+            subject, number, category = entry.split()[:3]
+            requirement_index.setdefault(f"{subject} {number}", category)
+            requirement_index.setdefault(number, category)
+
+        _REQUIREMENT_INDEX_CACHE[cache_key] = requirement_index
+        return requirement_index
+
+    def find_course_category(
+        self, course_number: str, course_subject: Optional[str] = None
+    ) -> str:
+        """
+        Return the requirement category of a course, or "elective" if it isn't in the requirement file.
+        With a course_subject, only the subject-qualified entry matches, so eg EE 221 doesn't pick up
+        the category of CS 221.
+        """
+        if course_subject is not None:
+            return self.requirement_index.get(
+                f"{course_subject} {course_number}", "elective"
+            )
+        return self.requirement_index.get(course_number, "elective")
+
+    @staticmethod
+    def parse_catalog_file(year_dept_filepath) -> Dict[str, np.ndarray]:
+        """
+        Parse a {year}_{dept}.csv file (a path or file object) into columns: units_min, units_max,
+        course_number, course_name, course_subject, course_description, quarters_mask, where bit
+        QUARTER_TO_INDEX[term] - 1 of quarters_mask is set if the course is offered in that term, and
+        content_hash, a hash of all the other columns of the row.
+        """
+        import pandas as pd
+
+        cur_course = pd.read_csv(year_dept_filepath, dtype={"course_number": str})
+
+        columns = {
+            "units_min": cur_course["units_min"].to_numpy(dtype=np.int64),
+            "units_max": cur_course["units_max"].to_numpy(dtype=np.int64),
+        }
+        for column in CATALOG_TEXT_COLUMNS:
+            columns[column] = (
+                cur_course[column].fillna("").astype(str).to_numpy(dtype=str)
+            )
+
+        # When storing as csv, the list of quarters gets converted to a string, eg "['Autumn', 'Winter']"
+        quarters_mask = np.zeros(len(cur_course), dtype=np.int64)
+        quarters = cur_course["quarters"].fillna("")
+        for term, index in QUARTER_TO_INDEX.items():
+            offered = quarters.str.contains(f"'{term}'", regex=False).to_numpy()
+            quarters_mask |= offered.astype(np.int64) << (index - 1)
+        columns["quarters_mask"] = quarters_mask
+
+        content_hash = np.zeros(len(cur_course), dtype=np.uint64)
+        for i, row in enumerate(
+            zip(*(columns[name].tolist() for name in CATALOG_HASHED_COLUMNS))
+        ):
+            digest = hashlib.blake2b(
+                "\x1f".join(map(str, row)).encode("utf-8"), digest_size=8
+            ).digest()
+            content_hash[i] = int.from_bytes(digest, "little")
+        columns["content_hash"] = content_hash
+
+        return columns
+
+    def load_catalog_columns(self, year: str, dept: str) -> Dict[str, np.ndarray]:
+        """
+        Return the parsed columns of {year}_{dept}.csv (see parse_catalog_file). The columns are cached
+        in self.cache_dir as a .npz file, which is reused as long as the size and modification time of
+        the csv file are unchanged.
+        """
+        year_dept_filepath = os.path.join(self.output_dir, f"{year}_{dept}.csv")
+        if not os.path.exists(year_dept_filepath):
+            raise Exception(f"{year_dept_filepath} does not exist!")
+
+        source = os.stat(year_dept_filepath)
+        source_key = np.array(
+            [CATALOG_CACHE_VERSION, source.st_size, source.st_mtime_ns], dtype=np.int64
+        )
+        cache_filepath = os.path.join(self.cache_dir, f"{year}_{dept}.npz")
+
+        if os.path.exists(cache_filepath):
+            try:
+                with np.load(cache_filepath) as cached:
+                    if np.array_equal(cached["source_key"], source_key):
+                        return {
+                            name: cached[name]
+                            for name in cached.files
+                            if name != "source_key"
+                        }
+            except (OSError, ValueError, KeyError):
+                # Unreadable cache, parse the csv file again
+                pass
 
-        # convert courses to class Course by quarter
-        return self.course_to_class_database()
+        columns = self.parse_catalog_file(year_dept_filepath)
 
-    def find_course_category(self, course_number: str) -> str:
-        for _, course in self.requirement_file.iterrows():
-            number = course[0].split()[1]
-            category = course[0].split()[2]
-            if number == course_number:
-                return category
-        return "elective"
+        arrays: Dict[str, np.ndarray] = {"source_key": source_key, **columns}
+        buffer = io.BytesIO()
+        # np.load doesn't read pickled arrays, so none are written
+        np.savez(buffer, allow_pickle=False, **arrays)
+        atomic_write(cache_filepath, buffer.getvalue())
 
-    def course_to_class_database(self) -> Dict[int, List[Course]]:
+        return columns
+
+    def course_catalog(self) -> CourseCatalog:
         """
-        Convert the extracted courses to dict[quarter_number] = (all courses available in the quarter)
+        Load the extracted courses of every year and department into a CourseCatalog, without creating
+        Course objects. Courses are identified by their course number, and the quarters of a course
+        offered in several years are merged.
         """
-        # course_by_quarter stores dict[quarter_indices] = [list of course objects]
-        course_by_quarter = collections.defaultdict(list)
+        rows: Dict[str, int] = {}
+        rewards: List[float] = []
+        units_min: List[int] = []
+        units_max: List[int] = []
+        course_numbers: List[str] = []
+        course_names: List[str] = []
+        course_subjects: List[str] = []
+        course_categories: List[str] = []
+        course_descriptions: List[str] = []
+        quarters_mask: List[int] = []
+        rng = random if self.seed is None else random.Random(self.seed)
 
         for year_ind in range(len(self.years)):
             year = self.years[year_ind]
             for dept in self.depts:
                 # Read in courses by the specified years and departments
+                columns = self.load_catalog_columns(year, dept)
+
+                for (
+                    course_units_min,
+                    course_units_max,
+                    course_number,
+                    course_name,
+                    course_subject,
+                    course_description,
+                    course_quarters_mask,
+                ) in zip(
+                    columns["units_min"].tolist(),
+                    columns["units_max"].tolist(),
+                    columns["course_number"].tolist(),
+                    columns["course_name"].tolist(),
+                    columns["course_subject"].tolist(),
+                    columns["course_description"].tolist(),
+                    columns["quarters_mask"].tolist(),
+                ):
+                    # Quarter index 4 * year_ind + QUARTER_TO_INDEX[term] is bit 4 * year_ind + bit of term
+                    year_quarters_mask = course_quarters_mask << (4 * year_ind)
 
-                year_dept_filepath = os.path.join(self.output_dir, f"{year}_{dept}.csv")
-                if not os.path.exists(year_dept_filepath):
-                    raise Exception(f"{year_dept_filepath} does not exist!")
-
-                cur_course = pd.read_csv(year_dept_filepath)
-
-                # When storing as csv, the list gets converted to a string. So we have to convert it back.
-                cur_course["quarters"] = cur_course.apply(
-                    lambda row: literal_eval(row["quarters"]), axis=1
-                )
-
-                for _, row in cur_course.iterrows():
                     # Iterate through all courses without duplicates
-                    if row["course_number"] not in self.all_courses:
-                        terms = [
-                            4 * year_ind + QUARTER_TO_INDEX[term]
-                            for term in row["quarters"]
-                        ]
-
+                    row = rows.get(course_number)
+                    if row is None:
+                        rows[course_number] = len(course_numbers)
                         # TODO: insert real course category
-                        self.all_courses[row["course_number"]] = Course(
-                            random.uniform(0, 5),
-                            (row["units_min"], row["units_max"]),
-                            row["course_number"],
-                            row["course_name"],
-                            row["course_subject"],
-                            self.find_course_category(row["course_number"]),
-                            row["course_description"],
-                            tuple(set(terms)),
+                        rewards.append(rng.uniform(0, 5))
+                        units_min.append(course_units_min)
+                        units_max.append(course_units_max)
+                        course_numbers.append(course_number)
+                        course_names.append(course_name)
+                        course_subjects.append(course_subject)
+                        course_categories.append(
+                            self.find_course_category(course_number, course_subject)
                         )
+                        course_descriptions.append(course_description)
+                        quarters_mask.append(year_quarters_mask)
                     # Add same courses offered in the new year
                     else:
-                        prev_terms = list(
-                            self.all_courses[row["course_number"]].quarter_indices
-                        )
-                        terms = [
-                            4 * year_ind + QUARTER_TO_INDEX[term]
-                            for term in row["quarters"]
-                        ]
+                        quarters_mask[row] |= year_quarters_mask
+
+        return CourseCatalog(
+            rewards,
+            units_min,
+            units_max,
+            course_numbers,
+            course_names,
+            course_subjects,
+            course_categories,
+            course_descriptions,
+            quarters_mask,
+        )
 
-                        self.all_courses[row["course_number"]].quarter_indices = tuple(
-                            set(prev_terms + terms)
-                        )
+    def course_to_class_database(self) -> Dict[int, List[Course]]:
+        """
+        Convert the extracted courses to dict[quarter_number] = (all courses available in the quarter)
+        """
+        catalog = self.course_catalog()
+        for row in range(len(catalog)):
+            course = catalog.course(row)
+            self.all_courses[course.course_number] = course
 
         # Sort by quarter
-        for _, course in self.all_courses.items():
-            for term in course.quarter_indices:
-                course_by_quarter[term].append(course)
-
-        return course_by_quarter
+        return collections.defaultdict(list, catalog.to_class_database())
 
 
 # A simple test case to see the course outputs
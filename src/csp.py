@@ -1,10 +1,36 @@
 import copy
+import hashlib
+import pickle
+from .checkpoint import Checkpointer
 from .csp_util import CSP
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 import random
+import time
 
 
 class BacktrackingSearch:
+    def __init__(
+        self,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        progress_interval: float = 1.0,
+    ) -> None:
+        """
+        @param progress_callback: When given, it is called with a progress
+            event every progress_interval seconds while searching, and with a
+            last event when the search is done, see report_progress.
+        @param progress_interval: The number of seconds between progress
+            events.
+        """
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+
+        # The (variable, index of its value, number of values) of every
+        # assigned variable, in the order they were assigned.
+        self.trail: List = []
+        # The trail of the checkpoint that is being resumed.
+        self.resume_trail: Optional[List] = None
+        self.checkpointer: Optional[Checkpointer] = None
+
     def reset_results(self) -> None:
         """
         This function resets the statistics of the different aspects of the
@@ -97,7 +123,15 @@ class BacktrackingSearch:
         """
         return self.get_delta_weight(assignment, var, val) != 0
 
-    def solve(self, csp: CSP, mcv: bool = False, ac3: bool = False) -> None:
+    def solve(
+        self,
+        csp: CSP,
+        mcv: bool = False,
+        ac3: bool = False,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: float = 5.0,
+        checkpoint_key: Optional[str] = None,
+    ) -> None:
         """
         Solves the given weighted CSP using heuristics as specified in the
         parameter. Note that unlike a typical unweighted CSP where the search
@@ -109,6 +143,16 @@ class BacktrackingSearch:
         @param mcv: When enabled, Most Constrained Variable heuristics is used.
         @param ac3: When enabled, AC-3 will be used after each assignment of an
             variable is made.
+        @param checkpoint_path: When given, the search is checkpointed to this
+            file, see Checkpointer. If the file has a checkpoint of the same
+            CSP and heuristics, the search resumes from it. The file is removed
+            once the search is done.
+        @param checkpoint_interval: The minimum number of seconds between
+            checkpoints.
+        @param checkpoint_key: Identifies the CSP in its checkpoints together
+            with get_signature, eg the csp_cache_key of its constructor. Pass
+            it when CSPs that only differ in their binary factors could share
+            a checkpoint file.
         """
         # CSP to be solved.
         self.csp = csp
@@ -123,11 +167,349 @@ class BacktrackingSearch:
         # The dictionary of domains of every variable in the CSP.
         self.domains = {var: list(self.csp.values[var]) for var in self.csp.variables}
 
+        self.reset_checkpoints(checkpoint_path, checkpoint_interval, checkpoint_key)
+        self.reset_progress()
+
         # Perform backtracking search.
         self.backtrack({}, 0, 1)
+        if self.checkpointer is not None:
+            self.checkpointer.remove()
+            self.checkpointer = None
+        self.finish_progress()
         # Print summary of solutions.
         self.print_stats()
 
+    def reset_checkpoints(
+        self,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: float = 5.0,
+        checkpoint_key: Optional[str] = None,
+    ) -> None:
+        """
+        Resets the trail of the search and sets up its checkpoints, resuming
+        from the checkpoint file if it has a checkpoint of this search.
+
+        @param checkpoint_path, checkpoint_interval, checkpoint_key: See solve.
+            No checkpoints are saved without a path.
+        """
+        self.trail = []
+        self.resume_trail = None
+        self.checkpointer = None
+        if checkpoint_path is not None:
+            self.checkpointer = Checkpointer(
+                checkpoint_path, self.get_signature(checkpoint_key), checkpoint_interval
+            )
+            checkpoint = self.checkpointer.load()
+            if checkpoint is not None:
+                self.resume(checkpoint)
+
+    def reset_progress(self) -> None:
+        """
+        Resets the statistics of the progress events.
+        """
+        self.search_start = time.monotonic()
+        self.next_progress = self.search_start + self.progress_interval
+        self.num_progress_events = 0
+        # The number of nodes entered at every depth.
+        self.depth_histogram = [0] * (self.csp.numVars + 1)
+
+    def get_explored_fraction(self) -> float:
+        """
+        Estimates the fraction of the search tree that was searched from the
+        position of the current node, like Knuth's estimator: the subtrees of
+        the values of a variable are assumed to be the same size, and the
+        values before the current value of every variable on the path were
+        searched.
+
+        @return fraction: A number between 0 and 1.
+        """
+        fraction = 0.0
+        scale = 1.0
+        for _, index, num_values in self.trail:
+            fraction += scale * index / num_values
+            scale /= num_values
+        return fraction
+
+    def report_progress(self, done: bool = False) -> None:
+        """
+        Calls the progress callback with a progress event, a dictionary of
+            done: whether the search is done.
+            elapsed: the seconds since the search started.
+            nodes, nodes_per_second: the number of calls to backtrack.
+            depth: the number of variables assigned at the current node.
+            explored_fraction, remaining_fraction: see get_explored_fraction.
+            estimated_nodes, eta: the estimated size of the whole tree and
+                seconds left, or None before the first variable moves on to
+                its second value.
+            depth_histogram: the number of nodes at every depth.
+            incumbent_weight: the weight of the best assignment found, or None.
+        The search stops at the first consistent assignment, so it may finish
+        long before the estimated time if there is one.
+
+        @param done: Whether the search is done.
+        """
+        assert self.progress_callback is not None
+        elapsed = time.monotonic() - self.search_start
+        nodes = self.numOperations
+        explored_fraction = 1.0 if done else self.get_explored_fraction()
+        estimated_nodes = None
+        eta = None
+        if explored_fraction > 0:
+            estimated_nodes = nodes / explored_fraction
+            eta = elapsed * (1.0 - explored_fraction) / explored_fraction
+
+        self.num_progress_events += 1
+        self.progress_callback(
+            {
+                "done": done,
+                "elapsed": elapsed,
+                "nodes": nodes,
+                "nodes_per_second": nodes / elapsed if elapsed > 0 else 0.0,
+                "depth": len(self.trail),
+                "explored_fraction": explored_fraction,
+                "remaining_fraction": 1.0 - explored_fraction,
+                "estimated_nodes": estimated_nodes,
+                "eta": eta,
+                "depth_histogram": list(self.depth_histogram),
+                "incumbent_weight": (
+                    self.optimalWeight if self.optimalAssignment else None
+                ),
+            }
+        )
+        self.next_progress = time.monotonic() + self.progress_interval
+
+    def finish_progress(self) -> None:
+        """
+        Reports the end of the search if any progress was reported during it.
+        """
+        if self.progress_callback is not None and self.num_progress_events > 0:
+            self.report_progress(done=True)
+
+    def get_signature(self, checkpoint_key: Optional[str] = None) -> str:
+        """
+        Returns a hash of the CSP and the heuristics, which decide the order of
+        the search. The binary factors are too large to hash quickly, so only
+        the variables, their domains and their unary factors are. They don't
+        tell apart CSPs that only differ in their binary factors, so a key of
+        the whole CSP can be given too.
+
+        @param checkpoint_key: See solve.
+        """
+        encoded = pickle.dumps(
+            (
+                checkpoint_key,
+                self.csp.variables,
+                [self.csp.values[var] for var in self.csp.variables],
+                [self.csp.unaryFactors[var] for var in self.csp.variables],
+                self.mcv,
+                self.ac3,
+            ),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def save_checkpoint(self, numAssigned: int) -> None:
+        """
+        Checkpoint the search as it enters a node. The node is found again by
+        replaying the trail, which recomputes the domains, so they aren't
+        saved.
+
+        @param numAssigned: The depth of the node.
+        """
+        assert self.checkpointer is not None
+        self.checkpointer.save(
+            {
+                "trail": list(self.trail),
+                # The replay counts the nodes of the trail and this node again
+                "numOperations": self.numOperations - numAssigned - 1,
+                "optimalAssignment": self.optimalAssignment,
+                "optimalWeight": self.optimalWeight,
+                "numOptimalAssignments": self.numOptimalAssignments,
+                "numAssignments": self.numAssignments,
+                "firstAssignmentNumOperations": self.firstAssignmentNumOperations,
+                "allAssignments": self.allAssignments,
+                "allOptimalAssignments": self.allOptimalAssignments,
+            }
+        )
+
+    def resume(self, checkpoint: Dict) -> None:
+        """
+        Restore the counters and the incumbent of a checkpoint, and replay its
+        trail in the next backtrack.
+
+        @param checkpoint: A checkpoint saved by save_checkpoint.
+        """
+        self.resume_trail = checkpoint["trail"]
+        self.numOperations = checkpoint["numOperations"]
+        self.optimalAssignment = checkpoint["optimalAssignment"]
+        self.optimalWeight = checkpoint["optimalWeight"]
+        self.numOptimalAssignments = checkpoint["numOptimalAssignments"]
+        self.numAssignments = checkpoint["numAssignments"]
+        self.firstAssignmentNumOperations = checkpoint["firstAssignmentNumOperations"]
+        self.allAssignments = checkpoint["allAssignments"]
+        self.allOptimalAssignments = checkpoint["allOptimalAssignments"]
+
+    def resolve(
+        self,
+        csp: CSP,
+        previous_assignment: Dict,
+        mcv: bool = False,
+        ac3: bool = False,
+        fixable_variables: Optional[List] = None,
+        root_domains: Optional[Dict] = None,
+    ) -> None:
+        """
+        Solves a CSP that was edited after an earlier solve, starting from the
+        earlier assignment. Every variable tries its previous value first. The
+        fixable variables whose previous values are still consistent with each
+        other are fixed to them, so only the other variables are searched. If
+        that has no solution, only the fixed variables next to the conflict
+        are freed: the variables whose domains the fixed values emptied, or
+        else the variables that were searched. As a last resort everything is
+        searched like solve does. Every attempt starts from the root domains,
+        which are only computed once. The results are stored like in solve,
+        the variables that didn't keep their fixed previous value in
+        self.repaired_variables.
+
+        @param csp: A weighted CSP.
+        @param previous_assignment: The assignment of the earlier solve. It may
+            miss variables of the CSP and have variables the CSP doesn't have.
+        @param mcv, ac3: See solve.
+        @param fixable_variables: The variables that may be fixed to their
+            previous value, eg the classes of every quarter. Defaults to every
+            variable of previous_assignment.
+        @param root_domains: The domains returned by get_root_domains(csp),
+            which are not modified. Computed if not given.
+        """
+        if root_domains is None:
+            root_domains = self.get_root_domains(csp)
+        self.csp = csp
+        self.mcv = mcv
+        self.ac3 = ac3
+        self.reset_results()
+        self.reset_checkpoints()
+        self.reset_progress()
+
+        hints = {
+            var: val
+            for var, val in previous_assignment.items()
+            if var in root_domains and val in root_domains[var]
+        }
+        if fixable_variables is None:
+            fixable_variables = list(previous_assignment)
+
+        # Keep the previous values that are consistent with the values kept so far
+        fixed: Dict[Any, Any] = {}
+        for var in fixable_variables:
+            if var in hints and self.satisfies_constraints(fixed, var, hints[var]):
+                fixed[var] = hints[var]
+
+        while True:
+            self.domains = {}
+            for var in csp.variables:
+                domain = list(root_domains[var])
+                if var in hints:
+                    # Try the previous value first
+                    domain.remove(hints[var])
+                    domain.insert(0, hints[var])
+                self.domains[var] = domain
+            for var, val in fixed.items():
+                self.domains[var] = [val]
+            for var in fixed:
+                self.apply_arc_consistency(var)
+
+            conflict = [var for var in csp.variables if not self.domains[var]]
+            if not conflict:
+                self.backtrack({}, 0, 1)
+                if self.optimalAssignment:
+                    break
+                conflict = [var for var in csp.variables if var not in fixed]
+            if not fixed:
+                break
+
+            freed = {var for var in conflict if var in fixed}
+            for var in conflict:
+                freed.update(
+                    neighbor
+                    for neighbor in csp.get_neighbor_vars(var)
+                    if neighbor in fixed
+                )
+            if not freed:
+                freed = set(fixed)
+            fixed = {var: val for var, val in fixed.items() if var not in freed}
+
+        self.repaired_variables = [var for var in fixable_variables if var not in fixed]
+        self.finish_progress()
+        self.print_stats()
+
+    def get_root_domains(self, csp: CSP) -> Dict:
+        """
+        Returns the domains of a CSP after removing the values its unary
+        factors rule out and enforcing arc consistency between all of its
+        variables. They only depend on the CSP, so they can be computed once
+        and given to every solve_pinned of the CSP.
+
+        @param csp: A weighted CSP.
+
+        @return domains: A dictionary from every variable to its remaining
+            values, in the order of csp.values.
+        """
+        self.csp = csp
+        self.domains = {}
+        for var in csp.variables:
+            factor = csp.unaryFactors[var]
+            self.domains[var] = [
+                val for val in csp.values[var] if not factor or factor[val] != 0
+            ]
+        for var in csp.variables:
+            self.apply_arc_consistency(var)
+        return self.domains
+
+    def solve_pinned(
+        self,
+        csp: CSP,
+        root_domains: Dict,
+        pinned: Dict,
+        mcv: bool = False,
+        ac3: bool = False,
+    ) -> Dict:
+        """
+        Solves a CSP with some variables pinned to some of their values. The
+        pins are propagated with AC-3 from the root domains, so only the work
+        caused by the pins is done, and the reduced problem is searched. The
+        results are stored like in solve.
+
+        @param csp: A weighted CSP.
+        @param root_domains: The domains returned by get_root_domains(csp),
+            which are not modified.
+        @param pinned: A dictionary from a variable to the values it may take,
+            e.g. [("CS 229", "CS 221"), ("CS 229", "CS 109")].
+        @param mcv, ac3: See solve.
+
+        @return domains: The domains left after propagating the pins, before
+            the search. A variable with an empty domain means that the pins
+            have no solution.
+        """
+        self.csp = csp
+        self.mcv = mcv
+        self.ac3 = ac3
+        self.reset_results()
+        self.reset_checkpoints()
+        self.reset_progress()
+
+        self.domains = {var: list(domain) for var, domain in root_domains.items()}
+        for var, values in pinned.items():
+            self.domains[var] = [val for val in self.domains[var] if val in values]
+        for var in pinned:
+            self.apply_arc_consistency(var)
+        domains = {var: list(domain) for var, domain in self.domains.items()}
+
+        if all(domains.values()):
+            self.backtrack({}, 0, 1)
+        self.finish_progress()
+        self.print_stats()
+        return domains
+
     def backtrack(self, assignment: Dict, numAssigned: int, weight: float) -> bool:
         """
         Perform the back-tracking algorithms to find all possible solutions to
@@ -143,6 +525,14 @@ class BacktrackingSearch:
 
         self.numOperations += 1
         assert weight > 0
+        self.depth_histogram[numAssigned] += 1
+        if (
+            self.progress_callback is not None
+            and time.monotonic() >= self.next_progress
+        ):
+            self.report_progress()
+        if self.checkpointer is not None and self.checkpointer.is_due():
+            self.save_checkpoint(numAssigned)
         if numAssigned == self.csp.numVars:
             # A satisfiable solution have been found. Update the statistics.
             self.numAssignments += 1
@@ -170,26 +560,43 @@ class BacktrackingSearch:
         # Get an ordering of the values.
         ordered_values = self.domains[var]
 
+        # When resuming from a checkpoint, go down its trail first.
+        start_index = 0
+        if self.resume_trail is not None and numAssigned < len(self.resume_trail):
+            trail_var, start_index, _ = self.resume_trail[numAssigned]
+            assert trail_var == var, "The checkpoint doesn't match the search"
+
         # Continue the backtracking recursion using |var| and |ordered_values|.
         if not self.ac3:
             # When arc consistency check is not enabled.
-            for val in ordered_values:
+            for index in range(start_index, len(ordered_values)):
+                if index > start_index:
+                    # Past the trail, the search continues as usual.
+                    self.resume_trail = None
+                val = ordered_values[index]
                 deltaWeight = self.get_delta_weight(assignment, var, val)
                 if deltaWeight > 0:
                     assignment[var] = val
+                    self.trail.append((var, index, len(ordered_values)))
                     found_solution = self.backtrack(
                         assignment, numAssigned + 1, weight * deltaWeight
                     )
+                    self.trail.pop()
                     del assignment[var]
 
                     if found_solution:
                         return True
         else:
             # Arc consistency check is enabled. This is helpful to speed up 3c.
-            for val in ordered_values:
+            for index in range(start_index, len(ordered_values)):
+                if index > start_index:
+                    # Past the trail, the search continues as usual.
+                    self.resume_trail = None
+                val = ordered_values[index]
                 deltaWeight = self.get_delta_weight(assignment, var, val)
                 if deltaWeight > 0:
                     assignment[var] = val
+                    self.trail.append((var, index, len(ordered_values)))
                     # create a deep copy of domains as we are going to look
                     # ahead and change domain values
                     localCopy = copy.deepcopy(self.domains)
@@ -205,6 +612,7 @@ class BacktrackingSearch:
                     )
                     # restore the previous domains
                     self.domains = localCopy
+                    self.trail.pop()
                     del assignment[var]
 
                     if found_solution:
@@ -267,6 +675,10 @@ class BacktrackingSearch:
         """
 
         def remove_inconsistent_values(var1, var2):
+            if not self.domains[var2]:
+                # The search already fails at var2, emptying its neighbors too
+                # would hide where the conflict is
+                return False
             removed = False
             # the binary factor must exist because we add var1 from var2's neighbor
             factor = self.csp.binaryFactors[var1][var2]
@@ -362,12 +774,15 @@ class SchedulingCSPConstructor:
         vision_courses,
         health_courses,
         custom_requests,
+        seed=None,
     ):
         """
         Saves the necessary data.
 
         @param bulletin: Stanford Bulletin that provides a list of courses
         @param profile: A student's profile and requests
+        @param seed: Seed of the shuffle of the course pairs, so the same inputs
+            always build the same CSP. None shuffles with the global random state.
         """
 
         self.courses_by_quarter = courses_by_quarter
@@ -380,6 +795,7 @@ class SchedulingCSPConstructor:
         self.vision_courses = vision_courses
         self.health_courses = health_courses
         self.custom_requests = custom_requests
+        self.seed = seed
 
         courses = df_requirements["Course"].values
         satisfies = df_requirements["Subcategory"].values
@@ -402,8 +818,21 @@ class SchedulingCSPConstructor:
         then it means we are taking 'CS221' in 'Aut2013'. If it's None, then
         we are not taking either of them in 'Aut2013'.
 
+        The base variables are added first, followed by the overlay of the profile.
+
         @param csp: The CSP where the additional constraints will be added to.
         """
+        self.add_base_variables(csp)
+        self.add_profile_overlay(csp)
+
+    def add_base_variables(self, csp: CSP) -> None:
+        """
+        Add the variables and constraints shared by every profile with the same courses and
+        requirements: the classes, units and depth variables of every quarter, the no-repeat
+        constraints between quarters and the unit and depth totals of the program.
+
+        @param csp: The CSP where the base variables will be added to.
+        """
 
         def _quarter_units_constraint(classes, units):
             """
@@ -477,6 +906,184 @@ class SchedulingCSPConstructor:
 
             return depth_b_taken == depth_b
 
+        def _no_repeat_class_constraint(courses1, courses2):
+            if courses1 is None or courses2 is None:
+                return True
+
+            for course in courses1:
+                if course in courses2:
+                    return False
+            return True
+
+        def _no_repeat_foundations(courses):
+            if courses is None:
+                return True
+
+            course1_satisfies = self.satisfies_dict[courses[0]]
+            course2_satisfies = self.satisfies_dict[courses[1]]
+
+            foundation_courses = {
+                "logic",
+                "probability",
+                "algorithm",
+                "organ",
+                "foundation systems",
+            }
+            satisfies_intersection = course1_satisfies.intersection(course2_satisfies)
+            for element in satisfies_intersection:
+                if element in foundation_courses:
+                    return False
+            return True
+
+        def _no_repeat_foundations_quarters(courses1, courses2):
+            if courses1 is None or courses2 is None:
+                return True
+
+            foundation_courses = {
+                "logic",
+                "probability",
+                "algorithm",
+                "organ",
+                "foundation systems",
+            }
+
+            course1_satisfies = self.satisfies_dict[courses1[0]]
+            course2_satisfies = self.satisfies_dict[courses1[1]]
+            course3_satisfies = self.satisfies_dict[courses2[0]]
+            course4_satisfies = self.satisfies_dict[courses2[1]]
+
+            for element in course1_satisfies:
+                if element in foundation_courses:
+                    if (
+                        element in course2_satisfies
+                        or element in course3_satisfies
+                        or element in course4_satisfies
+                    ):
+                        return False
+
+            for element in course2_satisfies:
+                if element in foundation_courses:
+                    if element in course3_satisfies or element in course4_satisfies:
+                        return False
+
+            for element in course3_satisfies:
+                if element in foundation_courses:
+                    if element in course4_satisfies:
+                        return False
+
+            return True
+
+        # Note that CS221 has to be taken to satisfy depth a.
+        # In doing so, we also satisfy significant implementation and breadth applications.
+        quarter_units_variables = []
+        quarter_class_variables = []
+        quarter_depth_variables = []
+        quarter_depth_a_variables = []
+        quarter_depth_b_variables = []
+
+        rng = random if self.seed is None else random.Random(self.seed)
+        for quarter, courses in self.courses_by_quarter.items():
+
+            domain: List[Any] = [None]
+
+            # Shuffle a copy, so that building again from this constructor gives the same CSP
+            courses = list(courses)
+            rng.shuffle(courses)
+
+            for i in range(len(courses) - 1):
+                course1 = courses[i]
+
+                if course1.units[0] <= 4 and course1.units[1] >= 4:
+
+                    for j in range(i + 1, len(courses)):
+
+                        course2 = courses[j]
+                        if course2.units[0] <= 4 and course2.units[1] >= 4:
+
+                            domain.append((course1.course_id, course2.course_id))
+
+            csp.add_variable(f"Quarter {quarter} classes", domain)
+            csp.add_unary_factor(f"Quarter {quarter} classes", _no_repeat_foundations)
+
+            quarter_class_variables.append(f"Quarter {quarter} classes")
+
+            csp.add_variable(f"Quarter {quarter} units", [0, 8])
+            csp.add_binary_factor(
+                f"Quarter {quarter} classes",
+                f"Quarter {quarter} units",
+                _quarter_units_constraint,
+            )
+            quarter_units_variables.append(f"Quarter {quarter} units")
+
+            csp.add_variable(f"Quarter {quarter} depth units", [0, 4, 8])
+            csp.add_binary_factor(
+                f"Quarter {quarter} classes",
+                f"Quarter {quarter} depth units",
+                _depth_units_constraint,
+            )
+            quarter_depth_variables.append(f"Quarter {quarter} depth units")
+
+            csp.add_variable(f"Quarter {quarter} depth a classes", [0, 1])
+            csp.add_binary_factor(
+                f"Quarter {quarter} classes",
+                f"Quarter {quarter} depth a classes",
+                _depth_a_constraint,
+            )
+            quarter_depth_a_variables.append(f"Quarter {quarter} depth a classes")
+
+            csp.add_variable(f"Quarter {quarter} depth b classes", [0, 1, 2])
+            csp.add_binary_factor(
+                f"Quarter {quarter} classes",
+                f"Quarter {quarter} depth b classes",
+                _depth_b_constraint,
+            )
+            quarter_depth_b_variables.append(f"Quarter {quarter} depth b classes")
+
+        for i in range(len(quarter_class_variables) - 1):
+            quarter1 = quarter_class_variables[i]
+
+            for j in range(i + 1, len(quarter_class_variables)):
+                quarter2 = quarter_class_variables[j]
+                csp.add_binary_factor(quarter1, quarter2, _no_repeat_class_constraint)
+                csp.add_binary_factor(
+                    quarter1, quarter2, _no_repeat_foundations_quarters
+                )
+
+        # Degree program should be at least 45 units
+        sum_var = create_sum_variable(
+            csp, "program_units_var", quarter_units_variables, 60
+        )
+        csp.add_unary_factor(sum_var, lambda total_units: total_units >= 45)
+
+        # At least 21 depth units should be satisfied
+        sum_var = create_sum_variable(
+            csp, "program_depth_units_var", quarter_depth_variables, 58
+        )
+        csp.add_unary_factor(sum_var, lambda total_depth_units: total_depth_units >= 21)
+
+        # At least 1 depth a class
+        sum_var = create_sum_variable(
+            csp, "program_depth_a_var", quarter_depth_a_variables, 7
+        )
+        csp.add_unary_factor(sum_var, lambda depth_a_taken: depth_a_taken >= 1)
+
+        # At least 4 depth b classes
+        sum_var = create_sum_variable(
+            csp, "program_depth_b_var", quarter_depth_b_variables, 14
+        )
+        csp.add_unary_factor(sum_var, lambda depth_b_taken: depth_b_taken >= 4)
+
+    def add_profile_overlay(self, csp: CSP) -> List:
+        """
+        Add the constraints of the breadth areas, unsatisfied foundations and subject requests
+        of the profile to a CSP with the base variables, see add_base_variables. The overlay only
+        adds variables, so removing them restores the base CSP for the next profile.
+
+        @param csp: A CSP with the base variables of this constructor's courses.
+
+        @return overlay: The added variables, see remove_profile_overlay.
+        """
+
         def _breadth_systems_constraint(classes, breadth_systems_taken):
             if classes is None:
                 return breadth_systems_taken == 0
@@ -625,80 +1232,8 @@ class SchedulingCSPConstructor:
 
             return health == health_taken
 
-        def _no_repeat_class_constraint(courses1, courses2):
-            if courses1 is None or courses2 is None:
-                return True
-
-            for course in courses1:
-                if course in courses2:
-                    return False
-            return True
+        num_base_variables = len(csp.variables)
 
-        def _no_repeat_foundations(courses):
-            if courses is None:
-                return True
-
-            course1_satisfies = self.satisfies_dict[courses[0]]
-            course2_satisfies = self.satisfies_dict[courses[1]]
-
-            foundation_courses = {
-                "logic",
-                "probability",
-                "algorithm",
-                "organ",
-                "foundation systems",
-            }
-            satisfies_intersection = course1_satisfies.intersection(course2_satisfies)
-            for element in satisfies_intersection:
-                if element in foundation_courses:
-                    return False
-            return True
-
-        def _no_repeat_foundations_quarters(courses1, courses2):
-            if courses1 is None or courses2 is None:
-                return True
-
-            foundation_courses = {
-                "logic",
-                "probability",
-                "algorithm",
-                "organ",
-                "foundation systems",
-            }
-
-            course1_satisfies = self.satisfies_dict[courses1[0]]
-            course2_satisfies = self.satisfies_dict[courses1[1]]
-            course3_satisfies = self.satisfies_dict[courses2[0]]
-            course4_satisfies = self.satisfies_dict[courses2[1]]
-
-            for element in course1_satisfies:
-                if element in foundation_courses:
-                    if (
-                        element in course2_satisfies
-                        or element in course3_satisfies
-                        or element in course4_satisfies
-                    ):
-                        return False
-
-            for element in course2_satisfies:
-                if element in foundation_courses:
-                    if element in course3_satisfies or element in course4_satisfies:
-                        return False
-
-            for element in course3_satisfies:
-                if element in foundation_courses:
-                    if element in course4_satisfies:
-                        return False
-
-            return True
-
-        # Note that CS221 has to be taken to satisfy depth a.
-        # In doing so, we also satisfy significant implementation and breadth applications.
-        quarter_units_variables = []
-        quarter_class_variables = []
-        quarter_depth_variables = []
-        quarter_depth_a_variables = []
-        quarter_depth_b_variables = []
         quarter_breadth_systems_variables = []
         quarter_breadth_society_variables = []
         quarter_breadth_theory_variables = []
@@ -712,68 +1247,7 @@ class SchedulingCSPConstructor:
         quarter_vision_variables = []
         quarter_health_variables = []
 
-        for quarter, courses in self.courses_by_quarter.items():
-
-            domain: List[Any] = [None]
-
-            random.shuffle(courses)
-
-            for i in range(len(courses) - 1):
-                course1 = courses[i]
-
-                if course1.units[0] <= 4 and course1.units[1] >= 4:
-
-                    for j in range(i + 1, len(courses)):
-
-                        course2 = courses[j]
-                        if course2.units[0] <= 4 and course2.units[1] >= 4:
-
-                            course_code1 = (
-                                f"{course1.course_subject} {course1.course_number}"
-                            )
-                            course_code2 = (
-                                f"{course2.course_subject} {course2.course_number}"
-                            )
-
-                            domain.append((course_code1, course_code2))
-
-            csp.add_variable(f"Quarter {quarter} classes", domain)
-            csp.add_unary_factor(f"Quarter {quarter} classes", _no_repeat_foundations)
-
-            quarter_class_variables.append(f"Quarter {quarter} classes")
-
-            csp.add_variable(f"Quarter {quarter} units", [0, 8])
-            csp.add_binary_factor(
-                f"Quarter {quarter} classes",
-                f"Quarter {quarter} units",
-                _quarter_units_constraint,
-            )
-            quarter_units_variables.append(f"Quarter {quarter} units")
-
-            csp.add_variable(f"Quarter {quarter} depth units", [0, 4, 8])
-            csp.add_binary_factor(
-                f"Quarter {quarter} classes",
-                f"Quarter {quarter} depth units",
-                _depth_units_constraint,
-            )
-            quarter_depth_variables.append(f"Quarter {quarter} depth units")
-
-            csp.add_variable(f"Quarter {quarter} depth a classes", [0, 1])
-            csp.add_binary_factor(
-                f"Quarter {quarter} classes",
-                f"Quarter {quarter} depth a classes",
-                _depth_a_constraint,
-            )
-            quarter_depth_a_variables.append(f"Quarter {quarter} depth a classes")
-
-            csp.add_variable(f"Quarter {quarter} depth b classes", [0, 1, 2])
-            csp.add_binary_factor(
-                f"Quarter {quarter} classes",
-                f"Quarter {quarter} depth b classes",
-                _depth_b_constraint,
-            )
-            quarter_depth_b_variables.append(f"Quarter {quarter} depth b classes")
-
+        for quarter in self.courses_by_quarter:
             if "systems" in self.breadth_to_satisfy:
                 csp.add_variable(f"Quarter {quarter} breadth systems classes", [0, 1])
                 csp.add_binary_factor(
@@ -904,40 +1378,6 @@ class SchedulingCSPConstructor:
                 )
                 quarter_health_variables.append(f"Quarter {quarter} health classes")
 
-        for i in range(len(quarter_class_variables) - 1):
-            quarter1 = quarter_class_variables[i]
-
-            for j in range(i + 1, len(quarter_class_variables)):
-                quarter2 = quarter_class_variables[j]
-                csp.add_binary_factor(quarter1, quarter2, _no_repeat_class_constraint)
-                csp.add_binary_factor(
-                    quarter1, quarter2, _no_repeat_foundations_quarters
-                )
-
-        # Degree program should be at least 45 units
-        sum_var = create_sum_variable(
-            csp, "program_units_var", quarter_units_variables, 60
-        )
-        csp.add_unary_factor(sum_var, lambda total_units: total_units >= 45)
-
-        # At least 21 depth units should be satisfied
-        sum_var = create_sum_variable(
-            csp, "program_depth_units_var", quarter_depth_variables, 58
-        )
-        csp.add_unary_factor(sum_var, lambda total_depth_units: total_depth_units >= 21)
-
-        # At least 1 depth a class
-        sum_var = create_sum_variable(
-            csp, "program_depth_a_var", quarter_depth_a_variables, 7
-        )
-        csp.add_unary_factor(sum_var, lambda depth_a_taken: depth_a_taken >= 1)
-
-        # At least 4 depth b classes
-        sum_var = create_sum_variable(
-            csp, "program_depth_b_var", quarter_depth_b_variables, 14
-        )
-        csp.add_unary_factor(sum_var, lambda depth_b_taken: depth_b_taken >= 4)
-
         # At least 1 breadth systems class
         if "systems" in self.breadth_to_satisfy:
             sum_var = create_sum_variable(
@@ -1084,6 +1524,28 @@ class SchedulingCSPConstructor:
                 lambda health_taken: health_taken >= self.custom_requests["health"],
             )
 
+        return csp.variables[num_base_variables:]
+
+    @staticmethod
+    def remove_profile_overlay(csp: CSP, overlay: List) -> None:
+        """
+        Remove the variables of a profile overlay, see add_profile_overlay.
+        """
+        for var in reversed(overlay):
+            csp.remove_variable(var)
+
+    def get_base_csp(self) -> CSP:
+        """
+        Return a CSP with only the base variables, see add_base_variables. Profiles with the
+        same courses and requirements can share it, attaching and removing their overlays.
+
+        @return csp: A CSP where the base variables and constraints are added.
+        """
+
+        csp = CSP()
+        self.add_base_variables(csp)
+        return csp
+
     def get_csp(self) -> CSP:
         """
         Return a CSP that only enforces the basic constraints that a course can
@@ -0,0 +1,282 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import numpy as np
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .csp_util import CSP
+from .io_util import atomic_write
+
+# Bump when the serialized format or the CSP construction changes, so old entries are never loaded
+CSP_CACHE_VERSION = 2
+
+
+def csp_cache_key(constructor) -> str:
+    """
+    Hash everything a SchedulingCSPConstructor builds its CSP from: the filtered courses in their order,
+    the requirements, the profile fields and the seed that shuffles the domains.
+
+    Arguments:
+    constructor - a SchedulingCSPConstructor
+
+    Returns:
+    key - a hex digest naming the cache entry of the CSP
+    """
+    key_fields = {
+        "version": CSP_CACHE_VERSION,
+        "courses": [
+            [quarter, [[course.course_id, *course.units] for course in courses]]
+            for quarter, courses in constructor.courses_by_quarter.items()
+        ],
+        "requirements": constructor.df_requirements[["Course", "Subcategory"]]
+        .astype(str)
+        .values.tolist(),
+        "breadth_to_satisfy": sorted(constructor.breadth_to_satisfy),
+        "foundations_not_satisfied": sorted(constructor.foundations_not_satisfied),
+        "nlp_courses": sorted(constructor.nlp_courses),
+        "robotics_courses": sorted(constructor.robotics_courses),
+        "vision_courses": sorted(constructor.vision_courses),
+        "health_courses": sorted(constructor.health_courses),
+        "custom_requests": constructor.custom_requests,
+        "seed": constructor.seed,
+    }
+    encoded = json.dumps(key_fields, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def serialize_csp(csp: CSP) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Split a CSP into pickleable metadata and one flat array holding every factor table.
+
+    A binary factor table is stored once per pair of variables as a len(domain1) x len(domain2) block;
+    the table of the reverse direction is its transpose. The metadata keeps the variables, their domains
+    and the order of every variable's neighbors, so a loaded CSP is identical to the original. The
+    factors of the scheduling CSP are all 0 or 1, and are then stored with one byte per value.
+
+    Returns:
+    metadata - the variables, domains and where each factor table is in the array
+    factors - the factor values
+    """
+    index = {var: i for i, var in enumerate(csp.variables)}
+    blocks: List[np.ndarray] = []
+    offset = 0
+
+    def add_block(values: List[List[float]]) -> Tuple[int, int, int]:
+        nonlocal offset
+        block = np.asarray(values, dtype=np.float64)
+        blocks.append(block.ravel())
+        location = (offset, block.shape[0], block.shape[1])
+        offset += block.size
+        return location
+
+    unary: List[Optional[Tuple[int, int, int]]] = []
+    for var in csp.variables:
+        factor = csp.unaryFactors[var]
+        if factor is None:
+            unary.append(None)
+        else:
+            unary.append(add_block([[factor[val] for val in csp.values[var]]]))
+
+    # neighbors[i] = [(j, location of the table, whether the stored table is binaryFactors[j][i])]
+    pair_locations: Dict[Tuple[int, int], Tuple[int, int, int]] = {}
+    neighbors: List[List[Tuple[int, Tuple[int, int, int], bool]]] = []
+    for var1 in csp.variables:
+        i = index[var1]
+        var_neighbors = []
+        for var2, table in csp.binaryFactors[var1].items():
+            j = index[var2]
+            if (j, i) in pair_locations:
+                var_neighbors.append((j, pair_locations[(j, i)], True))
+                continue
+            location = add_block(
+                [
+                    [table[val1][val2] for val2 in csp.values[var2]]
+                    for val1 in csp.values[var1]
+                ]
+            )
+            pair_locations[(i, j)] = location
+            var_neighbors.append((j, location, False))
+        neighbors.append(var_neighbors)
+
+    metadata = {
+        "version": CSP_CACHE_VERSION,
+        "variables": csp.variables,
+        "values": [csp.values[var] for var in csp.variables],
+        "unary": unary,
+        "neighbors": neighbors,
+    }
+    factors = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float64)
+    if np.all((factors == 0) | (factors == 1)):
+        factors = factors.astype(np.uint8)
+    return metadata, factors
+
+
+class FactorTable(Mapping):
+    """
+    A binary factor table of a cached CSP, table[val1][val2]. The row of a value is only read from the
+    factor array, which may be memory-mapped, the first time it is looked up, as a search usually looks
+    at a small part of the large tables. Rows are kept once built, so they can be updated in place like
+    the rows of a dict table.
+    """
+
+    def __init__(
+        self,
+        block: np.ndarray,
+        value_rows: Dict[Any, int],
+        column_values: List,
+    ) -> None:
+        self.block = block
+        self.value_rows = value_rows
+        self.column_values = column_values
+        self.rows: Dict[Any, Dict[Any, float]] = {}
+
+    def __getitem__(self, val1) -> Dict[Any, float]:
+        row = self.rows.get(val1)
+        if row is None:
+            if not self.block.flags.c_contiguous:
+                # The table of the reverse direction is a transposed view, whose rows are slow to read
+                self.block = np.ascontiguousarray(self.block)
+            row_values = self.block[self.value_rows[val1]].astype(np.float64)
+            row = dict(zip(self.column_values, row_values.tolist()))
+            self.rows[val1] = row
+        return row
+
+    def __iter__(self) -> Iterator:
+        return iter(self.value_rows)
+
+    def __len__(self) -> int:
+        return len(self.value_rows)
+
+
+def deserialize_csp(metadata: Dict[str, Any], factors: np.ndarray) -> CSP:
+    """
+    Rebuild the CSP serialized by serialize_csp. factors may be memory-mapped, the binary factor tables
+    are FactorTables that read it as they are used.
+    """
+    csp = CSP()
+    variables = metadata["variables"]
+    values = metadata["values"]
+    value_rows = [{val: row for row, val in enumerate(domain)} for domain in values]
+
+    def get_block(location: Tuple[int, int, int]) -> np.ndarray:
+        offset, rows, columns = location
+        end = offset + rows * columns
+        return factors[offset:end].reshape(rows, columns)
+
+    for var, domain in zip(variables, values):
+        csp.add_variable(var, domain)
+
+    for i, location in enumerate(metadata["unary"]):
+        if location is not None:
+            factor = get_block(location)[0].astype(np.float64)
+            csp.unaryFactors[variables[i]] = dict(zip(values[i], factor.tolist()))
+
+    for i, var_neighbors in enumerate(metadata["neighbors"]):
+        var1 = variables[i]
+        for j, location, transposed in var_neighbors:
+            block = get_block(location)
+            csp.binaryFactors[var1][variables[j]] = FactorTable(
+                block.T if transposed else block, value_rows[i], values[j]
+            )
+    return csp
+
+
+class CSPCache:
+    """
+    A directory of constructed CSPs, keyed by csp_cache_key. Each entry is <key>.npy with the factor
+    tables, which is memory-mapped when loaded, and <key>.pkl with the rest of the CSP. Once the entries
+    take more than max_bytes, the least recently used ones are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, f"{key}.pkl"),
+            os.path.join(self.directory, f"{key}.npy"),
+        )
+
+    def load(self, key: str) -> Optional[CSP]:
+        """
+        Returns the cached CSP, or None if there is no entry for the key.
+        """
+        metadata_path, factors_path = self._paths(key)
+        try:
+            with open(metadata_path, "rb") as file:
+                metadata = pickle.load(file)
+            factors = np.load(factors_path, mmap_mode="r")
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if metadata.get("version") != CSP_CACHE_VERSION:
+            return None
+
+        # Mark the entry as recently used for eviction
+        os.utime(metadata_path)
+        return deserialize_csp(metadata, factors)
+
+    def store(self, key: str, csp: CSP) -> None:
+        metadata, factors = serialize_csp(csp)
+        metadata_path, factors_path = self._paths(key)
+
+        buffer = io.BytesIO()
+        np.save(buffer, factors)
+        atomic_write(factors_path, buffer.getvalue())
+        # The metadata is written last, so an entry is only loaded once both files are complete
+        atomic_write(
+            metadata_path, pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        total_bytes = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".pkl"):
+                continue
+            key = os.path.splitext(filename)[0]
+            metadata_path, factors_path = self._paths(key)
+            try:
+                last_used = os.path.getmtime(metadata_path)
+                size = os.path.getsize(metadata_path) + os.path.getsize(factors_path)
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, key))
+            total_bytes += size
+
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_bytes -= size
+
+    def get_csp(self, constructor) -> CSP:
+        """
+        Returns the CSP of a SchedulingCSPConstructor, from the cache if it was built before. The CSP is
+        only cached when the constructor has a seed, as the domains are shuffled randomly otherwise.
+        """
+        if constructor.seed is None:
+            return constructor.get_csp()
+
+        key = csp_cache_key(constructor)
+        csp = self.load(key)
+        if csp is not None:
+            self.hits += 1
+            return csp
+
+        self.misses += 1
+        csp = constructor.get_csp()
+        self.store(key, csp)
+        return csp
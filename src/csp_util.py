@@ -55,6 +55,22 @@ class CSP:
         self.unaryFactors[var] = None
         self.binaryFactors[var] = dict()
 
+    def remove_variable(self, var) -> None:
+        """
+        Remove a variable from the CSP, with its unary factor and every binary
+        factor it is part of.
+        """
+        if var not in self.values:
+            raise Exception("Variable name does not exist: %s" % str(var))
+
+        for neighbor in self.binaryFactors[var]:
+            del self.binaryFactors[neighbor][var]
+        del self.binaryFactors[var]
+        del self.unaryFactors[var]
+        del self.values[var]
+        self.variables.remove(var)
+        self.numVars -= 1
+
     def get_neighbor_vars(self, var) -> List:
         """
         Returns a list of variables which are neighbors of |var|.
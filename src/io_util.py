@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """
+    Write `data` to `path` through a temporary file in the same directory followed by a rename, so
+    readers see either the previous file or the complete new one, never a partial write.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,557 @@
+import json
+import multiprocessing
+import os
+import random
+import time
+from collections import OrderedDict
+import pandas as pd
+import yaml  # type: ignore[import]
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .constants import COURSE_TOPICS, CS_AI_PROGRAM_FILE, INDEX_QUARTER
+from .course import Course
+from .course_catalog import CourseCatalog
+from .csp import BacktrackingSearch, SchedulingCSPConstructor
+from .csp_cache import CSPCache, csp_cache_key
+from .csp_util import CSP
+from .io_util import atomic_write
+from .program_requirements.cs_ai_program import CSAIProgram
+from .solution_cache import SolutionCache, solution_cache_key
+from .topic_tagger import TopicTagger
+
+FOUNDATION_AREAS = {"logic", "probability", "algorithm", "organ", "foundation systems"}
+# The root domains of this many CSPs are kept by a ProfileSolver
+MAX_ROOT_DOMAINS = 16
+
+# The ProfileSolver of a batch worker process, set by _init_batch_worker
+_BATCH_SOLVER: Optional["ProfileSolver"] = None
+
+
+def load_profile(config_filepath: str) -> Dict[str, Any]:
+    """
+    Load a student profile from a yaml config file, see the configs folder.
+    """
+    if not os.path.exists(config_filepath):
+        raise Exception(f"Invalid config path! {config_filepath} does not exist!")
+
+    with open(config_filepath, "r") as file:
+        return yaml.safe_load(file)
+
+
+def find_profiles(paths: List[str]) -> List[str]:
+    """
+    Returns the yaml profiles in the paths, which are profile files or directories of profile files.
+    """
+    profile_paths: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            profile_paths.extend(
+                os.path.join(path, filename)
+                for filename in sorted(os.listdir(path))
+                if filename.endswith((".yaml", ".yml"))
+            )
+        else:
+            profile_paths.append(path)
+    return profile_paths
+
+
+def get_result_names(profile_paths: List[str]) -> List[str]:
+    """
+    Returns the name of the result of every profile: its path relative to the deepest directory that
+    holds all the profiles, without the extension. Profiles with the same file name in different
+    directories keep their directories, eg "cs/profile1" and "ee/profile1".
+    """
+    if not profile_paths:
+        return []
+    filepaths = [os.path.abspath(path) for path in profile_paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in filepaths])
+    names = [os.path.splitext(os.path.relpath(path, root))[0] for path in filepaths]
+
+    profiles_by_name: Dict[str, Set[str]] = {}
+    for name, path in zip(names, filepaths):
+        profiles_by_name.setdefault(name, set()).add(path)
+    duplicates = sorted(
+        name for name, paths in profiles_by_name.items() if len(paths) > 1
+    )
+    if duplicates:
+        raise Exception(f"Profiles with the same result name: {duplicates}!")
+    return names
+
+
+class ProfileSolver:
+    """
+    Solves the CSP model for student profiles. Everything that doesn't depend on the profile - the
+    courses, the program requirements and the topic tags of the courses - is loaded once and only read
+    afterwards, so one solver can be shared by many profiles and by forked worker processes. The base
+    CSP of the profiles with the same internship and foundations is built by the first of them, and the
+    others only add their overlay to it.
+    """
+
+    def __init__(
+        self,
+        course_by_quarter: Dict[int, List[Course]],
+        requirements_file: str = CS_AI_PROGRAM_FILE,
+        verbose: int = 0,
+        csp_cache: Optional[CSPCache] = None,
+        seed: Optional[int] = None,
+        solution_cache: Optional[SolutionCache] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        progress_interval: float = 1.0,
+    ) -> None:
+        """
+        Arguments:
+        course_by_quarter - dict[quarter_number] = all courses available in the quarter
+        requirements_file - the program requirements, eg data/cs_ai_requirements.csv
+        verbose - print the progress of every solve if > 0
+        csp_cache - a cache of constructed CSPs, so that a profile seen before skips the construction
+        seed - seed of the CSP construction. The CSPs and solutions are only cached with a seed.
+        solution_cache - a cache of the solutions, so that a profile seen before skips the construction
+            and the search
+        progress_callback - called with the progress events of every search, see
+            BacktrackingSearch.report_progress
+        progress_interval - seconds between progress events
+        """
+        self.course_by_quarter = course_by_quarter
+        self.df_requirements = pd.read_csv(requirements_file)
+        self.verbose = verbose
+        self.csp_cache = csp_cache
+        self.seed = seed
+        self.solution_cache = solution_cache
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        # (internship, foundations not satisfied) -> the base CSP of the profiles, see
+        # SchedulingCSPConstructor.get_base_csp
+        self.base_csps: Dict[Tuple[bool, Tuple[str, ...]], CSP] = {}
+        # The root domains of the CSPs of the recent pinned and repaired solves, least recently used first,
+        # see BacktrackingSearch.get_root_domains
+        self.root_domains: "OrderedDict[Hashable, Dict]" = OrderedDict()
+
+        catalog = CourseCatalog.from_class_database(course_by_quarter)
+        self.courses_by_topic = TopicTagger(COURSE_TOPICS).courses_by_topic(catalog)
+        self.seminar_courses_one_unit = {
+            quarter_index: [
+                course
+                for course in courses
+                if CSAIProgram._is_seminar_course(course.course_id)
+                and course.units[0] >= 1
+                and course.units[0] <= 2
+            ]
+            for quarter_index, courses in course_by_quarter.items()
+        }
+
+    def solve(
+        self,
+        student_config: Dict[str, Any],
+        previous_schedule: Optional[List[Dict[str, Any]]] = None,
+        pinned_quarters: Optional[Dict[int, List[str]]] = None,
+        checkpoint_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Find a schedule for a student profile.
+
+        Arguments:
+        student_config - the student profile, as loaded by load_profile
+        previous_schedule - the schedule of an earlier solve of the profile before it was edited. The
+            quarters that are still consistent with the edited profile are kept, and only the others are
+            searched again, see BacktrackingSearch.resolve.
+        pinned_quarters - dict[quarter_number] = courses that must be taken in the quarter, or [] for no
+            classes, to ask what the schedule would be if they were, see BacktrackingSearch.solve_pinned
+        checkpoint_path - a file to checkpoint the search to, and to resume it from if it has a checkpoint
+            of this profile's CSP, see BacktrackingSearch.solve
+
+        Returns:
+        result - {"solved": whether the CSP has a solution, "schedule": a list of {"quarter", "season",
+            "courses": [{"course", "name", "units"}]} for quarters 1-7 if solved, "cached": whether the
+            solution came from the solution cache, "timings": seconds spent building and solving the CSP},
+            and with a previous_schedule "repaired": the quarters whose classes were searched again, and
+            with pinned_quarters "options": dict[quarter_number] = the pairs of courses that are still
+            possible in the quarter after propagating the pins, [] for no classes
+        """
+        if previous_schedule is not None and pinned_quarters is not None:
+            raise Exception("Can't re-solve a previous schedule with pinned quarters!")
+        start = time.perf_counter()
+
+        internship = student_config["internship"]
+        breadth_to_satisfy = student_config["breadth_areas"]
+        foundations_not_satisfied = (
+            student_config["foundations_not_satisfied"]
+            if student_config["foundations_not_satisfied"]
+            else []
+        )
+        custom_requests = (
+            student_config["subject_requests"]
+            if student_config["subject_requests"]
+            else {}
+        )
+
+        if len(breadth_to_satisfy) != 2:
+            raise Exception(
+                f"Must specify 2 breadth areas! Got {len(breadth_to_satisfy)}"
+            )
+
+        if len(foundations_not_satisfied) > 2:
+            raise Exception(
+                f"Can only handle up to 2 unsatisfied foundations! Got {len(foundations_not_satisfied)}"
+            )
+
+        # Filter to courses that satisfy CS program requirements (not including electives), without
+        # the foundations that are already satisfied
+        foundations_satisfied = FOUNDATION_AREAS - set(foundations_not_satisfied)
+        df_requirements = self.df_requirements.loc[
+            ~self.df_requirements["Subcategory"].isin(foundations_satisfied)
+        ]
+
+        courses_by_quarter_filtered: Dict[int, List[Course]] = {}
+        requirement_courses = set(df_requirements["Course"])
+        for quarter_index, courses in self.course_by_quarter.items():
+            courses_by_quarter_filtered[quarter_index] = [
+                course for course in courses if course.course_id in requirement_courses
+            ]
+
+        # No summer quarter after second year
+        del courses_by_quarter_filtered[8]
+
+        # Remove the summer quarter if student is doing an internship
+        if internship:
+            del courses_by_quarter_filtered[4]
+
+        course_id_to_name = {}
+        for courses in courses_by_quarter_filtered.values():
+            for course in courses:
+                course_id_to_name[course.course_id] = course.course_name
+        courses_by_topic = {
+            topic: course_ids & course_id_to_name.keys()
+            for topic, course_ids in self.courses_by_topic.items()
+        }
+
+        cspConstructor = SchedulingCSPConstructor(
+            courses_by_quarter_filtered,
+            df_requirements,
+            breadth_to_satisfy,
+            foundations_not_satisfied,
+            courses_by_topic["nlp"],
+            courses_by_topic["robotics"],
+            courses_by_topic["vision"],
+            courses_by_topic["health"],
+            custom_requests,
+            seed=self.seed,
+        )
+
+        solution_key = None
+        cached = None
+        if (
+            self.solution_cache is not None
+            and self.seed is not None
+            and previous_schedule is None
+            and pinned_quarters is None
+        ):
+            # A seeded construction always builds the same CSP, so the CSP identifies the solution
+            solution_key = solution_cache_key(
+                csp=csp_cache_key(cspConstructor), mcv=True, ac3=True
+            )
+            cached = self.solution_cache.get(solution_key)
+
+        if cached is not None:
+            assignment = cached["assignment"]
+            built = solved = time.perf_counter()
+        else:
+            if self.verbose > 0:
+                print("START constructing CSP")
+            overlay = None
+            if self.csp_cache is not None:
+                csp = self.csp_cache.get_csp(cspConstructor)
+            else:
+                # The internship and the foundations decide the courses and requirements, so profiles
+                # that only differ in the rest share a base CSP and only build their own overlay
+                base_key = (bool(internship), tuple(sorted(foundations_not_satisfied)))
+                base_csp = self.base_csps.get(base_key)
+                if base_csp is None:
+                    base_csp = cspConstructor.get_base_csp()
+                    self.base_csps[base_key] = base_csp
+                csp = base_csp
+                overlay = cspConstructor.add_profile_overlay(csp)
+            built = time.perf_counter()
+            if self.verbose > 0:
+                print("FINISHED constructing CSP")
+
+            if self.verbose > 0:
+                print("START solving CSP")
+            alg = BacktrackingSearch(self.progress_callback, self.progress_interval)
+            try:
+                root_key: Optional[Hashable] = None
+                # Only the pinned and repaired solves start from the root domains
+                searched_from_root = (
+                    pinned_quarters is not None or previous_schedule is not None
+                )
+                if searched_from_root and self.seed is not None:
+                    root_key = csp_cache_key(cspConstructor)
+                elif searched_from_root and self.csp_cache is None:
+                    # Without a seed, the base CSP of the profile is only built once by this solver
+                    root_key = (
+                        tuple(sorted(courses_by_quarter_filtered)),
+                        tuple(sorted(foundations_not_satisfied)),
+                        tuple(sorted(breadth_to_satisfy)),
+                        tuple(sorted(custom_requests.items())),
+                    )
+                if pinned_quarters is not None:
+                    domains = alg.solve_pinned(
+                        csp,
+                        self._get_root_domains(alg, csp, root_key),
+                        self._get_pinned_values(pinned_quarters, csp),
+                        mcv=True,
+                        ac3=True,
+                    )
+                elif previous_schedule is None:
+                    alg.solve(
+                        csp,
+                        mcv=True,
+                        ac3=True,
+                        checkpoint_path=checkpoint_path,
+                        # The signature of the search leaves out the binary factors, the key covers them
+                        checkpoint_key=(
+                            None
+                            if checkpoint_path is None
+                            else csp_cache_key(cspConstructor)
+                        ),
+                    )
+                else:
+                    quarter_class_variables = [
+                        f"Quarter {quarter} classes"
+                        for quarter in courses_by_quarter_filtered
+                    ]
+                    alg.resolve(
+                        csp,
+                        self._get_assignment(previous_schedule, csp),
+                        mcv=True,
+                        ac3=True,
+                        fixable_variables=quarter_class_variables,
+                        root_domains=self._get_root_domains(alg, csp, root_key),
+                    )
+            finally:
+                if overlay is not None:
+                    cspConstructor.remove_profile_overlay(csp, overlay)
+            solved = time.perf_counter()
+            if self.verbose > 0:
+                print("FINISHED solving CSP")
+
+            assignment = (
+                alg.allOptimalAssignments[0] if alg.allOptimalAssignments else None
+            )
+            if solution_key is not None and self.solution_cache is not None:
+                self.solution_cache.put(solution_key, {"assignment": assignment})
+
+        result: Dict[str, Any] = {
+            "solved": assignment is not None,
+            "schedule": None,
+            "cached": cached is not None,
+            "timings": {
+                "build_csp": built - start,
+                "solve_csp": solved - built,
+            },
+        }
+        if previous_schedule is not None:
+            result["repaired"] = [int(var.split()[1]) for var in alg.repaired_variables]
+        if pinned_quarters is not None:
+            result["options"] = {
+                quarter: [
+                    list(classes) if classes else []
+                    for classes in domains[f"Quarter {quarter} classes"]
+                ]
+                for quarter in courses_by_quarter_filtered
+            }
+        if assignment is not None:
+            result["schedule"] = self._get_schedule(assignment, course_id_to_name)
+        return result
+
+    def _get_root_domains(
+        self, alg: BacktrackingSearch, csp: CSP, root_key: Optional[Hashable]
+    ) -> Dict:
+        """
+        Returns the root domains of a CSP, see BacktrackingSearch.get_root_domains. They are kept under
+        root_key, unless it is None.
+        """
+        if root_key in self.root_domains:
+            self.root_domains.move_to_end(root_key)
+            return self.root_domains[root_key]
+
+        root_domains = alg.get_root_domains(csp)
+        if root_key is not None:
+            self.root_domains[root_key] = root_domains
+            while len(self.root_domains) > MAX_ROOT_DOMAINS:
+                self.root_domains.popitem(last=False)
+        return root_domains
+
+    @staticmethod
+    def _get_pinned_values(
+        pinned_quarters: Dict[int, List[str]], csp: CSP
+    ) -> Dict[str, List[Any]]:
+        """
+        Convert the courses pinned to quarters to the values the quarter class variables are pinned to.
+        """
+        pinned = {}
+        for quarter, course_ids in pinned_quarters.items():
+            var = f"Quarter {int(quarter)} classes"
+            if var not in csp.values:
+                raise Exception(f"Quarter {quarter} has no classes to pin!")
+            if course_ids:
+                pinned[var] = [
+                    classes
+                    for classes in csp.values[var]
+                    if classes is not None and set(course_ids) <= set(classes)
+                ]
+            else:
+                pinned[var] = [None]
+        return pinned
+
+    @staticmethod
+    def _get_assignment(schedule: List[Dict[str, Any]], csp: CSP) -> Dict[str, Any]:
+        """
+        Convert a schedule back to the values of the quarter class variables of a CSP, leaving out the
+        seminars. A quarter whose classes aren't a value of its variable anymore is left out.
+        """
+        assignment: Dict[str, Optional[Tuple[str, ...]]] = {}
+        for quarter_schedule in schedule:
+            var = f"Quarter {quarter_schedule['quarter']} classes"
+            if var not in csp.values:
+                continue
+            classes = tuple(
+                course["course"]
+                for course in quarter_schedule["courses"]
+                if course["units"] != 1
+            )
+            if not classes:
+                assignment[var] = None
+            elif classes in csp.values[var]:
+                assignment[var] = classes
+            elif classes[::-1] in csp.values[var]:
+                assignment[var] = classes[::-1]
+        return assignment
+
+    def _get_schedule(
+        self, assignment: Dict[str, Any], course_id_to_name: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Convert a CSP assignment to a schedule for quarters 1-7, taking a random one unit seminar in half
+        of the quarters with classes.
+        """
+        schedule = []
+        for i in range(7):
+            quarter_schedule = assignment.get(f"Quarter {i + 1} classes")
+
+            courses = []
+            if quarter_schedule:
+                for course in quarter_schedule:
+                    courses.append(
+                        {
+                            "course": course,
+                            "name": course_id_to_name[course],
+                            "units": 4,
+                        }
+                    )
+
+                take_seminar = random.random() <= 0.5
+                seminar_courses_quarter = self.seminar_courses_one_unit[i + 1]
+                if take_seminar and len(seminar_courses_quarter) > 0:
+                    seminar = random.sample(seminar_courses_quarter, 1)[0]
+                    courses.append(
+                        {
+                            "course": seminar.course_id,
+                            "name": seminar.course_name,
+                            "units": 1,
+                        }
+                    )
+
+            schedule.append(
+                {
+                    "quarter": i + 1,
+                    "season": INDEX_QUARTER[i % len(INDEX_QUARTER)],
+                    "courses": courses,
+                }
+            )
+        return schedule
+
+    def solve_profile_file(self, config_filepath: str) -> Dict[str, Any]:
+        """
+        Load and solve a student profile. Errors are reported in the result instead of raised, so that a
+        bad profile doesn't stop a batch.
+
+        Returns:
+        result - see solve, with the "profile" path, "error" message if any and the total time spent
+        """
+        start = time.perf_counter()
+        try:
+            result = self.solve(load_profile(config_filepath))
+            result["error"] = None
+        except Exception as error:
+            result = {
+                "solved": False,
+                "schedule": None,
+                "timings": {},
+                "error": f"{type(error).__name__}: {error}",
+            }
+        result["profile"] = config_filepath
+        result["timings"]["total"] = time.perf_counter() - start
+        return result
+
+
+def _init_batch_worker(solver: ProfileSolver) -> None:
+    global _BATCH_SOLVER
+    _BATCH_SOLVER = solver
+    # Forked workers inherit the random state of the parent and would all make the same random choices
+    random.seed()
+
+
+def _solve_batch_profile(config_filepath: str) -> Dict[str, Any]:
+    assert _BATCH_SOLVER is not None
+    return _BATCH_SOLVER.solve_profile_file(config_filepath)
+
+
+def solve_profiles(
+    solver: ProfileSolver,
+    profile_paths: List[str],
+    output_directory: str,
+    num_workers: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Solve many student profiles and write each result (see ProfileSolver.solve_profile_file) to
+    output_directory/<result name>.json as soon as it is done, see get_result_names.
+
+    Arguments:
+    solver - the solver shared by all the profiles
+    profile_paths - the yaml profile files
+    output_directory - the directory the results are written to
+    num_workers - the number of worker processes, 0 uses every core and 1 solves in this process. Where
+        processes are forked, the workers inherit the solver instead of receiving a copy.
+
+    Returns:
+    results - the results, in the order they finished
+    """
+    result_names = dict(zip(profile_paths, get_result_names(profile_paths)))
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+    num_workers = min(num_workers, len(profile_paths))
+
+    results = []
+
+    def write_result(result):
+        result_name = result_names[result["profile"]]
+        result_filepath = os.path.join(output_directory, f"{result_name}.json")
+        atomic_write(result_filepath, json.dumps(result, indent=2).encode())
+        results.append(result)
+
+    if num_workers <= 1:
+        for config_filepath in profile_paths:
+            write_result(solver.solve_profile_file(config_filepath))
+        return results
+
+    context: multiprocessing.context.BaseContext
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(
+        num_workers, initializer=_init_batch_worker, initargs=(solver,)
+    ) as pool:
+        for result in pool.imap_unordered(_solve_batch_profile, profile_paths):
+            write_result(result)
+    return results
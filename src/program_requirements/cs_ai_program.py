@@ -1,3 +1,4 @@
+import copy
 import pandas as pd
 from typing import List, Set, Tuple
 
@@ -128,6 +129,29 @@ class CSAIProgram(DegreeProgram):
             and self._is_unit_requirement_satisfied()
         )
 
+    def progress_key(self) -> Tuple:
+        """
+        Return a hashable summary of the remaining requirements. Two programs with the same key are
+        satisfied by, and count units for, the same future courses; the courses already taken are not
+        part of the key. Counters are clipped to the thresholds they are compared against.
+        """
+        return (
+            frozenset(self.foundations_areas_left),
+            frozenset(self.breadth_areas_left)
+            if len(self.breadth_areas_left) > 1
+            else frozenset(),
+            tuple(
+                sorted(
+                    (area, max(left, 0)) for area, left in self.depth_areas_left.items()
+                )
+            ),
+            max(self.depth_units_left, 0),
+            self.significant_implementation_satisfied,
+            min(self.total_requirement_units_taken, TOTAL_UNITS_REQUIRED),
+            self.foundation_units_counted,
+            self.seminar_units_taken,
+        )
+
     def take_course(
         self, df_requirements: pd.DataFrame, course_and_units: Tuple[Course, int]
     ) -> None:
@@ -138,7 +162,7 @@ class CSAIProgram(DegreeProgram):
         course_and_units - A tuple containing a course and units it is taken for. Eg (<CS 221 object>, 4)
         """
         course, units = course_and_units
-        full_course_code = f"{course.course_subject} {course.course_number}"
+        full_course_code = course.course_id
 
         requirements_satisfied = self.requirements_satisfied_by_course(
             df_requirements, course
@@ -152,6 +176,23 @@ class CSAIProgram(DegreeProgram):
             self.courses_taken.add(full_course_code)
             return
 
+        self._count_requirements(full_course_code, requirements_satisfied, units)
+        self.courses_taken.add(full_course_code)
+
+    def _count_requirements(
+        self,
+        full_course_code: str,
+        requirements_satisfied: List[Tuple[str, str]],
+        units: int,
+    ) -> None:
+        """
+        Update the remaining requirements and units for a course that satisfies the given requirements.
+
+        Arguments:
+        full_course_code - course code for the class, eg "CS 221"
+        requirements_satisfied - See requirements_satisfied_by_course.
+        units - The units the course is taken for.
+        """
         units_towards_degree = units
         for category, subcategory in requirements_satisfied:
 
@@ -177,7 +218,6 @@ class CSAIProgram(DegreeProgram):
             self.seminar_units_taken += units_towards_degree
 
         self.total_requirement_units_taken += units_towards_degree
-        self.courses_taken.add(full_course_code)
 
     def waive_course(self, df_requirements: pd.DataFrame, course: Course) -> None:
         """
@@ -188,7 +228,7 @@ class CSAIProgram(DegreeProgram):
         """
         foundations = df_requirements[df_requirements["Category"] == "foundation"]
 
-        full_course_code = f"{course.course_subject} {course.course_number}"
+        full_course_code = course.course_id
         if full_course_code not in set(foundations["Course"]):
             raise Exception(
                 f"Tried to waive {full_course_code}, but cannot waive a non-foundation course."
@@ -202,6 +242,34 @@ class CSAIProgram(DegreeProgram):
         for area in areas_satisfied:
             self.foundations_areas_left = self.foundations_areas_left - {area}
 
+    def progress_after(
+        self, courses_taken: List[Tuple[str, List[Tuple[str, str]], int]]
+    ) -> Tuple:
+        """
+        Returns the progress_key the program would have after taking the courses in order, without
+        modifying the program. The requirements a course satisfies are looked up after the courses
+        before it were taken, like take_course does, so two courses that satisfy the same single
+        requirement only count once towards it. Two unit choices for the same courses with the same
+        result leave the program with the same remaining requirements.
+
+        Arguments:
+        courses_taken - A list of (course code, rows of the course in the requirements file, units). Eg
+            [("CS 221", [("depth", "a")], 4)]
+
+        Returns:
+        progress - See progress_key.
+        """
+        program = copy.copy(self)
+        # The other requirements are replaced, not modified, when a course is counted
+        program.depth_areas_left = dict(self.depth_areas_left)
+        for course_code, requirement_rows, units in courses_taken:
+            requirements_satisfied = program.requirements_satisfied_by_rows(
+                course_code, requirement_rows
+            )
+            if requirements_satisfied:
+                program._count_requirements(course_code, requirements_satisfied, units)
+        return program.progress_key()
+
     def requirements_satisfied_by_course(
         self, df_requirements: pd.DataFrame, course: Course
     ) -> List[Tuple[str, str]]:
@@ -214,34 +282,50 @@ class CSAIProgram(DegreeProgram):
         Returns:
         requirements_satisfied - A list of all the requirement/sub-requirements pairs that are satisfied by the course.
         """
-        full_course_code = f"{course.course_subject} {course.course_number}"
+        full_course_code = course.course_id
         df_course = df_requirements.loc[df_requirements["Course"] == full_course_code]
 
+        return self.requirements_satisfied_by_rows(
+            full_course_code,
+            list(zip(df_course["Category"], df_course["Subcategory"])),
+        )
+
+    def requirements_satisfied_by_rows(
+        self, full_course_code: str, requirement_rows: List[Tuple[str, str]]
+    ) -> List[Tuple[str, str]]:
+        """
+        Same as requirements_satisfied_by_course, for a course whose rows in the requirements file were
+        already looked up.
+
+        Arguments:
+        full_course_code - course code for the class, eg "CS 221"
+        requirement_rows - The (Category, Subcategory) rows of the course in the requirements file.
+
+        Returns:
+        requirements_satisfied - A list of all the requirement/sub-requirements pairs that are satisfied by the course.
+        """
         requirements_satisfied = []
 
-        for _, row in df_course.iterrows():
+        for category, subcategory in requirement_rows:
 
-            if row["Category"] == "foundation":
-                if row["Subcategory"] in self.foundations_areas_left:
-                    requirements_satisfied.append((row["Category"], row["Subcategory"]))
+            if category == "foundation":
+                if subcategory in self.foundations_areas_left:
+                    requirements_satisfied.append((category, subcategory))
 
-            if row["Category"] == "breadth":
+            if category == "breadth":
                 if (
                     len(self.breadth_areas_left) > 1
-                    and row["Subcategory"] in self.breadth_areas_left
+                    and subcategory in self.breadth_areas_left
                 ):
-                    requirements_satisfied.append((row["Category"], row["Subcategory"]))
+                    requirements_satisfied.append((category, subcategory))
 
-            if row["Category"] == "depth":
-                if (
-                    self.depth_units_left > 0
-                    or self.depth_areas_left[row["Subcategory"]] > 0
-                ):
-                    requirements_satisfied.append((row["Category"], row["Subcategory"]))
+            if category == "depth":
+                if self.depth_units_left > 0 or self.depth_areas_left[subcategory] > 0:
+                    requirements_satisfied.append((category, subcategory))
 
-            if row["Category"] == "significant implementation":
+            if category == "significant implementation":
                 if not self.significant_implementation_satisfied:
-                    requirements_satisfied.append((row["Category"], row["Subcategory"]))
+                    requirements_satisfied.append((category, subcategory))
 
         if len(requirements_satisfied) == 0:
             if (
@@ -0,0 +1,313 @@
+import json
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# How often a request waiting for its worker checks whether it was cancelled, in seconds
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+def _solver_worker(solver, conn) -> None:
+    """
+    Worker process loop: solve every (student profile, solve options) received on the connection until
+    None is received.
+    """
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        student_config, options = request
+
+        start = time.perf_counter()
+        try:
+            result = solver.solve(student_config, **options)
+            result["error"] = None
+        except Exception as error:
+            result = {
+                "solved": False,
+                "schedule": None,
+                "timings": {},
+                "error": f"{type(error).__name__}: {error}",
+            }
+        result["timings"]["total"] = time.perf_counter() - start
+        conn.send(result)
+
+
+class SolverPool:
+    """
+    A fixed number of worker processes that solve student profiles with a shared solver, eg a
+    ProfileSolver. Where fork is available, the workers are forked from this process and inherit the
+    solver with everything it has loaded, so a request only pays for its own solve. A request that runs
+    past its timeout or is cancelled kills its worker, which is replaced by a new one.
+    """
+
+    def __init__(self, solver, num_workers: int = 1) -> None:
+        self.solver = solver
+        self.context: multiprocessing.context.BaseContext
+        if "fork" in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context("fork")
+        else:
+            self.context = multiprocessing.get_context()
+
+        self.lock = threading.Lock()
+        # request id -> Event set to cancel the request
+        self.requests: Dict[str, threading.Event] = {}
+        self.num_workers = num_workers
+        self.idle_workers: queue.Queue = queue.Queue()
+        self.closed = False
+        for _ in range(num_workers):
+            self.idle_workers.put(self._start_worker())
+
+    def _start_worker(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_solver_worker, args=(self.solver, child_conn), daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _replace_worker(self, worker) -> None:
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        if not self.closed:
+            self.idle_workers.put(self._start_worker())
+
+    def num_busy(self) -> int:
+        return self.num_workers - self.idle_workers.qsize()
+
+    def solve(
+        self,
+        student_config: Dict[str, Any],
+        timeout: Optional[float] = None,
+        request_id: Optional[str] = None,
+        previous_schedule: Optional[List[Dict[str, Any]]] = None,
+        pinned_quarters: Optional[Dict[int, List[str]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Solve a student profile on the first free worker.
+
+        Arguments:
+        student_config - the student profile
+        timeout - seconds before the request is given up, including the wait for a free worker
+        request_id - an id to cancel the request with while it runs, see cancel
+        previous_schedule - the schedule of the profile before it was edited, to re-solve from, see
+            ProfileSolver.solve
+        pinned_quarters - the courses pinned to quarters for a what-if query, see ProfileSolver.solve
+
+        Returns:
+        result - the result of solver.solve, with an "error" if it raised and the "total" time of the solve
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        cancelled = threading.Event()
+        if request_id is not None:
+            with self.lock:
+                if request_id in self.requests:
+                    raise Exception(f"Request {request_id} is already running!")
+                self.requests[request_id] = cancelled
+
+        try:
+            worker = self._get_idle_worker(deadline, cancelled)
+            process, conn = worker
+            try:
+                options: Dict[str, Any] = {}
+                if previous_schedule is not None:
+                    options["previous_schedule"] = previous_schedule
+                if pinned_quarters is not None:
+                    options["pinned_quarters"] = pinned_quarters
+                conn.send((student_config, options))
+                while not conn.poll(CANCEL_POLL_INTERVAL):
+                    if cancelled.is_set():
+                        raise RequestCancelled(f"Request {request_id} was cancelled")
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise TimeoutError(f"Request timed out after {timeout}s")
+                    if not process.is_alive():
+                        raise Exception("Worker process died")
+                result = conn.recv()
+            except BaseException:
+                # The worker may still be solving, so it can't take another request
+                self._replace_worker(worker)
+                raise
+            self.idle_workers.put(worker)
+            return result
+        finally:
+            if request_id is not None:
+                with self.lock:
+                    self.requests.pop(request_id, None)
+
+    def _get_idle_worker(self, deadline: Optional[float], cancelled: threading.Event):
+        while True:
+            try:
+                return self.idle_workers.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            if cancelled.is_set():
+                raise RequestCancelled("Request was cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("Request timed out waiting for a free worker")
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Cancel a running request. Returns False if no request with the id is running.
+        """
+        with self.lock:
+            cancelled = self.requests.get(request_id)
+        if cancelled is None:
+            return False
+        cancelled.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        while True:
+            try:
+                process, conn = self.idle_workers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+            conn.close()
+
+
+class ScheduleRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /schedule with {"profile": <student profile>, "timeout": <seconds>, "request_id": <id>} returns
+    the result of the profile as JSON. "timeout" and "request_id" are optional.
+    DELETE /schedule/<request_id> cancels a running request.
+    GET /health returns the number of workers and how many are busy.
+    """
+
+    server: "ScheduleServer"
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        pool = self.server.pool
+        self._send_json(
+            200, {"status": "ok", "workers": pool.num_workers, "busy": pool.num_busy()}
+        )
+
+    def do_DELETE(self) -> None:
+        prefix = "/schedule/"
+        if not self.path.startswith(prefix):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        request_id = self.path.split(prefix, 1)[1]
+        if self.server.pool.cancel(request_id):
+            self._send_json(200, {"cancelled": request_id})
+        else:
+            self._send_json(404, {"error": f"No running request {request_id}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/schedule":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            student_config = payload["profile"]
+            timeout = payload.get("timeout")
+            if timeout is None:
+                timeout = self.server.request_timeout
+            else:
+                # NaN and inf would skip the cap below and hold a worker indefinitely
+                if (
+                    isinstance(timeout, bool)
+                    or not isinstance(timeout, (int, float))
+                    or not math.isfinite(timeout)
+                    or timeout <= 0
+                ):
+                    raise ValueError(
+                        f"timeout must be a positive number, got {timeout}"
+                    )
+                timeout = float(timeout)
+                if self.server.request_timeout is not None:
+                    timeout = min(timeout, self.server.request_timeout)
+            request_id = payload.get("request_id")
+            previous_schedule = payload.get("previous_schedule")
+            pinned_quarters = payload.get("pinned_quarters")
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {"error": f"Invalid request: {error}"})
+            return
+
+        try:
+            result = self.server.pool.solve(
+                student_config, timeout, request_id, previous_schedule, pinned_quarters
+            )
+        except TimeoutError as error:
+            self._send_json(504, {"error": str(error)})
+            return
+        except RequestCancelled as error:
+            self._send_json(409, {"error": str(error)})
+            return
+        except Exception as error:
+            self._send_json(500, {"error": str(error)})
+            return
+
+        self._send_json(400 if result["error"] else 200, result)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose > 0:
+            super().log_message(format, *args)
+
+
+class ScheduleServer(ThreadingHTTPServer):
+    """
+    HTTP server that keeps a solver warm and answers schedule requests with a SolverPool, see
+    ScheduleRequestHandler.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        solver,
+        num_workers: int = 1,
+        request_timeout: Optional[float] = 60.0,
+        verbose: int = 0,
+    ) -> None:
+        """
+        Arguments:
+        address - the (host, port) to listen on. Port 0 picks a free port.
+        solver - the solver of the workers, eg a ProfileSolver
+        num_workers - the number of worker processes
+        request_timeout - the maximum number of seconds a request may take, None for no limit
+        """
+        # Fork the workers before the server starts any thread
+        self.pool = SolverPool(solver, num_workers)
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+        super().__init__(address, ScheduleRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.close()
@@ -1,9 +1,14 @@
-from typing import Tuple, List, Dict, Optional
+from typing import Tuple, List, Dict, Hashable, Iterator, Optional, Set
 from .course_scheduler import State
 from .course import ExploreCourse, Course
+from .course_catalog import CourseCatalog
 import copy
 import heapq
+import itertools
+import multiprocessing
+import numpy as np
 import os
+import traceback
 import pandas as pd
 
 from .constants import (
@@ -12,7 +17,41 @@ from .constants import (
     MAX_CLASS_REWARD,
     CS_AI_PROGRAM_FILE,
 )
+from .checkpoint import Checkpointer
 from .program_requirements.cs_ai_program import CSAIProgram
+from .solution_cache import search_cache_key
+
+
+class CandidateCourse:
+    """_summary_
+    A course that can be scheduled by the search model, with everything the action
+    generation needs precomputed when the problem is built.
+
+    Args:
+        course (Course): the course object
+        course_code (str): eg "CS 221"
+        course_bit (int): bit of the course number in State.course_taken_mask
+        course_index (int): row of the course in the FindCourses course catalog and arrays
+        course_number_value (int): numeric part of the course number, eg 224 for "224N"
+        requirement_rows (List[Tuple[str, str]]): (Category, Subcategory) rows of the course
+            in the program requirements file
+    """
+
+    def __init__(
+        self,
+        course: Course,
+        course_code: str,
+        course_bit: int,
+        course_index: int,
+        course_number_value: int,
+        requirement_rows: List[Tuple[str, str]],
+    ) -> None:
+        self.course = course
+        self.course_code = course_code
+        self.course_bit = course_bit
+        self.course_index = course_index
+        self.course_number_value = course_number_value
+        self.requirement_rows = requirement_rows
 
 
 class FindCourses:
@@ -56,126 +95,216 @@ class FindCourses:
         foundation_courses = set()
         for course_list in self.explore_course.class_database.values():
             for course in course_list:
-                if f"{course.course_subject} {course.course_number}" in foundations:
+                if course.course_id in foundations:
                     foundation_courses.add(course)
 
         for course in foundation_courses:
             self.program_object_initial.waive_course(self.df_requirements, course)
 
-    def _get_actions(self, state: State) -> List[List[Tuple[Course, int]]]:
+        self._build_candidate_index()
+
+    def _build_candidate_index(self) -> None:
         """_summary_
-        Get filtered actions(course combinations).
+        Precompute, once per problem, the courses each quarter can offer as actions:
+        courses with 3-5 units and a course number >= 100, their parsed course numbers
+        and their rows in the program requirements. Courses taken are tracked as a bitset
+        over course numbers (State.course_taken_mask). The courses are stored in a
+        CourseCatalog, and rewards and unit bounds of the candidates are kept in arrays
+        indexed by CandidateCourse.course_index, their row in the catalog.
+        """
+        requirement_rows: Dict[str, List[Tuple[str, str]]] = {}
+        for course_code, category, subcategory in zip(
+            self.df_requirements["Course"],
+            self.df_requirements["Category"],
+            self.df_requirements["Subcategory"],
+        ):
+            requirement_rows.setdefault(course_code, []).append((category, subcategory))
+
+        self.catalog = CourseCatalog.from_class_database(
+            self.explore_course.class_database
+        )
+        self.course_number_bits: Dict[str, int] = {}
+        self.candidates_by_quarter: Dict[int, List[CandidateCourse]] = {}
+        for quarter in self.catalog.quarters():
+            # TODO: remove this logic; it is only here for MVP
+            # Only get courses where min is >=3 units and max is <=5 units, and courses where the
+            # course number is >=100
+            rows = self.catalog.filter(
+                quarter=quarter, min_units=3, max_units=5, min_number=100
+            )
+
+            candidates = []
+            for row in rows.tolist():
+                course = self.catalog.course(row)
+                candidates.append(
+                    CandidateCourse(
+                        course,
+                        course.course_id,
+                        self._get_course_bit(course),
+                        row,
+                        int(self.catalog.course_number_values[row]),
+                        requirement_rows.get(course.course_id, []),
+                    )
+                )
+            self.candidates_by_quarter[quarter] = candidates
+
+        self.course_rewards = self.catalog.rewards
+        self.course_units_min = self.catalog.units_min.astype(np.int64)
+        self.course_units_max = self.catalog.units_max.astype(np.int64)
+
+    def _get_course_bit(self, course: Course) -> int:
+        """_summary_
+        Returns the bit of the course number in State.course_taken_mask, assigning a new
+        one the first time the course number is seen.
+        """
+        course_bit = self.course_number_bits.get(course.course_number)
+        if course_bit is None:
+            course_bit = 1 << len(self.course_number_bits)
+            self.course_number_bits[course.course_number] = course_bit
+        return course_bit
+
+    def _get_actions(
+        self, state: State
+    ) -> Iterator[Tuple[float, List[Tuple[Course, int]]]]:
+        """_summary_
+        Get filtered actions(course combinations), scored by their quarter cost.
         Filters: 1.offered in the quarter, 2.not taken before, 3.satisfy
         units requirement in categories, 4.quarter unit requirement(8-10)
         5.maximum 2 courses/quarter
 
-        Args:
-            quarter_index (int): _description_
-            remaining_units (int): _description_
-            courses_taken (Set[Course]): _description_
+        Each unordered course pair is yielded once, and unit splits of a pair that make the
+        same requirement progress (see CSAIProgram.progress_after) are collapsed into the
+        cheapest one. All actions are scored at once by _score_actions and yielded lazily,
+        cheapest first; they carry no program object, the program update is only applied
+        by successors_and_cost to the actions that are kept.
 
-        Raises:
-            Exception: _description_
+        Args:
+            state (State): the state to expand
 
         Returns:
-            Set[Course]: _description_
+            Iterator[Tuple[float, List[Tuple[Course, int]]]]: (cost, [(course1, units1), (course2, units2)])
         """
 
         # Filter out the quarter if planning to do internship during the summer
         nxt_quarter = state.current_quarter + 1
         if self.internship and (nxt_quarter == 4 or nxt_quarter == 8):
-            return []
-
-        # Offered in the next quarter
-        courses_offered = self.explore_course.class_database[state.current_quarter + 1]
+            return
 
-        # Not taken before
-        taken_numbers = set([course.course_number for course in state.course_taken])
-        candidate_courses = []
-        for course in courses_offered:
-            if course.course_number not in taken_numbers:
-                candidate_courses.append(course)
-
-        # TODO: remove this logic; it is only here for MVP
-        # Only get courses where min is >=3 units and max is <=5 units, and courses where the
-        # course number is >=200
+        # Offered in the next quarter and not taken before
         candidate_courses = [
-            course
-            for course in candidate_courses
-            if course.units[0] >= 3 and course.units[1] <= 5
-        ]
-
-        candidate_courses = [
-            course
-            for course in candidate_courses
-            if int("".join(filter(str.isdigit, course.course_number))) >= 100
+            candidate
+            for candidate in self.candidates_by_quarter.get(nxt_quarter, [])
+            if not candidate.course_bit & state.course_taken_mask
         ]
 
         # TODO: Add hard requriments for prerequisites
 
-        # Combinations
-        actions = []
+        # Requirements satisfied by each remaining candidate; courses that don't help are dropped
         found_req = state.program_object._is_foundations_satisfied()
         breath_req = state.program_object._is_breadth_satisfied()
         depth_req = state.program_object._is_depth_satisfied()
         sig_req = state.program_object._is_significant_implementation_satisfied()
-        for course1 in candidate_courses:
+        candidate_requirements = []
+        for candidate in candidate_courses:
             # Filter to courses that satisfy remaining requirements
-            req_course1 = state.program_object.requirements_satisfied_by_course(
-                self.df_requirements, course1
+            req_course = state.program_object.requirements_satisfied_by_rows(
+                candidate.course_code, candidate.requirement_rows
             )
             # Not take any electives if the prevoius requirements were not satisfied
-            if (len(req_course1) == 0) or (
-                len(req_course1) == 1
-                and req_course1[0][0] == "elective"
+            if (len(req_course) == 0) or (
+                len(req_course) == 1
+                and req_course[0][0] == "elective"
                 and not (found_req and breath_req and depth_req and sig_req)
             ):
                 continue
+            candidate_requirements.append((candidate, req_course))
 
-            for course2 in candidate_courses:
-                if course1 == course2:
-                    continue
+        # Combinations, cheapest first
+        first, second, units_first, units_second, costs = self._score_actions(
+            [candidate for candidate, _ in candidate_requirements]
+        )
 
-                # Filter to courses that satisfy remaining requirements
-                req_course2 = state.program_object.requirements_satisfied_by_course(
-                    self.df_requirements, course2
-                )
-                # Not take any electives if the prevoius requirements were not satisfied
-                if (len(req_course2) == 0) or (
-                    len(req_course2) == 1
-                    and req_course2[0][0] == "elective"
-                    and not (found_req and breath_req and depth_req and sig_req)
-                ):
-                    continue
+        # Unit splits of a pair that make the same requirement progress are collapsed
+        # into the cheapest one, which is the first one seen
+        seen = set()
+        for i, j, units1, units2, cost in zip(
+            first.tolist(),
+            second.tolist(),
+            units_first.tolist(),
+            units_second.tolist(),
+            costs.tolist(),
+        ):
+            candidate1 = candidate_requirements[i][0]
+            candidate2 = candidate_requirements[j][0]
+            progress = state.program_object.progress_after(
+                [
+                    (candidate1.course_code, candidate1.requirement_rows, units1),
+                    (candidate2.course_code, candidate2.requirement_rows, units2),
+                ]
+            )
+            if (i, j, progress) in seen:
+                continue
+            seen.add((i, j, progress))
+
+            yield cost, [(candidate1.course, units1), (candidate2.course, units2)]
+
+    def _score_actions(
+        self, candidates: List[CandidateCourse]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """_summary_
+        Score every (unordered course pair, unit split) action of a quarter in one
+        vectorized pass. The cost of an action is the same as _get_quarter_cost.
+
+        Args:
+            candidates (List[CandidateCourse]): the courses that can be taken this quarter
+
+        Returns:
+            Tuple[np.ndarray, ...]: (first course, second course, units of the first course,
+                units of the second course, cost), sorted by cost. Courses are positions in
+                `candidates`; ties keep the (first, second, units1, units2) order.
+        """
+        if len(candidates) < 2:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty, empty, np.array([], dtype=np.float64)
+
+        course_indices = np.array(
+            [candidate.course_index for candidate in candidates], dtype=np.int64
+        )
+        rewards = self.course_rewards[course_indices]
+        units_min = self.course_units_min[course_indices]
+        units_max = self.course_units_max[course_indices]
+
+        # All unordered pairs, by all unit values: shape (pairs, units, units)
+        pair_first, pair_second = np.triu_indices(len(candidates), k=1)
+        units = np.arange(units_min.min(), units_max.max() + 1)
+        units1 = units[None, :, None]
+        units2 = units[None, None, :]
+        valid = (
+            (units1 >= units_min[pair_first][:, None, None])
+            & (units1 <= units_max[pair_first][:, None, None])
+            & (units2 >= units_min[pair_second][:, None, None])
+            & (units2 <= units_max[pair_second][:, None, None])
+            & (units1 + units2 >= MIN_UNITS_PER_QUARTER)
+            & (units1 + units2 <= MAX_UNITS_PER_QUARTER)
+        )
+        pair, units1_index, units2_index = np.nonzero(valid)
+
+        first = pair_first[pair]
+        second = pair_second[pair]
+        units_first = units[units1_index]
+        units_second = units[units2_index]
+        costs = (units_first + units_second) * MAX_CLASS_REWARD - (
+            units_first * rewards[first] + units_second * rewards[second]
+        )
 
-                # try different combinations of course units
-                for units1 in range(course1.units[0], course1.units[1] + 1):
-                    for units2 in range(course2.units[0], course2.units[1] + 1):
-                        if (
-                            units1 + units2 >= MIN_UNITS_PER_QUARTER
-                            and units1 + units2 <= MAX_UNITS_PER_QUARTER
-                        ):
-                            new_program_object = copy.deepcopy(state.program_object)
-
-                            new_program_object.take_course(
-                                self.df_requirements, (course1, units1)
-                            )
-                            new_program_object.take_course(
-                                self.df_requirements, (course2, units2)
-                            )
-                            actions.append(
-                                [
-                                    (course1, units1),
-                                    (course2, units2),
-                                    new_program_object,
-                                ]
-                            )
-                # print('course1',course1.course_name)
-                # print('req1_satisfied', req_course1)
-                # print('course2',course2.course_name)
-                # print('req2_satisfied', req_course2)
-                # print()
-        return actions
+        order = np.argsort(costs, kind="stable")
+        return (
+            first[order],
+            second[order],
+            units_first[order],
+            units_second[order],
+            costs[order],
+        )
 
     def _get_quarter_cost(self, enrolled_courses: List[Tuple[Course, int]]) -> float:
         """_summary_
@@ -212,14 +341,19 @@ class FindCourses:
         foundation_courses = set()
         for course_list in self.explore_course.class_database.values():
             for course in course_list:
-                if f"{course.course_subject} {course.course_number}" in foundations:
+                if course.course_id in foundations:
                     foundation_courses.add(course)
 
+        course_taken_mask = 0
+        for course in foundation_courses:
+            course_taken_mask |= self._get_course_bit(course)
+
         return State(
             0,
             list(foundation_courses),
             self.units_requirement,
             self.program_object_initial,
+            course_taken_mask,
         )
 
     def is_end(self, state: State) -> bool:
@@ -236,6 +370,36 @@ class FindCourses:
         """
         return state.program_object.is_program_satisfied()
 
+    def dominance_key(self, state: State) -> Tuple:
+        """_summary_
+        States with the same key are in the same quarter with the same requirement
+        progress; of those, the one reached with the lowest past cost dominates the others.
+
+        Args:
+            state (State): _description_
+
+        Returns:
+            Tuple: (quarter, requirement progress)
+        """
+        return state.current_quarter, state.program_object.progress_key()
+
+    def state_key(self, state: State) -> Tuple:
+        """_summary_
+        Canonical key of a state: states with the same key have the same quarter, courses
+        taken and requirement progress, and so the same successors.
+
+        Args:
+            state (State): _description_
+
+        Returns:
+            Tuple: (quarter, courses taken bitset, requirement progress)
+        """
+        return (
+            state.current_quarter,
+            state.course_taken_mask,
+            state.program_object.progress_key(),
+        )
+
     def successors_and_cost(
         self, state: State
     ) -> List[Tuple[List[Tuple[Course, int]], State, float]]:
@@ -253,22 +417,25 @@ class FindCourses:
         if state.current_quarter + 1 > self.max_quarter:
             return []
 
-        actions = self._get_actions(state)
+        # Actions come cheapest first, so only the first max_successors are built
+        best_actions = itertools.islice(self._get_actions(state), self.max_successors)
         successors = []
-        for action_list in actions:
+        for suc_cost, action in best_actions:
             suc_current_quarter = state.current_quarter + 1
             suc_remaining_units = copy.deepcopy(state.remaining_units)
 
-            action = [action_list[0], action_list[1]]
-            new_program_object = action_list[2]
+            # Only the surviving actions pay for a copy of the program object
+            new_program_object = copy.deepcopy(state.program_object)
 
+            suc_course_taken_mask = state.course_taken_mask
             courses_this_quarter = []
             for course, units in action:
+                new_program_object.take_course(self.df_requirements, (course, units))
                 suc_remaining_units[course.course_category] -= units
+                suc_course_taken_mask |= self._get_course_bit(course)
                 courses_this_quarter.append(course)
 
             suc_courses_taken = state.course_taken + courses_this_quarter
-            suc_cost = self._get_quarter_cost(action)
             # print(suc_courses_taken)
 
             successors.append(
@@ -279,6 +446,7 @@ class FindCourses:
                         suc_courses_taken,
                         suc_remaining_units,
                         new_program_object,
+                        suc_course_taken_mask,
                     ),
                     suc_cost,
                 )
@@ -294,23 +462,71 @@ class FindCourses:
                         copy.deepcopy(state.course_taken),
                         copy.deepcopy(state.remaining_units),
                         copy.deepcopy(state.program_object),
+                        state.course_taken_mask,
                     ),
                     1000,
                 )
             )
 
-        best_successors = sorted(successors, key=lambda x: x[2])[: self.max_successors]
-        return best_successors
+        return successors
 
 
 class UniformCostSearch:
-    def __init__(self, verbose: int = 0):
+    def __init__(
+        self,
+        verbose: int = 0,
+        prune_dominated: bool = False,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: float = 5.0,
+    ):
+        """_summary_
+
+        Args:
+            verbose (int): _description_
+            prune_dominated (bool): discard states whose (quarter, requirement progress)
+                was already reached with a lower or equal past cost. Such states differ only
+                in which courses were taken, so pruning may drop a schedule that needed
+                one of the courses the dominating state used up. This makes it a heuristic
+                that trades optimality for speed, so it is off by default.
+            checkpoint_path (str): when given, the frontier, backpointers and counters are
+                checkpointed to this file, see Checkpointer, and a search of the same
+                problem resumes from it. The file is removed once the search is done.
+            checkpoint_interval (float): minimum number of seconds between checkpoints
+        """
         self.verbose = verbose
+        self.prune_dominated = prune_dominated
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
 
         self.actions: Optional[List[List[Tuple[Course, int]]]] = None
         self.path_cost: Optional[float] = None
         self.num_states_explored: int = 0
+        self.num_states_pruned: int = 0
         self.past_costs: Dict[State, float] = {}
+        # Map (quarter, requirement progress) -> lowest past cost it was reached with.
+        self.transposition_table: Dict[Tuple, float] = {}
+        self.frontier: Optional[PriorityQueue] = None
+
+    def _is_dominated(
+        self, problem: FindCourses, state: State, past_cost: float
+    ) -> bool:
+        """
+        Return whether a state with the same dominance key was reached more cheaply, and
+        otherwise record `past_cost` as the best cost for the key.
+        """
+        key = problem.dominance_key(state)
+        best_cost = self.transposition_table.get(key)
+        if best_cost is not None and best_cost <= past_cost:
+            return True
+        self.transposition_table[key] = past_cost
+        return False
+
+    @staticmethod
+    def _print_frontier_stats(frontier: "PriorityQueue") -> None:
+        print(
+            f"frontier: pushes = {frontier.num_pushes}, stale pops = {frontier.num_stale_pops}, "
+            f"compactions = {frontier.num_compactions}, peak size = {frontier.peak_size}"
+        )
 
     def solve(self, problem: FindCourses) -> None:
         """
@@ -318,24 +534,82 @@ class UniformCostSearch:
 
         """
 
-        # Initialize data structures
-        frontier = PriorityQueue()  # Explored states are maintained by the frontier.
-        backpointers: Dict[
-            State, Tuple[List[Tuple[Course, int]], State]
-        ] = {}  # Map state -> previous state.
-
-        # Add the start state
-        start_state = problem.start_state()
-        frontier.update(start_state, 0.0)
+        checkpointer = None
+        checkpoint = None
+        if self.checkpoint_path is not None:
+            # The rewards are part of the problem, so only a seeded problem is resumed
+            signature = search_cache_key(
+                problem, {"algorithm": "ucs", "prune_dominated": self.prune_dominated}
+            )
+            checkpointer = Checkpointer(
+                self.checkpoint_path, signature, self.checkpoint_interval
+            )
+            checkpoint = checkpointer.load()
+
+        frontier: PriorityQueue  # Explored states are maintained by the frontier.
+        # Map state -> (action, previous state).
+        backpointers: Dict[State, Tuple[List[Tuple[Course, int]], State]]
+        if checkpoint is not None:
+            # The states are pickled together, so the frontier and the backpointers
+            # still share them
+            frontier = checkpoint["frontier"]
+            backpointers = checkpoint["backpointers"]
+            start_state = checkpoint["start_state"]
+            self.past_costs = checkpoint["past_costs"]
+            self.transposition_table = checkpoint["transposition_table"]
+            self.num_states_explored = checkpoint["num_states_explored"]
+            self.num_states_pruned = checkpoint["num_states_pruned"]
+            if self.verbose >= 1:
+                print(
+                    f"Resuming from {self.checkpoint_path} after exploring "
+                    f"{self.num_states_explored} states"
+                )
+        else:
+            # Initialize data structures
+            frontier = PriorityQueue()
+            backpointers = {}
+
+            # Add the start state
+            start_state = problem.start_state()
+            frontier.update(start_state, 0.0, problem.state_key(start_state))
+            if self.prune_dominated:
+                self.transposition_table[problem.dominance_key(start_state)] = 0.0
+        self.frontier = frontier
 
         while True:
+            if checkpointer is not None and checkpointer.is_due():
+                checkpointer.save(
+                    {
+                        "frontier": frontier,
+                        "backpointers": backpointers,
+                        "start_state": start_state,
+                        "past_costs": self.past_costs,
+                        "transposition_table": self.transposition_table,
+                        "num_states_explored": self.num_states_explored,
+                        "num_states_pruned": self.num_states_pruned,
+                    }
+                )
+
             # Remove the state from the queue with the lowest past_cost (priority).
             state, past_cost = frontier.remove_min()
             if state is None and past_cost is None:
+                if checkpointer is not None:
+                    checkpointer.remove()
                 if self.verbose >= 1:
                     print("Searched the entire search space!")
+                    print(f"num_states_pruned = {self.num_states_pruned}")
+                    self._print_frontier_stats(frontier)
                 return
 
+            # A cheaper state with the same requirement progress was found after this
+            # one was queued.
+            if (
+                self.prune_dominated
+                and self.transposition_table[problem.dominance_key(state)] < past_cost
+            ):
+                self.num_states_pruned += 1
+                continue
+
             # Update tracking variables
             self.past_costs[state] = past_cost
             self.num_states_explored += 1
@@ -351,8 +625,12 @@ class UniformCostSearch:
                     state = prevState
                 self.actions.reverse()
                 self.path_cost = past_cost
+                if checkpointer is not None:
+                    checkpointer.remove()
                 if self.verbose >= 1:
                     print(f"num_states_explored = {self.num_states_explored}")
+                    print(f"num_states_pruned = {self.num_states_pruned}")
+                    self._print_frontier_stats(frontier)
                     print(f"path_cost = {self.path_cost}")
                     print(f"actions = {self.actions}")
                 return
@@ -362,43 +640,451 @@ class UniformCostSearch:
                 if self.verbose >= 3:
                     print(f"\t{state} => {new_state} (Cost: {past_cost} + {cost})")
 
-                if frontier.update(new_state, past_cost + cost):
+                if self.prune_dominated and self._is_dominated(
+                    problem, new_state, past_cost + cost
+                ):
+                    self.num_states_pruned += 1
+                    continue
+
+                # States are queued by key: a state reached again by another path is a
+                # new object, and only the cheaper of the two stays live
+                if frontier.update(
+                    new_state, past_cost + cost, problem.state_key(new_state)
+                ):
                     # We found better way to go to `new_state` --> update backpointer!
                     backpointers[new_state] = (action, state)
 
 
+class IterativeDeepeningSearch:
+    def __init__(
+        self,
+        verbose: int = 0,
+        memory_cap: int = 100000,
+        cost_step: float = 10.0,
+        prune_dominated: bool = False,
+    ):
+        """_summary_
+        Memory-bounded alternative to UniformCostSearch: iterative deepening on the path
+        cost (IDA* with a zero heuristic). Each iteration is a depth-first search that
+        only keeps the current path and a transposition table of at most memory_cap
+        states, so memory grows with max_quarter rather than with the frontier.
+
+        Args:
+            verbose (int): _description_
+            memory_cap (int): maximum number of entries in the transposition table, which
+                skips states reached again within an iteration at no lower cost. States are
+                keyed by FindCourses.state_key, or by FindCourses.dominance_key when
+                prune_dominated is set
+            cost_step (float): minimum increase of the cost bound between iterations.
+                Larger steps mean fewer iterations; the result stays optimal because each
+                iteration keeps the cheapest solution found below its bound.
+            prune_dominated (bool): same as in UniformCostSearch
+        """
+        self.verbose = verbose
+        self.memory_cap = memory_cap
+        self.cost_step = cost_step
+        self.prune_dominated = prune_dominated
+
+        self.actions: Optional[List[List[Tuple[Course, int]]]] = None
+        self.path_cost: Optional[float] = None
+        self.num_states_explored: int = 0
+        self.num_states_pruned: int = 0
+        self.num_iterations: int = 0
+        # Map state key -> lowest past cost in the current iteration.
+        self.transposition_table: Dict[Tuple, float] = {}
+
+    def solve(self, problem: FindCourses) -> None:
+        """
+        Run iterative deepening search on the specified `problem` instance.
+
+        """
+        start_state = problem.start_state()
+        cost_bound = 0.0
+
+        while True:
+            self.num_iterations += 1
+            self.transposition_table = {}
+            if self.verbose >= 2:
+                print(f"Iteration {self.num_iterations} with cost bound {cost_bound}")
+
+            next_cost_bound = self._search(problem, start_state, 0.0, cost_bound, [])
+
+            if self.path_cost is not None:
+                if self.verbose >= 1:
+                    print(f"num_iterations = {self.num_iterations}")
+                    print(f"num_states_explored = {self.num_states_explored}")
+                    print(f"num_states_pruned = {self.num_states_pruned}")
+                    print(f"path_cost = {self.path_cost}")
+                    print(f"actions = {self.actions}")
+                return
+
+            if next_cost_bound == float("inf"):
+                if self.verbose >= 1:
+                    print("Searched the entire search space!")
+                    print(f"num_states_pruned = {self.num_states_pruned}")
+                return
+
+            cost_bound = max(next_cost_bound, cost_bound + self.cost_step)
+
+    def _search(
+        self,
+        problem: FindCourses,
+        state: State,
+        past_cost: float,
+        cost_bound: float,
+        path: List[List[Tuple[Course, int]]],
+    ) -> float:
+        """
+        Depth-first search below `cost_bound`, keeping the cheapest solution found in
+        self.actions and self.path_cost.
+
+        Returns:
+            float: the lowest past cost that exceeded `cost_bound`, or inf if none did
+        """
+        if past_cost > cost_bound:
+            return past_cost
+
+        # Branch and bound: the incumbent is at least as cheap.
+        if self.path_cost is not None and past_cost >= self.path_cost:
+            return float("inf")
+
+        if self.prune_dominated:
+            key = problem.dominance_key(state)
+        else:
+            key = problem.state_key(state)
+        best_cost = self.transposition_table.get(key)
+        if best_cost is not None and best_cost <= past_cost:
+            self.num_states_pruned += 1
+            return float("inf")
+        if best_cost is not None or len(self.transposition_table) < self.memory_cap:
+            self.transposition_table[key] = past_cost
+
+        self.num_states_explored += 1
+        if self.verbose >= 2:
+            print(f"Exploring {state} with past_cost {past_cost}")
+
+        if problem.is_end(state):
+            self.actions = list(path)
+            self.path_cost = past_cost
+            return float("inf")
+
+        next_cost_bound = float("inf")
+        for action, new_state, cost in problem.successors_and_cost(state):
+            if self.verbose >= 3:
+                print(f"\t{state} => {new_state} (Cost: {past_cost} + {cost})")
+
+            path.append(action)
+            next_cost_bound = min(
+                next_cost_bound,
+                self._search(problem, new_state, past_cost + cost, cost_bound, path),
+            )
+            path.pop()
+
+        return next_cost_bound
+
+
+class HashDistributedSearch:
+    def __init__(
+        self,
+        verbose: int = 0,
+        num_workers: Optional[int] = None,
+        expansions_per_round: int = 64,
+        prune_dominated: bool = False,
+    ):
+        """_summary_
+        Parallel best-first search in the style of HDA*: every state is owned by the worker
+        process given by the hash of its key, and each worker keeps its own open and closed
+        lists. Workers expand their cheapest states in rounds; the coordinator routes the
+        successors to their owners and keeps the cheapest solution found. The search stops
+        once no states are in flight and no worker has an open state cheaper than that
+        solution, so its cost is optimal.
+
+        Args:
+            verbose (int): _description_
+            num_workers (int): number of worker processes; defaults to the number of cores
+            expansions_per_round (int): states each worker expands between two rounds
+            prune_dominated (bool): key states by FindCourses.dominance_key instead of
+                FindCourses.state_key (see UniformCostSearch)
+        """
+        self.verbose = verbose
+        self.num_workers = num_workers if num_workers else os.cpu_count() or 1
+        self.expansions_per_round = expansions_per_round
+        self.prune_dominated = prune_dominated
+
+        self.actions: Optional[List[List[Tuple[Course, int]]]] = None
+        self.path_cost: Optional[float] = None
+        self.num_states_explored: int = 0
+        self.num_states_pruned: int = 0
+        self.num_rounds: int = 0
+        self.num_states_explored_per_worker: List[int] = []
+
+    def solve(self, problem: FindCourses) -> None:
+        """
+        Run the hash-distributed search on the specified `problem` instance.
+
+        """
+        context = multiprocessing.get_context()
+        connections = []
+        workers = []
+        for _ in range(self.num_workers):
+            parent_connection, child_connection = context.Pipe()
+            worker = context.Process(
+                target=_hash_distributed_worker,
+                args=(
+                    problem,
+                    child_connection,
+                    self.expansions_per_round,
+                    self.prune_dominated,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            connections.append(parent_connection)
+            workers.append(worker)
+
+        try:
+            self._run(problem, connections)
+        finally:
+            for connection in connections:
+                try:
+                    connection.send(("stop",))
+                except OSError:
+                    # The worker already exited
+                    pass
+                connection.close()
+            for worker in workers:
+                worker.join()
+
+    def _get_owner(self, problem: FindCourses, state: State) -> int:
+        """
+        Return the index of the worker that owns `state`.
+        """
+        if self.prune_dominated:
+            key = problem.dominance_key(state)
+        else:
+            key = problem.state_key(state)
+        return hash(key) % self.num_workers
+
+    def _run(self, problem: FindCourses, connections: List) -> None:
+        """
+        Coordinate the rounds until the cheapest solution is proven optimal.
+        """
+        inboxes: List[List] = [[] for _ in range(self.num_workers)]
+        start_state = problem.start_state()
+        inboxes[self._get_owner(problem, start_state)].append((start_state, 0.0, []))
+        self.num_states_explored_per_worker = [0] * self.num_workers
+
+        while True:
+            self.num_rounds += 1
+            incumbent = float("inf") if self.path_cost is None else self.path_cost
+            for connection, inbox in zip(connections, inboxes):
+                connection.send(("expand", inbox, incumbent))
+
+            inboxes = [[] for _ in range(self.num_workers)]
+            min_open_cost = float("inf")
+            for i, connection in enumerate(connections):
+                reply = connection.recv()
+                if reply[0] == "error":
+                    raise Exception(f"Search worker {i} failed:\n{reply[1]}")
+
+                _, outgoing, goals, open_cost, num_explored, num_pruned = reply
+                min_open_cost = min(min_open_cost, open_cost)
+                self.num_states_explored_per_worker[i] += num_explored
+                self.num_states_explored += num_explored
+                self.num_states_pruned += num_pruned
+
+                for past_cost, path in goals:
+                    if self.path_cost is None or past_cost < self.path_cost:
+                        self.path_cost = past_cost
+                        self.actions = path
+
+                for new_state, past_cost, path in outgoing:
+                    inboxes[self._get_owner(problem, new_state)].append(
+                        (new_state, past_cost, path)
+                    )
+
+            if self.verbose >= 2:
+                print(
+                    f"Round {self.num_rounds}: explored {self.num_states_explored}, "
+                    f"cheapest open state {min_open_cost}, incumbent {self.path_cost}"
+                )
+
+            in_flight = any(inbox for inbox in inboxes)
+            if not in_flight and (
+                min_open_cost == float("inf")
+                or (self.path_cost is not None and min_open_cost >= self.path_cost)
+            ):
+                break
+
+        if self.verbose >= 1:
+            if self.path_cost is None:
+                print("Searched the entire search space!")
+            print(f"num_rounds = {self.num_rounds}")
+            print(f"num_states_explored = {self.num_states_explored}")
+            print(
+                f"num_states_explored_per_worker = {self.num_states_explored_per_worker}"
+            )
+            print(f"num_states_pruned = {self.num_states_pruned}")
+            if self.path_cost is not None:
+                print(f"path_cost = {self.path_cost}")
+                print(f"actions = {self.actions}")
+
+
+def _hash_distributed_worker(
+    problem: FindCourses,
+    connection,
+    expansions_per_round: int,
+    prune_dominated: bool,
+) -> None:
+    """
+    Worker loop of HashDistributedSearch. Each round, add the states routed to this worker
+    to its open list, expand up to `expansions_per_round` of the cheapest ones, and reply
+    with (successors, solutions found, cheapest remaining open cost, counters).
+    """
+    open_heap: List = []
+    closed: Dict[Tuple, float] = {}  # Map state key -> lowest past cost seen
+    counter = 0
+
+    def get_key(state: State) -> Tuple:
+        if prune_dominated:
+            return problem.dominance_key(state)
+        return problem.state_key(state)
+
+    try:
+        while True:
+            message = connection.recv()
+            if message[0] == "stop":
+                return
+            _, inbox, incumbent = message
+
+            num_explored = 0
+            num_pruned = 0
+            for state, past_cost, path in inbox:
+                key = get_key(state)
+                if closed.get(key, float("inf")) <= past_cost:
+                    num_pruned += 1
+                    continue
+                closed[key] = past_cost
+                heapq.heappush(open_heap, (past_cost, counter, state, path))
+                counter += 1
+
+            outgoing = []
+            goals = []
+            while open_heap and num_explored < expansions_per_round:
+                past_cost, _, state, path = heapq.heappop(open_heap)
+                if closed[get_key(state)] < past_cost:
+                    # A cheaper state with the same key was queued after this one
+                    num_pruned += 1
+                    continue
+                if past_cost >= incumbent:
+                    # Can't improve on the solution found so far
+                    continue
+
+                num_explored += 1
+                if problem.is_end(state):
+                    goals.append((past_cost, path))
+                    incumbent = past_cost
+                    continue
+
+                for action, new_state, cost in problem.successors_and_cost(state):
+                    outgoing.append((new_state, past_cost + cost, path + [action]))
+
+            open_cost = open_heap[0][0] if open_heap else float("inf")
+            connection.send(
+                ("expanded", outgoing, goals, open_cost, num_explored, num_pruned)
+            )
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+
+
 class PriorityQueue:
-    def __init__(self):
-        self.DONE = -100000
-        self.heap = []
-        self.priorities = {}  # Map from state to priority
+    def __init__(
+        self, compaction_threshold: float = 0.5, min_compaction_size: int = 1024
+    ):
+        """
+        States are queued and closed under a key, see update, so a state that is reached
+        again as a new object updates the entry of the first one.
+
+        @param compaction_threshold: rebuild the heap without its stale entries once they
+            make up more than this fraction of it.
+        @param min_compaction_size: don't compact heaps smaller than this.
+        """
+        self.heap: List[Tuple[float, int, Hashable, State]] = []
+        self.priorities: Dict[Hashable, float] = {}  # Map from queued key to priority
+        self.closed: Set[Hashable] = set()  # Keys that were removed with remove_min
 
         # heapq will compare the second elements in the tuple if there is a tie in the
         # first element; to prevent this, we will maintain a counter so that if there
         # are ties, the element inserted first is prioritized
         self.counter = 0
 
-    # Insert `state` into the heap with priority `new_priority` if `state` isn't in
-    # the heap or `new_priority` is smaller than the existing priority.
+        self.compaction_threshold = compaction_threshold
+        self.min_compaction_size = min_compaction_size
+
+        # Statistics
+        self.num_pushes = 0
+        self.num_stale_pops = 0
+        self.num_compactions = 0
+        self.peak_size = 0
+
+    # Insert `state` into the heap with priority `new_priority` if its key isn't in
+    # the heap or `new_priority` is smaller than the existing priority. The key
+    # defaults to the state itself, eg FindCourses.state_key for search states.
     #   > Return whether the priority queue was updated.
-    def update(self, state: State, new_priority: float) -> bool:
-        old_priority = self.priorities.get(state)
+    def update(
+        self, state: State, new_priority: float, key: Optional[Hashable] = None
+    ) -> bool:
+        if key is None:
+            key = state
+        if key in self.closed:
+            return False
+        old_priority = self.priorities.get(key)
         if old_priority is None or new_priority < old_priority:
-            self.priorities[state] = new_priority
-            heapq.heappush(self.heap, (new_priority, self.counter, state))
+            self.priorities[key] = new_priority
+            heapq.heappush(self.heap, (new_priority, self.counter, key, state))
             self.counter += 1
+            self.num_pushes += 1
+            self.peak_size = max(self.peak_size, len(self.heap))
+            self._maybe_compact()
             return True
         return False
 
     # Returns (state with minimum priority, priority) or (None, None) if empty.
     def remove_min(self):
         while len(self.heap) > 0:
-            priority, _, state = heapq.heappop(self.heap)
-            if self.priorities[state] == self.DONE:
+            priority, _, key, state = heapq.heappop(self.heap)
+            if self.priorities.get(key) != priority:
                 # Outdated priority, skip
+                self.num_stale_pops += 1
                 continue
-            self.priorities[state] = self.DONE
+            del self.priorities[key]
+            self.closed.add(key)
             return state, priority
 
         # Nothing left...
         return None, None
+
+    def stale_ratio(self) -> float:
+        """
+        Fraction of the heap entries that are outdated (every queued key has exactly one
+        live entry).
+        """
+        if not self.heap:
+            return 0.0
+        return 1 - len(self.priorities) / len(self.heap)
+
+    def _maybe_compact(self) -> None:
+        """
+        Drop the outdated entries from the heap once they pass the compaction threshold.
+        """
+        if (
+            len(self.heap) < self.min_compaction_size
+            or self.stale_ratio() <= self.compaction_threshold
+        ):
+            return
+
+        self.heap = [
+            entry for entry in self.heap if self.priorities.get(entry[2]) == entry[0]
+        ]
+        heapq.heapify(self.heap)
+        self.num_compactions += 1
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .io_util import atomic_write
+
+# Bump when the cached values or the solvers change, so old entries are never returned
+SOLUTION_CACHE_VERSION = 1
+
+
+def solution_cache_key(**fields) -> str:
+    """
+    Returns a canonical hash of the JSON fields a solution depends on, eg the catalog fingerprint, the
+    requirements, the profile and the solver options. Sets should be given sorted.
+    """
+    fields["version"] = SOLUTION_CACHE_VERSION
+    encoded = json.dumps(fields, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class SolutionCache:
+    """
+    Results of solves, keyed by solution_cache_key. The most recently used max_entries results are
+    kept in memory. With a directory, every result is also written to <directory>/<key>.pkl, so it
+    outlives the process and is shared by processes using the same directory, and the least recently
+    used files are removed once there are more than max_disk_entries.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: int = 128,
+        max_disk_entries: int = 10000,
+    ) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()
+
+        self.hits = 0
+        # The hits that were read from the directory, included in hits
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _remember(self, key: str, value: Any) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached result, or None on a miss.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as file:
+                    value = pickle.load(file)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                # Mark the file as recently used for eviction
+                os.utime(path)
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Cache a result, which must not be None.
+        """
+        self._remember(key, value)
+        if self.directory is not None:
+            atomic_write(
+                self._path(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            )
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used files until at most max_disk_entries are left.
+        """
+        assert self.directory is not None
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+
+        num_evicted = len(entries) - self.max_disk_entries
+        for _, path in sorted(entries)[: max(num_evicted, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+def search_cache_key(problem, search_options: Dict[str, Any]) -> str:
+    """
+    Key of the solution of a FindCourses problem: its class, catalog, program requirements and
+    parameters, and the search algorithm and its options.
+    """
+    return solution_cache_key(
+        problem=type(problem).__name__,
+        catalog=problem.catalog.fingerprint(),
+        requirements=problem.df_requirements.astype(str).values.tolist(),
+        units_requirement=problem.units_requirement,
+        max_quarter=problem.max_quarter,
+        max_successors=problem.max_successors,
+        internship=problem.internship,
+        search=search_options,
+    )
+
+
+def solve_search(
+    search, problem, cache: SolutionCache, search_options: Dict[str, Any]
+) -> bool:
+    """
+    Run search.solve(problem), eg a UniformCostSearch, unless the solution is cached, in which case only
+    search.actions and search.path_cost are set.
+
+    Arguments:
+    search - the search algorithm
+    problem - the FindCourses problem
+    cache - the solutions
+    search_options - everything about the search that changes the solution, eg the algorithm name
+
+    Returns:
+    cached - whether the solution came from the cache
+    """
+    key = search_cache_key(problem, search_options)
+    cached = cache.get(key)
+    if cached is not None:
+        # The courses are cached by id and mapped back to the Course objects of the problem
+        courses = {
+            course.course_id: course
+            for course_list in problem.explore_course.class_database.values()
+            for course in course_list
+        }
+        search.actions = (
+            None
+            if cached["actions"] is None
+            else [
+                [(courses[course_id], units) for course_id, units in quarter]
+                for quarter in cached["actions"]
+            ]
+        )
+        search.path_cost = cached["path_cost"]
+        return True
+
+    search.solve(problem)
+    cache.put(
+        key,
+        {
+            "actions": None
+            if search.actions is None
+            else [
+                [(course.course_id, units) for course, units in quarter]
+                for quarter in search.actions
+            ],
+            "path_cost": search.path_cost,
+        },
+    )
+    return False
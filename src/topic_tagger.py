@@ -0,0 +1,112 @@
+import re
+import numpy as np
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+from .course_catalog import CourseCatalog
+
+# Course text fields that can be searched for topic keywords, as CourseCatalog columns
+TOPIC_FIELDS = {
+    "course_name": "course_names",
+    "course_description": "course_descriptions",
+}
+
+
+class TopicTagger:
+    """
+    Tags courses with topics: a course has a topic if one of the topic's keywords appears in the
+    lowercased course field of the topic. The keywords of all the topics that search the same field are
+    compiled into a single regex, so a catalog is tagged with one scan of each field, however many
+    topics there are. The tags of a catalog are cached on the catalog.
+    """
+
+    def __init__(self, topics: Dict[str, Tuple[str, List[str]]]) -> None:
+        """
+        Args:
+            topics (Dict[str, Tuple[str, List[str]]]): topic -> (course field, keywords), eg
+                {"robotics": ("course_name", ["robot"])}. The field is one of TOPIC_FIELDS.
+        """
+        self.topics = topics
+        self.topics_by_field: Dict[str, List[str]] = {}
+        for topic, (field, keywords) in topics.items():
+            if field not in TOPIC_FIELDS:
+                raise Exception(
+                    f"Cannot tag topic {topic} on field {field}! Should be in {set(TOPIC_FIELDS)}."
+                )
+            if not keywords:
+                raise Exception(f"Topic {topic} has no keywords!")
+            self.topics_by_field.setdefault(field, []).append(topic)
+
+        # Tags are cached on the catalog under the topic definitions they were computed for
+        self.cache_key = tuple(
+            (topic, field, tuple(keywords))
+            for topic, (field, keywords) in sorted(topics.items())
+        )
+        self._patterns: Dict[FrozenSet[str], Tuple[re.Pattern, Dict[str, str]]] = {}
+
+    def _pattern(self, topics: FrozenSet[str]) -> Tuple[re.Pattern, Dict[str, str]]:
+        """
+        Returns the regex that matches a keyword of any of the topics, with one named group per topic,
+        and the topic of every group name.
+        """
+        if topics not in self._patterns:
+            groups = []
+            group_topics = {}
+            for i, topic in enumerate(sorted(topics)):
+                _, keywords = self.topics[topic]
+                alternatives = "|".join(
+                    re.escape(keyword.lower()) for keyword in keywords
+                )
+                groups.append(f"(?P<topic{i}>{alternatives})")
+                group_topics[f"topic{i}"] = topic
+            self._patterns[topics] = (re.compile("|".join(groups)), group_topics)
+        return self._patterns[topics]
+
+    def tag_text(self, text: str, topics: List[str]) -> Set[str]:
+        """
+        Returns the topics, among the given topics of one field, with a keyword in the text.
+        """
+        text = text.lower()
+        remaining = frozenset(topics)
+        tags: Set[str] = set()
+        # A match only reveals one topic, so search again for the topics that are still missing. Most
+        # texts match nothing and are scanned once.
+        while remaining:
+            pattern, group_topics = self._pattern(remaining)
+            match = pattern.search(text)
+            if match is None or match.lastgroup is None:
+                break
+            topic = group_topics[match.lastgroup]
+            tags.add(topic)
+            remaining = remaining - {topic}
+        return tags
+
+    def tag_catalog(self, catalog: CourseCatalog) -> Dict[str, np.ndarray]:
+        """
+        Returns topic -> boolean column over the catalog rows, True if the course has the topic. The
+        catalog is only tagged once for the same topics.
+        """
+        topic_tags = catalog.topic_tags.get(self.cache_key)
+        if topic_tags is not None:
+            return topic_tags
+
+        topic_tags = {
+            topic: np.zeros(len(catalog), dtype=bool) for topic in self.topics
+        }
+        for field, topics in self.topics_by_field.items():
+            for row, text in enumerate(getattr(catalog, TOPIC_FIELDS[field]).tolist()):
+                for topic in self.tag_text(str(text), topics):
+                    topic_tags[topic][row] = True
+
+        catalog.topic_tags[self.cache_key] = topic_tags
+        return topic_tags
+
+    def courses_by_topic(self, catalog: CourseCatalog) -> Dict[str, Set[str]]:
+        """
+        Returns topic -> course ids of the catalog courses with the topic, eg {"robotics": {"CS 223A"}}.
+        """
+        return {
+            topic: {
+                catalog.course(row).course_id for row in np.flatnonzero(tags).tolist()
+            }
+            for topic, tags in self.tag_catalog(catalog).items()
+        }
@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from src.courses_deterministic import CoursesDeterministic
+
+COURSE_YEARS = ["2021-2022", "2022-2023", "2023-2024"]
+DEPARTMENTS = ["CS", "EE", "CME"]
+
+
+def write_catalog_file(output_dir, year="2022-2023", dept="CS", rows=None):
+    """
+    Write a {year}_{dept}.csv file in the format produced by CoursesDeterministic.run
+    """
+    if rows is None:
+        rows = [
+            (3, 4, "221", "Artificial Intelligence", "desc", ["Autumn", "Spring"]),
+            (3, 4, "224N", "NLP", None, ["Winter"]),
+            (1, 1, "300", "Seminar", "desc", ["Autumn", "Winter", "Spring"]),
+        ]
+    course_by_dept = pd.DataFrame(
+        [
+            {
+                "units_min": units_min,
+                "units_max": units_max,
+                "course_number": course_number,
+                "course_name": course_name,
+                "course_subject": dept,
+                "course_description": course_description,
+                "quarters": quarters,
+            }
+            for units_min, units_max, course_number, course_name, course_description, quarters in rows
+        ]
+    )
+    year_dept_filepath = os.path.join(output_dir, f"{year}_{dept}.csv")
+    course_by_dept.to_csv(year_dept_filepath)
+    return year_dept_filepath
+
+
+def test_catalog_columns_cache(tmp_path, mocker):
+    """
+    Parsed catalog columns are cached on disk and reused until the csv file changes.
+    """
+    write_catalog_file(tmp_path)
+    courses_deterministic = CoursesDeterministic(
+        ["2022-2023"], output_dir=str(tmp_path)
+    )
+
+    columns = courses_deterministic.load_catalog_columns("2022-2023", "CS")
+    assert columns["course_number"].tolist() == ["221", "224N", "300"]
+    assert columns["course_description"].tolist() == ["desc", "", "desc"]
+    assert columns["quarters_mask"].tolist() == [0b101, 0b010, 0b111]
+    assert os.path.exists(
+        os.path.join(courses_deterministic.cache_dir, "2022-2023_CS.npz")
+    )
+
+    parse = mocker.spy(CoursesDeterministic, "parse_catalog_file")
+    cached = courses_deterministic.load_catalog_columns("2022-2023", "CS")
+    assert parse.call_count == 0
+    for name, values in columns.items():
+        assert cached[name].tolist() == values.tolist()
+
+    year_dept_filepath = write_catalog_file(
+        tmp_path, rows=[(3, 5, "229", "Machine Learning", "desc", ["Autumn"])]
+    )
+    os.utime(year_dept_filepath, ns=(0, 0))
+    refreshed = courses_deterministic.load_catalog_columns("2022-2023", "CS")
+    assert parse.call_count == 1
+    assert refreshed["course_number"].tolist() == ["229"]
+
+
+def test_course_to_class_database_from_columns(tmp_path):
+    """
+    Courses are grouped by the quarter indices they are offered in, across years.
+    """
+    write_catalog_file(tmp_path, year="2021-2022")
+    write_catalog_file(
+        tmp_path, year="2022-2023", rows=[(3, 4, "221", "AI", "desc", ["Winter"])]
+    )
+    courses_deterministic = CoursesDeterministic(
+        ["2021-2022", "2022-2023"], departments=["CS"], output_dir=str(tmp_path)
+    )
+    course_by_quarter = courses_deterministic.course_to_class_database()
+
+    cs221 = courses_deterministic.all_courses["221"]
+    assert sorted(cs221.quarter_indices) == [1, 3, 6]
+    assert cs221.units == (3, 4)
+    for quarter in cs221.quarter_indices:
+        assert cs221 in course_by_quarter[quarter]
+    assert courses_deterministic.all_courses["224N"].course_description == ""
+
+
+def test_requirement_index(tmp_path):
+    """
+    The requirement file is compiled once into a course -> category index. Subject-qualified
+    lookups don't collide across departments and the first entry of a course wins.
+    """
+    read_file_loc = os.path.join(tmp_path, "requirements.csv")
+    with open(read_file_loc, "w") as requirements:
+        requirements.write('"CS 103"  foundation\n')
+        requirements.write('"CS 221"  depth\n')
+        requirements.write('"CS 229"  breadth\n')
+        requirements.write('"CS 229"  depth\n')
+
+    courses_deterministic = CoursesDeterministic(
+        ["2022-2023"], read_file_loc=read_file_loc
+    )
+    assert courses_deterministic.find_course_category("103") == "foundation"
+    assert courses_deterministic.find_course_category("229") == "breadth"
+    assert courses_deterministic.find_course_category("221", "CS") == "depth"
+    assert courses_deterministic.find_course_category("221", "EE") == "elective"
+    assert courses_deterministic.find_course_category("106") == "elective"
+
+    other_loader = CoursesDeterministic(["2021-2022"], read_file_loc=read_file_loc)
+    assert other_loader.requirement_index is courses_deterministic.requirement_index
+
+
+class StubCourseConnection:
+    """
+    Stands in for the explorecourses endpoint: serves the (course number, terms) in `catalog` for every
+    department and year, after `delay` seconds, and fails the first `failures[dept]` requests for a
+    department.
+    """
+
+    def __init__(self, delay=0.0, failures=None, catalog=None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.catalog = catalog if catalog else [("221", ["Autumn"])]
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, timeout):
+        return self
+
+    def get_courses_by_department(self, dept, year=None):
+        with self.lock:
+            self.num_requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failed = self.failures.get(dept, 0) > 0
+            if failed:
+                self.failures[dept] -= 1
+        try:
+            time.sleep(self.delay)
+            if failed:
+                raise ConnectionError(f"explorecourses unavailable for {dept}")
+            return [
+                SimpleNamespace(
+                    units_min=3,
+                    units_max=4,
+                    code=code,
+                    title="AI",
+                    subject=dept,
+                    description="desc",
+                    sections=[SimpleNamespace(term=f"{year} {term}") for term in terms],
+                )
+                for code, terms in self.catalog
+            ]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_run_fetches_catalogs_concurrently(tmp_path):
+    """
+    Missing catalogs are fetched at the same time and saved for course_to_class_database.
+    """
+    connection = StubCourseConnection(delay=0.2)
+    courses_deterministic = CoursesDeterministic(
+        COURSE_YEARS,
+        departments=DEPARTMENTS,
+        output_dir=str(tmp_path),
+        connection_factory=connection,
+    )
+    course_by_quarter = courses_deterministic.run()
+
+    assert connection.num_requests == len(COURSE_YEARS) * len(DEPARTMENTS)
+    assert connection.max_in_flight > 1
+    for year in COURSE_YEARS:
+        for dept in DEPARTMENTS:
+            assert os.path.exists(os.path.join(tmp_path, f"{year}_{dept}.csv"))
+    assert sorted(course_by_quarter) == [1, 5, 9]
+
+    # Existing catalogs are not fetched again
+    courses_deterministic.run()
+    assert connection.num_requests == len(COURSE_YEARS) * len(DEPARTMENTS)
+
+
+def test_fetch_catalog_retries(tmp_path):
+    """
+    Failed fetches are retried up to max_retries times; a catalog that can't be fetched raises and
+    leaves no file behind.
+    """
+    connection = StubCourseConnection(failures={"CS": 2, "EE": 3})
+    courses_deterministic = CoursesDeterministic(
+        ["2022-2023"],
+        departments=["CS"],
+        output_dir=str(tmp_path),
+        max_retries=2,
+        retry_backoff=0,
+        connection_factory=connection,
+    )
+
+    courses_deterministic.fetch_catalog("2022-2023", "CS")
+    year_dept_filepath = os.path.join(tmp_path, "2022-2023_CS.csv")
+    assert connection.num_requests == 3
+    assert pd.read_csv(year_dept_filepath)["course_subject"].tolist() == ["CS"]
+
+    with pytest.raises(Exception):
+        courses_deterministic.fetch_catalogs([("2022-2023", "EE")])
+    assert connection.num_requests == 6
+    assert not os.path.exists(os.path.join(tmp_path, "2022-2023_EE.csv"))
+
+
+def test_run_offline(tmp_path):
+    """
+    Offline, existing catalogs are loaded without creating a connection and missing catalogs raise.
+    """
+
+    def connection_factory(timeout):
+        raise AssertionError("Connected to explorecourses while offline")
+
+    write_catalog_file(tmp_path)
+    courses_deterministic = CoursesDeterministic(
+        ["2022-2023"],
+        departments=["CS"],
+        output_dir=str(tmp_path),
+        connection_factory=connection_factory,
+        offline=True,
+    )
+    assert courses_deterministic.run()
+
+    courses_deterministic.years = ["2022-2023", "2023-2024"]
+    with pytest.raises(FileNotFoundError):
+        courses_deterministic.run()
+
+
+def test_refresh_stale_catalogs(tmp_path):
+    """
+    Catalogs older than max_catalog_age are fetched again and the catalog manifest records which
+    courses changed. An unchanged catalog keeps its file.
+    """
+    connection = StubCourseConnection()
+    courses_deterministic = CoursesDeterministic(
+        ["2022-2023"],
+        departments=["CS"],
+        output_dir=str(tmp_path),
+        connection_factory=connection,
+        max_catalog_age=3600,
+    )
+    courses_deterministic.run()
+    manifest = courses_deterministic.read_catalog_manifest()
+    assert manifest["refreshed"] == ["2022-2023_CS"]
+    assert manifest["catalogs"]["2022-2023_CS"]["added"] == ["CS 221"]
+
+    courses_deterministic.run()
+    assert connection.num_requests == 1
+
+    connection.catalog = [("221", ["Autumn", "Winter"]), ("229", ["Spring"])]
+    courses_deterministic.max_catalog_age = 0
+    courses_deterministic.run()
+    assert connection.num_requests == 2
+    changes = courses_deterministic.read_catalog_manifest()["catalogs"]["2022-2023_CS"]
+    assert changes["added"] == ["CS 229"]
+    assert changes["removed"] == []
+    assert changes["quarters_changed"] == ["CS 221"]
+    assert sorted(courses_deterministic.all_courses["221"].quarter_indices) == [1, 2]
+
+    year_dept_filepath = os.path.join(tmp_path, "2022-2023_CS.csv")
+    modified = os.stat(year_dept_filepath).st_mtime_ns
+    changes = courses_deterministic.fetch_catalogs([("2022-2023", "CS")])
+    assert changes["2022-2023_CS"] == {
+        "added": [],
+        "removed": [],
+        "quarters_changed": [],
+        "content_changed": [],
+    }
+    assert os.stat(year_dept_filepath).st_mtime_ns == modified
@@ -0,0 +1,35 @@
+import pickle
+
+from src.course import Course
+
+
+def make_course(course_number="221", course_subject="CS", reward=1.0):
+    return Course(
+        reward, (3, 4), course_number, "AI", course_subject, "depth", "desc", (1,)
+    )
+
+
+def test_course_id():
+    """
+    The course_id is computed once and courses hash and compare by it.
+    """
+    course = make_course()
+    assert course.course_id == "CS 221"
+    assert not hasattr(course, "__dict__")
+
+    same_course = make_course(reward=2.0)
+    assert course == same_course
+    assert len({course, same_course}) == 1
+    assert course != make_course(course_subject="EE")
+    assert course.course_id is same_course.course_id
+
+
+def test_course_pickle():
+    """
+    A pickled course keeps its course_id and fields.
+    """
+    course = make_course()
+    unpickled = pickle.loads(pickle.dumps(course))
+    assert unpickled == course
+    assert unpickled.course_id == course.course_id
+    assert unpickled.quarter_indices == course.quarter_indices
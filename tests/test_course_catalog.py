@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from src.course import Course
+from src.course_catalog import CourseCatalog
+
+
+@pytest.fixture
+def catalog():
+    return CourseCatalog(
+        [1.0, 2.0, 3.0, 4.0],
+        [3, 1, 3, 3],
+        [4, 2, 5, 4],
+        ["221", "300", "224N", "106B"],
+        ["AI", "Seminar", "NLP", "Programming"],
+        ["CS", "CS", "CS", "EE"],
+        ["depth", "elective", "depth", "elective"],
+        ["search", "talks", "language", "code"],
+        [0b011, 0b001, 0b110, 0b100],
+    )
+
+
+def test_quarter_courses(catalog):
+    """
+    Every quarter lists the rows whose quarters_mask has its bit set.
+    """
+    assert catalog.quarters() == [1, 2, 3]
+    assert catalog.quarter_courses[1].tolist() == [0, 1]
+    assert catalog.quarter_courses[2].tolist() == [0, 2]
+    assert catalog.quarter_courses[3].tolist() == [2, 3]
+    assert catalog.quarter_indices(2) == (2, 3)
+
+
+def test_filter(catalog):
+    """
+    Filters can be combined and an unknown quarter or subject selects nothing.
+    """
+    assert catalog.filter(min_units=3, max_units=5, min_number=100).tolist() == [
+        0,
+        2,
+        3,
+    ]
+    assert catalog.filter(quarter=3, subjects=["EE"]).tolist() == [3]
+    assert catalog.filter(quarter=1, max_number=250).tolist() == [0]
+    assert catalog.filter(quarter=5).tolist() == []
+    assert catalog.filter(subjects=["MATH"]).tolist() == []
+
+
+def test_course_views(catalog):
+    """
+    Course objects are created once per row, from the columns of the row.
+    """
+    course = catalog.course(2)
+    assert course.course_id == "CS 224N"
+    assert course.units == (3, 5)
+    assert course.reward == 3.0
+    assert course.course_category == "depth"
+    assert course.course_description == "language"
+    assert course.quarter_indices == (2, 3)
+    assert catalog.course(2) is course
+
+    class_database = catalog.to_class_database()
+    assert [course.course_id for course in class_database[3]] == ["CS 224N", "EE 106B"]
+    assert class_database[2][1] is course
+
+
+def test_from_class_database():
+    """
+    A catalog built from a class database keeps the order of every quarter and its Course objects.
+    """
+    cs221 = Course(1.0, (3, 4), "221", "AI", "CS", "depth", "", (1, 2))
+    cs229 = Course(2.0, (3, 4), "229", "ML", "CS", "depth", "", (2,))
+    catalog = CourseCatalog.from_class_database({1: [cs221], 2: [cs229, cs221]})
+
+    assert len(catalog) == 2
+    assert catalog.quarter_courses[2].tolist() == [1, 0]
+    assert catalog.quarters_mask.tolist() == [0b11, 0b10]
+    assert catalog.course(0) is cs221
+    assert np.array_equal(catalog.rewards, [1.0, 2.0])
+    assert catalog.to_class_database() == {1: [cs221], 2: [cs229, cs221]}
+
+
+def test_fingerprint(catalog):
+    """
+    The fingerprint changes with any column and with the order of a quarter.
+    """
+    same = CourseCatalog.from_class_database(catalog.to_class_database())
+    assert same.fingerprint() == catalog.fingerprint()
+
+    renamed = catalog.to_class_database()
+    renamed[1][0] = Course(1.0, (3, 4), "221", "Renamed", "CS", "depth", "search", ())
+    assert (
+        CourseCatalog.from_class_database(renamed).fingerprint()
+        != catalog.fingerprint()
+    )
+
+    reordered = catalog.to_class_database()
+    reordered[1].reverse()
+    assert (
+        CourseCatalog.from_class_database(reordered).fingerprint()
+        != catalog.fingerprint()
+    )
@@ -0,0 +1,286 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.checkpoint import Checkpointer
+from src.course import Course
+from src.csp import BacktrackingSearch, SchedulingCSPConstructor
+from src.csp_util import CSP
+
+REQUIREMENTS = pd.DataFrame(
+    {
+        "Course": ["CS 221", "CS 229", "CS 223A", "CS 109"],
+        "Category": ["depth", "depth", "depth", "foundation"],
+        "Subcategory": ["a", "b", "b", "probability"],
+    }
+)
+
+
+def make_constructor(breadth_to_satisfy, foundations_not_satisfied, custom_requests):
+    courses = [
+        Course(1.0, (3, 4), "221", "Artificial Intelligence", "CS", "", "", ()),
+        Course(1.0, (3, 4), "229", "Machine Learning", "CS", "", "", ()),
+        Course(1.0, (3, 4), "223A", "Introduction to Robotics", "CS", "", "", ()),
+        Course(1.0, (3, 4), "109", "Probability", "CS", "", "", ()),
+    ]
+    return SchedulingCSPConstructor(
+        {1: courses},
+        REQUIREMENTS,
+        breadth_to_satisfy,
+        foundations_not_satisfied,
+        set(),
+        {"CS 223A"},
+        set(),
+        set(),
+        custom_requests,
+        seed=0,
+    )
+
+
+def csp_tables(csp):
+    return (
+        list(csp.variables),
+        csp.values,
+        csp.unaryFactors,
+        {var: list(csp.get_neighbor_vars(var)) for var in csp.variables},
+        csp.binaryFactors,
+    )
+
+
+def test_remove_variable():
+    csp = CSP()
+    csp.add_variable("A", [0, 1])
+    csp.add_variable("B", [0, 1])
+    csp.add_binary_factor("A", "B", lambda a, b: a != b)
+    csp.add_variable("C", [0, 1])
+    csp.add_unary_factor("C", lambda c: c)
+    csp.add_binary_factor("A", "C", lambda a, c: a == c)
+
+    csp.remove_variable("C")
+    assert csp.numVars == 2 and csp.variables == ["A", "B"]
+    assert "C" not in csp.values and "C" not in csp.unaryFactors
+    assert csp.get_neighbor_vars("A") == ["B"]
+
+
+def test_profile_overlay():
+    """
+    The base CSP with a profile's overlay is the CSP of the profile, and removing the overlay restores the
+    base for another profile.
+    """
+    first = make_constructor(["society", "theory"], ["probability"], {"robotics": 1})
+    second = make_constructor(["systems", "theory"], ["probability"], {"robotics": 2})
+
+    csp = first.get_base_csp()
+    base = csp_tables(first.get_base_csp())
+    overlay = first.add_profile_overlay(csp)
+    assert ("sum", "program_robotics_var", "aggregated") in overlay
+    assert csp_tables(csp) == csp_tables(first.get_csp())
+
+    first.remove_profile_overlay(csp, overlay)
+    assert csp_tables(csp) == base
+
+    second.add_profile_overlay(csp)
+    assert csp_tables(csp) == csp_tables(second.get_csp())
+    assert "Quarter 1 breadth systems classes" in csp.variables
+    assert "Quarter 1 breadth society classes" not in csp.variables
+
+
+def test_resolve():
+    """
+    Re-solving keeps the previous values that are still consistent and only searches the others.
+    """
+    csp = CSP()
+    for var in ["A", "B", "C", "D"]:
+        csp.add_variable(var, [0, 1, 2])
+    csp.add_binary_factor("A", "B", lambda a, b: a != b)
+    csp.add_binary_factor("B", "C", lambda b, c: b != c)
+    csp.add_binary_factor("A", "D", lambda a, d: a == d)
+    previous = {"A": 0, "B": 1, "C": 0, "D": 0}
+
+    # C can't keep its value, so it is repaired and the other variables keep theirs
+    csp.add_unary_factor("C", lambda c: c != 0)
+    search = BacktrackingSearch()
+    for ac3 in [False, True]:
+        search.resolve(
+            csp, previous, mcv=True, ac3=ac3, fixable_variables=["A", "B", "C"]
+        )
+        assert search.optimalAssignment == {"A": 0, "B": 1, "C": 2, "D": 0}
+        assert search.repaired_variables == ["C"]
+
+    # D can't keep its value, which makes the kept A, B and C inconsistent, so A is repaired too
+    csp.add_unary_factor("D", lambda d: d != 0)
+    for ac3 in [False, True]:
+        search.resolve(
+            csp, previous, mcv=True, ac3=ac3, fixable_variables=["A", "B", "C"]
+        )
+        assert search.optimalAssignment == {"A": 2, "B": 1, "C": 2, "D": 2}
+        assert search.repaired_variables == ["A", "C"]
+
+
+def test_resolve_frees_the_neighborhood():
+    """
+    Re-solving only frees the variables next to the conflict, and doesn't redo the search of the rest.
+    """
+    csp = CSP()
+    # A = 0 leaves 4 values for the 5 different Bs, which the search only finds out after trying them all
+    csp.add_variable("A", [0, 1])
+    bs = [f"B{i}" for i in range(5)]
+    for i, b in enumerate(bs):
+        csp.add_variable(b, list(range(5)))
+        csp.add_binary_factor("A", b, lambda a, v: a == 1 or v < 4)
+        for other in bs[:i]:
+            csp.add_binary_factor(other, b, lambda x, y: x != y)
+    # An unrelated chain of different neighbors
+    cs = [f"C{i}" for i in range(6)]
+    for i, c in enumerate(cs):
+        csp.add_variable(c, [0, 1, 2])
+        if i > 0:
+            csp.add_binary_factor(cs[i - 1], c, lambda x, y: x != y)
+    previous = {"A": 1, "B0": 4, "B1": 3, "B2": 2, "B3": 1, "B4": 0}
+    previous.update({"C0": 0, "C1": 1, "C2": 0, "C3": 1, "C4": 0, "C5": 1})
+
+    # C3 can only be 0 like its neighbors, so they are freed too
+    csp.add_unary_factor("C3", lambda c: c == 0)
+    cold = BacktrackingSearch()
+    cold.solve(csp, mcv=True, ac3=True)
+    search = BacktrackingSearch()
+    search.resolve(csp, previous, mcv=True, ac3=True)
+
+    assert search.repaired_variables == ["C2", "C3", "C4"]
+    expected = dict(previous, C2=2, C3=0, C4=2)
+    assert search.optimalAssignment == expected
+    assert search.numOperations < cold.numOperations
+
+
+def test_solve_pinned():
+    """
+    Pinned values are propagated from the root domains, which are left as they are.
+    """
+    csp = CSP()
+    for var in ["A", "B", "C"]:
+        csp.add_variable(var, [0, 1, 2])
+    csp.add_unary_factor("A", lambda a: a != 2)
+    csp.add_binary_factor("A", "B", lambda a, b: a < b)
+    csp.add_binary_factor("B", "C", lambda b, c: b != c)
+
+    search = BacktrackingSearch()
+    root_domains = search.get_root_domains(csp)
+    assert root_domains == {"A": [0, 1], "B": [1, 2], "C": [0, 1, 2]}
+
+    domains = search.solve_pinned(csp, root_domains, {"A": [1]}, mcv=True, ac3=True)
+    assert domains == {"A": [1], "B": [2], "C": [0, 1]}
+    assert search.optimalAssignment == {"A": 1, "B": 2, "C": 0}
+    assert root_domains == {"A": [0, 1], "B": [1, 2], "C": [0, 1, 2]}
+
+    domains = search.solve_pinned(csp, root_domains, {"B": [0]}, mcv=True, ac3=True)
+    assert domains["B"] == [] and not search.optimalAssignment
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingSearch(BacktrackingSearch):
+    """
+    Crashes right after saving num_saves checkpoints.
+    """
+
+    def __init__(self, num_saves):
+        super().__init__()
+        self.num_saves = num_saves
+
+    def save_checkpoint(self, numAssigned):
+        super().save_checkpoint(numAssigned)
+        if self.checkpointer.num_saves == self.num_saves:
+            raise Crash()
+
+
+@pytest.mark.parametrize("ac3", [False, True])
+@pytest.mark.parametrize("num_values", [4, 5])
+def test_checkpoint_resume(tmp_path, mocker, ac3, num_values):
+    """
+    A search resumed from its last checkpoint ends like a search that wasn't stopped, with or without a
+    solution.
+    """
+    csp = CSP()
+    for var in range(5):
+        csp.add_variable(var, list(range(num_values)))
+        for other in range(var):
+            csp.add_binary_factor(var, other, lambda a, b: a != b)
+    csp.add_binary_factor(0, 4, lambda a, b: a == b + 1)
+
+    expected = BacktrackingSearch()
+    expected.solve(csp, ac3=ac3)
+
+    mocker.patch.object(Checkpointer, "is_due", return_value=True)
+    checkpoint_path = os.path.join(tmp_path, "search.pkl")
+    with pytest.raises(Crash):
+        CrashingSearch(expected.numOperations - 2).solve(
+            csp, ac3=ac3, checkpoint_path=checkpoint_path
+        )
+
+    backtrack = mocker.spy(BacktrackingSearch, "backtrack")
+    search = BacktrackingSearch()
+    search.solve(csp, ac3=ac3, checkpoint_path=checkpoint_path)
+    assert backtrack.call_count < expected.numOperations
+    assert search.optimalAssignment == expected.optimalAssignment
+    assert search.numOperations == expected.numOperations
+    assert search.numAssignments == expected.numAssignments
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_checkpoint_key(tmp_path, mocker):
+    """
+    A checkpoint is only resumed by a search with the same checkpoint key, which tells apart CSPs with
+    the same domains but different binary factors.
+    """
+    csp = CSP()
+    for var in range(5):
+        csp.add_variable(var, list(range(4)))
+        for other in range(var):
+            csp.add_binary_factor(var, other, lambda a, b: a != b)
+
+    expected = BacktrackingSearch()
+    expected.solve(csp)
+
+    mocker.patch.object(Checkpointer, "is_due", return_value=True)
+    checkpoint_path = os.path.join(tmp_path, "search.pkl")
+    with pytest.raises(Crash):
+        CrashingSearch(expected.numOperations - 2).solve(
+            csp, checkpoint_path=checkpoint_path, checkpoint_key="a"
+        )
+
+    backtrack = mocker.spy(BacktrackingSearch, "backtrack")
+    search = BacktrackingSearch()
+    search.solve(csp, checkpoint_path=checkpoint_path, checkpoint_key="b")
+    assert backtrack.call_count == expected.numOperations
+    assert search.optimalAssignment == expected.optimalAssignment
+
+
+def test_progress():
+    """
+    Progress events estimate a growing fraction of the tree, and the last one reports the whole search.
+    """
+    csp = CSP()
+    for var in range(5):
+        csp.add_variable(var, [0, 1, 2, 3])
+        for other in range(var):
+            csp.add_binary_factor(var, other, lambda a, b: a != b)
+
+    events = []
+    search = BacktrackingSearch(events.append, progress_interval=0)
+    search.solve(csp)
+    assert not search.optimalAssignment
+
+    fractions = [event["explored_fraction"] for event in events]
+    assert fractions == sorted(fractions)
+    assert 0 < fractions[-2] < 1
+    assert events[-2]["estimated_nodes"] > events[-2]["nodes"]
+
+    last = events[-1]
+    assert last["done"] and last["remaining_fraction"] == 0
+    assert last["nodes"] == search.numOperations
+    assert sum(last["depth_histogram"]) == search.numOperations
+    assert last["depth_histogram"][:2] == [1, 4]
+    assert last["incumbent_weight"] is None
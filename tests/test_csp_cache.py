@@ -0,0 +1,127 @@
+import os
+
+import pandas as pd
+
+from src.course import Course
+from src.csp import SchedulingCSPConstructor
+from src.csp_cache import CSPCache, csp_cache_key, deserialize_csp, serialize_csp
+from src.csp_util import CSP
+
+REQUIREMENTS = pd.DataFrame(
+    {
+        "Course": ["CS 221", "CS 229", "CS 223A", "CS 109"],
+        "Category": ["depth", "depth", "depth", "foundation"],
+        "Subcategory": ["a", "b", "b", "probability"],
+    }
+)
+
+
+def make_constructor(seed=0, custom_requests=None):
+    courses = [
+        Course(1.0, (3, 4), "221", "Artificial Intelligence", "CS", "", "", ()),
+        Course(1.0, (3, 4), "229", "Machine Learning", "CS", "", "", ()),
+        Course(1.0, (3, 4), "223A", "Introduction to Robotics", "CS", "", "", ()),
+        Course(1.0, (3, 4), "109", "Probability", "CS", "", "", ()),
+    ]
+    return SchedulingCSPConstructor(
+        {1: list(courses), 2: list(courses)},
+        REQUIREMENTS,
+        ["society", "theory"],
+        ["probability"],
+        set(),
+        {"CS 223A"},
+        set(),
+        set(),
+        custom_requests if custom_requests is not None else {"robotics": 1},
+        seed=seed,
+    )
+
+
+def make_csp(weight=1.0):
+    """
+    A small CSP, with weighted factors unless weight is 1.
+    """
+    csp = CSP()
+    csp.add_variable("A", [None, ("CS 221", "CS 229"), ("CS 229", "CS 109")])
+    csp.add_variable("B", [0, 4, 8])
+    csp.add_variable("C", [0, 1])
+    csp.add_unary_factor("A", lambda classes: weight if classes else 1.0)
+    csp.add_binary_factor("A", "B", lambda classes, units: (units > 0) == bool(classes))
+    csp.add_binary_factor("C", "B", lambda taken, units: taken * 4 <= units)
+    csp.add_binary_factor("B", "C", lambda units, taken: weight)
+    return csp
+
+
+def assert_same_csp(csp, other):
+    assert other.numVars == csp.numVars
+    assert other.variables == csp.variables
+    assert other.values == csp.values
+    assert other.unaryFactors == csp.unaryFactors
+    for var in csp.variables:
+        assert other.get_neighbor_vars(var) == csp.get_neighbor_vars(var)
+        for neighbor in csp.get_neighbor_vars(var):
+            table = other.binaryFactors[var][neighbor]
+            assert {val: dict(table[val]) for val in table} == csp.binaryFactors[var][
+                neighbor
+            ]
+
+
+def test_serialize_round_trip():
+    for weight in [1.0, 0.5]:
+        csp = make_csp(weight)
+        metadata, factors = serialize_csp(csp)
+        assert factors.dtype.itemsize == (1 if weight == 1.0 else 8)
+        assert_same_csp(csp, deserialize_csp(metadata, factors))
+
+
+def test_cache_key():
+    """
+    The key only depends on the inputs of the construction, including the seed.
+    """
+    key = csp_cache_key(make_constructor())
+    assert csp_cache_key(make_constructor()) == key
+    assert csp_cache_key(make_constructor(seed=1)) != key
+    assert csp_cache_key(make_constructor(custom_requests={"robotics": 2})) != key
+
+
+def test_get_csp(tmp_path, mocker):
+    """
+    A CSP seen before is loaded instead of constructed, and is the same CSP.
+    """
+    get_csp = mocker.patch.object(
+        SchedulingCSPConstructor, "get_csp", side_effect=make_csp
+    )
+    cache = CSPCache(str(tmp_path))
+    cache.get_csp(make_constructor())
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert_same_csp(make_csp(), cache.get_csp(make_constructor()))
+    assert_same_csp(make_csp(), CSPCache(str(tmp_path)).get_csp(make_constructor()))
+    assert get_csp.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Without a seed the construction is random, so nothing is cached
+    cache.get_csp(make_constructor(seed=None))
+    assert get_csp.call_count == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict(tmp_path):
+    """
+    The least recently used entries are evicted once the cache is too large.
+    """
+    cache = CSPCache(str(tmp_path))
+    for last_used, key in enumerate(["a", "b", "c"]):
+        cache.store(key, make_csp())
+        os.utime(os.path.join(tmp_path, f"{key}.pkl"), (last_used, last_used))
+    entry_bytes = os.path.getsize(os.path.join(tmp_path, "a.pkl")) + os.path.getsize(
+        os.path.join(tmp_path, "a.npy")
+    )
+
+    # Loading "a" makes "b" the least recently used
+    assert cache.load("a") is not None
+    cache.max_bytes = 2 * entry_bytes
+    cache.evict()
+    assert cache.load("a") is not None
+    assert cache.load("b") is None
+    assert cache.load("c") is not None
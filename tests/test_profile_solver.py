@@ -0,0 +1,357 @@
+import json
+import os
+
+import pytest
+import yaml  # type: ignore[import]
+
+from src.course import Course
+from src.csp_util import CSP
+from src.profile_solver import (
+    ProfileSolver,
+    find_profiles,
+    get_result_names,
+    solve_profiles,
+)
+from src.solution_cache import SolutionCache
+
+PROFILE = """internship: True
+breadth_areas:
+  - society
+  - theory
+foundations_not_satisfied:
+  - probability
+subject_requests:
+  robotics: 1
+"""
+
+INVALID_PROFILE = """internship: True
+breadth_areas:
+  - society
+foundations_not_satisfied:
+subject_requests:
+"""
+
+
+@pytest.fixture
+def solver(mocker):
+    """
+    A ProfileSolver over a few courses, whose CSP always finds the same assignment.
+    """
+    mocker.patch("src.profile_solver.random.random", return_value=1.0)
+    mocker.patch("src.profile_solver.SchedulingCSPConstructor")
+    search = mocker.patch("src.profile_solver.BacktrackingSearch").return_value
+    search.allOptimalAssignments = [
+        {"Quarter 1 classes": ("CS 223A", "CS 229"), "Quarter 2 classes": None}
+    ]
+
+    courses = [
+        Course(1.0, (3, 4), "223A", "Introduction to Robotics", "CS", "", "", ()),
+        Course(1.0, (3, 4), "229", "Machine Learning", "CS", "", "", ()),
+        Course(1.0, (3, 4), "999", "Not a requirement", "CS", "", "", ()),
+    ]
+    return ProfileSolver({quarter: list(courses) for quarter in range(1, 9)})
+
+
+def write_profiles(directory, profiles):
+    os.makedirs(directory, exist_ok=True)
+    for name, profile in profiles.items():
+        with open(os.path.join(directory, f"{name}.yaml"), "w") as file:
+            file.write(profile)
+
+
+def test_solve(solver):
+    """
+    The CSP gets the requirement courses and topics of the profile and its assignment becomes the
+    schedule.
+    """
+    result = solver.solve(
+        {
+            "internship": True,
+            "breadth_areas": ["society", "theory"],
+            "foundations_not_satisfied": ["probability"],
+            "subject_requests": {"robotics": 1},
+        }
+    )
+    assert result["solved"]
+    assert set(result["timings"]) == {"build_csp", "solve_csp"}
+    assert result["schedule"][0] == {
+        "quarter": 1,
+        "season": "Autumn",
+        "courses": [
+            {"course": "CS 223A", "name": "Introduction to Robotics", "units": 4},
+            {"course": "CS 229", "name": "Machine Learning", "units": 4},
+        ],
+    }
+    assert result["schedule"][1]["courses"] == []
+    assert len(result["schedule"]) == 7
+
+    from src.profile_solver import SchedulingCSPConstructor
+
+    args = SchedulingCSPConstructor.call_args[0]
+    courses_by_quarter_filtered = args[0]
+    assert 4 not in courses_by_quarter_filtered and 8 not in courses_by_quarter_filtered
+    assert [course.course_id for course in courses_by_quarter_filtered[1]] == [
+        "CS 223A",
+        "CS 229",
+    ]
+    assert args[5] == {"CS 223A"}
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_solve_profiles(solver, tmp_path, num_workers):
+    """
+    Every profile gets a JSON result, and an invalid profile doesn't stop the batch.
+    """
+    profile_directory = os.path.join(tmp_path, "profiles")
+    write_profiles(
+        profile_directory, {"a": PROFILE, "b": PROFILE, "invalid": INVALID_PROFILE}
+    )
+    profile_paths = find_profiles([profile_directory])
+    assert [os.path.basename(path) for path in profile_paths] == [
+        "a.yaml",
+        "b.yaml",
+        "invalid.yaml",
+    ]
+
+    output_directory = os.path.join(tmp_path, "results")
+    results = solve_profiles(solver, profile_paths, output_directory, num_workers)
+    assert len(results) == 3
+
+    for name in ["a", "b"]:
+        with open(os.path.join(output_directory, f"{name}.json")) as file:
+            result = json.load(file)
+        assert result["solved"] and result["error"] is None
+        assert result["profile"] == os.path.join(profile_directory, f"{name}.yaml")
+        assert result["timings"]["total"] >= result["timings"]["solve_csp"]
+
+    with open(os.path.join(output_directory, "invalid.json")) as file:
+        result = json.load(file)
+    assert not result["solved"]
+    assert "Must specify 2 breadth areas" in result["error"]
+
+
+def test_result_names(solver, tmp_path):
+    """
+    Profiles with the same file name in different directories get different results, and profiles
+    whose results would overwrite each other are rejected.
+    """
+    for program in ["cs", "ee"]:
+        write_profiles(os.path.join(tmp_path, program), {"a": PROFILE})
+    profile_paths = find_profiles(
+        [os.path.join(tmp_path, "cs"), os.path.join(tmp_path, "ee")]
+    )
+    assert get_result_names(profile_paths) == ["cs/a", "ee/a"]
+
+    output_directory = os.path.join(tmp_path, "results")
+    solve_profiles(solver, profile_paths, output_directory, num_workers=1)
+    for program in ["cs", "ee"]:
+        with open(os.path.join(output_directory, program, "a.json")) as file:
+            assert json.load(file)["profile"] == os.path.join(
+                tmp_path, program, "a.yaml"
+            )
+
+    assert get_result_names([os.path.join(tmp_path, "cs", "a.yaml")]) == ["a"]
+    with pytest.raises(Exception):
+        get_result_names(["cs/a.yaml", "cs/a.yml"])
+
+
+def test_solution_cache(solver, mocker):
+    """
+    A seeded profile seen before skips the construction and the search of its CSP.
+    """
+    from src.profile_solver import SchedulingCSPConstructor
+
+    mocker.patch("src.profile_solver.csp_cache_key", return_value="csp key")
+    solver.seed = 0
+    solver.solution_cache = SolutionCache()
+    student_config = yaml.safe_load(PROFILE)
+
+    first = solver.solve(student_config)
+    second = solver.solve(student_config)
+    assert not first["cached"] and second["cached"]
+    assert second["schedule"] == first["schedule"]
+    assert SchedulingCSPConstructor.return_value.add_profile_overlay.call_count == 1
+    assert solver.solution_cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1}
+
+
+def test_shared_base_csp(solver):
+    """
+    Profiles with the same internship and foundations share a base CSP, and every overlay is removed
+    after its solve.
+    """
+    from src.profile_solver import SchedulingCSPConstructor
+
+    constructor = SchedulingCSPConstructor.return_value
+    student_config = yaml.safe_load(PROFILE)
+    solver.solve(student_config)
+    solver.solve(dict(student_config, breadth_areas=["systems", "theory"]))
+    assert constructor.get_base_csp.call_count == 1
+
+    solver.solve(dict(student_config, foundations_not_satisfied=["logic"]))
+    assert constructor.get_base_csp.call_count == 2
+    assert constructor.add_profile_overlay.call_count == 3
+    assert constructor.remove_profile_overlay.call_count == 3
+
+
+def test_previous_schedule(solver, mocker):
+    """
+    The classes of a previous schedule are the starting point of the search, and the cache is skipped.
+    """
+    from src.profile_solver import BacktrackingSearch, SchedulingCSPConstructor
+
+    csp = CSP()
+    csp.add_variable("Quarter 1 classes", [None, ("CS 229", "CS 223A")])
+    csp.add_variable("Quarter 2 classes", [None, ("CS 229", "CS 223A")])
+    SchedulingCSPConstructor.return_value.get_base_csp.return_value = csp
+    search = BacktrackingSearch.return_value
+    search.repaired_variables = ["Quarter 2 classes"]
+    mocker.patch("src.profile_solver.csp_cache_key", return_value="csp key")
+    solver.seed = 0
+    solver.solution_cache = SolutionCache()
+
+    student_config = yaml.safe_load(PROFILE)
+    previous_schedule = solver.solve(student_config)["schedule"]
+    previous_schedule[1]["courses"] = [
+        {"course": "CS 223A", "name": "Introduction to Robotics", "units": 4},
+        {"course": "CS 229", "name": "Machine Learning", "units": 4},
+        {"course": "CS 300", "name": "A seminar", "units": 1},
+    ]
+    result = solver.solve(
+        dict(student_config, subject_requests={"robotics": 2}), previous_schedule
+    )
+    assert result["solved"] and not result["cached"]
+    assert result["repaired"] == [2]
+
+    # Quarter 1 is in the other order in the domain, and the CSP has no later quarters
+    args, kwargs = search.resolve.call_args
+    assert args[1] == {
+        "Quarter 1 classes": ("CS 229", "CS 223A"),
+        "Quarter 2 classes": ("CS 229", "CS 223A"),
+    }
+    assert kwargs["fixable_variables"] == [
+        f"Quarter {quarter} classes" for quarter in [1, 2, 3, 5, 6, 7]
+    ]
+
+
+def test_pinned_quarters(solver):
+    """
+    Pinned courses restrict their quarters, the options left in every quarter are returned, and the root
+    domains of the CSP are only propagated once.
+    """
+    from src.profile_solver import BacktrackingSearch, SchedulingCSPConstructor
+
+    csp = CSP()
+    csp.add_variable("Quarter 1 classes", [None, ("CS 229", "CS 223A")])
+    csp.add_variable("Quarter 2 classes", [None, ("CS 229", "CS 223A")])
+    SchedulingCSPConstructor.return_value.get_base_csp.return_value = csp
+    search = BacktrackingSearch.return_value
+    search.solve_pinned.return_value = {
+        f"Quarter {quarter} classes": [None] for quarter in [1, 2, 3, 5, 6, 7]
+    }
+    search.solve_pinned.return_value["Quarter 1 classes"] = [("CS 229", "CS 223A")]
+
+    student_config = yaml.safe_load(PROFILE)
+    result = solver.solve(student_config, pinned_quarters={"1": ["CS 223A"], 2: []})
+    assert result["solved"]
+    assert result["options"][1] == [["CS 229", "CS 223A"]]
+    assert result["options"][2] == [[]]
+
+    args = search.solve_pinned.call_args[0]
+    assert args[2] == {
+        "Quarter 1 classes": [("CS 229", "CS 223A")],
+        "Quarter 2 classes": [None],
+    }
+
+    solver.solve(student_config, pinned_quarters={1: []})
+    assert search.get_root_domains.call_count == 1
+
+    with pytest.raises(Exception, match="Quarter 4 has no classes"):
+        solver.solve(student_config, pinned_quarters={4: ["CS 229"]})
+
+
+def test_root_domains_are_bounded(solver, mocker):
+    """
+    Only the root domains of the most recently used CSPs are kept.
+    """
+    from src.profile_solver import BacktrackingSearch, SchedulingCSPConstructor
+
+    mocker.patch("src.profile_solver.MAX_ROOT_DOMAINS", 1)
+    csp = CSP()
+    csp.add_variable("Quarter 1 classes", [None, ("CS 229", "CS 223A")])
+    SchedulingCSPConstructor.return_value.get_base_csp.return_value = csp
+    search = BacktrackingSearch.return_value
+    search.solve_pinned.return_value = {
+        f"Quarter {quarter} classes": [None] for quarter in [1, 2, 3, 5, 6, 7]
+    }
+    student_config = yaml.safe_load(PROFILE)
+    other_config = dict(student_config, breadth_areas=["systems", "theory"])
+
+    for config in [student_config, student_config, other_config, student_config]:
+        solver.solve(config, pinned_quarters={1: []})
+    assert search.get_root_domains.call_count == 3
+    assert len(solver.root_domains) == 1
+
+
+def test_solve_catalog():
+    """
+    A small catalog of real requirement courses goes through the shared base CSP and its overlays, a
+    pinned solve and a repair of the pinned schedule after the breadth areas change.
+    """
+    offered = {
+        1: ["CS 221", "CS 109"],
+        2: ["CS 223A", "CS 229"],
+        3: ["CS 224N", "CS 228"],
+        4: [],
+        5: ["CS 230", "COMM 124"],
+        6: ["CS 233", "CS 154"],
+        7: ["CS 224W", "CS 235", "CS 140", "CS 157"],
+        8: [],
+    }
+    solver = ProfileSolver(
+        {
+            quarter: [
+                Course(1.0, (3, 4), code.split()[1], code, code.split()[0], "", "", ())
+                for code in codes
+            ]
+            for quarter, codes in offered.items()
+        }
+    )
+    student_config = {
+        "internship": True,
+        "breadth_areas": ["society", "theory"],
+        "foundations_not_satisfied": ["probability"],
+        "subject_requests": {},
+    }
+
+    pinned = solver.solve(student_config, pinned_quarters={7: ["CS 157"]})
+    assert pinned["solved"]
+    assert [sorted(classes) for classes in pinned["options"][1]] == [
+        ["CS 109", "CS 221"]
+    ]
+    assert sorted(sorted(classes) for classes in pinned["options"][7]) == [
+        ["CS 140", "CS 157"],
+        ["CS 157", "CS 224W"],
+        ["CS 157", "CS 235"],
+    ]
+    schedule = pinned["schedule"]
+    assert "CS 157" in [course["course"] for course in schedule[6]["courses"]]
+
+    # Quarter 7 has to take the only systems course, and the other quarters are kept
+    schedule[6]["courses"] = [
+        {"course": "CS 157", "name": "CS 157", "units": 4},
+        {"course": "CS 235", "name": "CS 235", "units": 4},
+    ]
+    repaired = solver.solve(
+        dict(student_config, breadth_areas=["society", "systems"]), schedule
+    )
+    assert repaired["solved"]
+    assert repaired["repaired"] == [7]
+    assert repaired["schedule"][:6] == schedule[:6]
+    assert "CS 140" in [
+        course["course"] for course in repaired["schedule"][6]["courses"]
+    ]
+
+    # Both profiles share the base CSP, which the overlays are removed from
+    (base_csp,) = solver.base_csps.values()
+    assert not any("breadth" in str(var) for var in base_csp.variables)
+    assert len(solver.root_domains) == 2
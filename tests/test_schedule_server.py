@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.schedule_server import RequestCancelled, ScheduleServer, SolverPool
+
+
+class SleepySolver:
+    """
+    Stands in for a ProfileSolver: sleeps for profile["sleep"] seconds and raises for invalid profiles.
+    """
+
+    def __init__(self):
+        self.loaded = "warm state"
+
+    def solve(self, student_config, previous_schedule=None):
+        if "sleep" not in student_config:
+            raise Exception("Invalid profile!")
+        time.sleep(student_config["sleep"])
+        schedule = self.loaded if previous_schedule is None else previous_schedule
+        return {"solved": True, "schedule": schedule, "timings": {}}
+
+
+@pytest.fixture
+def pool():
+    pool = SolverPool(SleepySolver(), num_workers=2)
+    yield pool
+    pool.close()
+
+
+def test_pool_solves_concurrently(pool):
+    """
+    Requests run on separate workers that inherit the state of the solver.
+    """
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(pool.solve({"sleep": 0.5})))
+        for _ in range(2)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.perf_counter() - start < 0.9
+    assert [result["schedule"] for result in results] == ["warm state"] * 2
+    assert pool.solve({})["error"] == "Exception: Invalid profile!"
+
+
+def test_pool_timeout_and_cancel(pool):
+    """
+    A request that times out or is cancelled gives up its worker, which is replaced.
+    """
+    with pytest.raises(TimeoutError):
+        pool.solve({"sleep": 10}, timeout=0.2)
+    assert pool.num_busy() == 0
+
+    threading.Timer(0.2, pool.cancel, args=("slow",)).start()
+    with pytest.raises(RequestCancelled):
+        pool.solve({"sleep": 10}, request_id="slow")
+    assert not pool.cancel("slow")
+
+    assert pool.solve({"sleep": 0}, timeout=5)["solved"]
+
+
+@pytest.mark.parametrize("request_timeout", [5, None])
+def test_server(request_timeout):
+    """
+    The server answers schedule requests, reports timeouts, invalid profiles and invalid timeouts, and
+    its health.
+    """
+    server = ScheduleServer(
+        ("127.0.0.1", 0), SleepySolver(), request_timeout=request_timeout
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(payload):
+        request = urllib.request.Request(
+            f"{url}/schedule", data=json.dumps(payload).encode(), method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as error:
+            return error.code, json.load(error)
+
+    try:
+        status, result = post({"profile": {"sleep": 0}})
+        assert status == 200 and result["schedule"] == "warm state"
+        assert post({"profile": {}})[0] == 400
+        assert post({"profile": {"sleep": 10}, "timeout": 0.2})[0] == 504
+        assert post({"no profile": {}})[0] == 400
+        for timeout in ["soon", float("nan"), float("inf"), -5, 0, True]:
+            assert post({"profile": {"sleep": 0}, "timeout": timeout})[0] == 400
+        status, result = post({"profile": {"sleep": 0}, "previous_schedule": []})
+        assert status == 200 and result["schedule"] == []
+
+        with urllib.request.urlopen(f"{url}/health") as response:
+            assert json.load(response) == {"status": "ok", "workers": 1, "busy": 0}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,20 +1,496 @@
-# import pytest
-#
-# from ..search_problem import FindCourses
+import functools
+import os
 
+import pytest
 
-# @pytest.mark.parametrize()
-# def test_search_problem_init():  # TO BE UPDATED
-#     """
-#     [Comment to follow]
-#     """
+from src.checkpoint import Checkpointer
+from src.constants import DEPARTMENT_REQUIREMENT
+from src.course import Course, ExploreCourse
+from src.course_scheduler import State
+from src.program_requirements.cs_ai_program import CSAIProgram
+from src.search_problem import (
+    FindCourses,
+    HashDistributedSearch,
+    IterativeDeepeningSearch,
+    PriorityQueue,
+    UniformCostSearch,
+)
 
+# (subject, number, units, reward, quarters offered)
+COURSES = [
+    ("CS", "221", (3, 4), 4.5, (1, 2)),
+    ("CS", "224N", (3, 4), 3.0, (1, 2, 3)),
+    ("CS", "229", (3, 4), 4.0, (1, 3)),
+    ("CS", "231N", (3, 5), 2.5, (2, 3)),
+    ("CS", "238", (3, 4), 1.0, (1, 2)),
+    ("CS", "143", (3, 4), 3.5, (1, 2, 3)),
+    ("CS", "109", (3, 5), 1.0, (1, 2, 3)),
+]
 
-# @pytest.mark.parametrize()
-# def test_get_actions():  # TO BE UPDATED
-#     """
-#     [Comment to follow]
-#     """
+
+def build_class_database():
+    class_database = {quarter: [] for quarter in range(1, 9)}
+    for subject, number, units, reward, quarters in COURSES:
+        course = Course(
+            reward, units, number, f"{subject} {number}", subject, "depth", "", quarters
+        )
+        for quarter in quarters:
+            class_database[quarter].append(course)
+    return class_database
+
+
+@pytest.fixture
+def search_problem() -> FindCourses:
+    """
+    A pytest fixture returning a FindCourses problem over a small hand-made catalog
+    """
+    return FindCourses(
+        ExploreCourse(build_class_database(), {}),
+        DEPARTMENT_REQUIREMENT["CS"],
+        max_quarter=3,
+        max_successors=3,
+        internship=False,
+        verbose=0,
+    )
+
+
+class ShortProgram(FindCourses):
+    """
+    A FindCourses problem that ends after 16 requirement units, so the small catalog is solvable.
+    """
+
+    def is_end(self, state):
+        return state.program_object.total_requirement_units_taken >= 16
+
+
+@pytest.fixture
+def short_problem() -> ShortProgram:
+    """
+    A pytest fixture returning a solvable ShortProgram over the small catalog
+    """
+    return ShortProgram(
+        ExploreCourse(build_class_database(), {}),
+        DEPARTMENT_REQUIREMENT["CS"],
+        max_quarter=3,
+        max_successors=4,
+        internship=False,
+        verbose=0,
+    )
+
+
+def all_actions_by_cost(problem: FindCourses, state):
+    """
+    Reference enumeration: every action of the quarter, fully sorted by cost.
+    """
+    return sorted(problem._get_actions(state), key=lambda x: x[0])
+
+
+@pytest.mark.parametrize("max_successors", [1, 3, 10])
+def test_successors_are_cheapest_actions(search_problem, max_successors):
+    """
+    successors_and_cost keeps exactly the max_successors cheapest actions.
+    """
+    search_problem.max_successors = max_successors
+    state = search_problem.start_state()
+    expected = all_actions_by_cost(search_problem, state)[:max_successors]
+
+    successors = search_problem.successors_and_cost(state)
+    assert [cost for _, _, cost in successors] == [cost for cost, _ in expected]
+    assert [action for action, _, _ in successors] == [action for _, action in expected]
+
+
+def test_successor_program_is_updated(search_problem):
+    """
+    Each successor gets its own program object with the quarter's courses taken.
+    """
+    state = search_problem.start_state()
+    for action, new_state, _ in search_problem.successors_and_cost(state):
+        assert new_state.program_object is not state.program_object
+        assert new_state.current_quarter == state.current_quarter + 1
+        for course, _ in action:
+            course_code = course.course_id
+            assert course_code in new_state.program_object.courses_taken
+            assert course_code not in state.program_object.courses_taken
+
+
+def test_actions_are_unordered_pairs(search_problem):
+    """
+    A pair of courses is offered in one order only, and never paired with itself.
+    """
+    state = search_problem.start_state()
+    pairs = set()
+    for _, action in search_problem._get_actions(state):
+        course1, course2 = action[0][0], action[1][0]
+        assert course1 is not course2
+        assert (course2, course1) not in pairs
+        pairs.add((course1, course2))
+
+
+def test_pair_progress_counts_a_requirement_once(search_problem):
+    """
+    Two courses that satisfy the same single foundation area only count the first towards it, like
+    taking them in order does, so the units of the second course don't change the progress.
+    """
+    program = CSAIProgram(search_problem.df_requirements)
+    probability = [("foundation", "probability")]
+    progress = program.progress_after(
+        [("CS 109", probability, 5), ("CME 106", probability, 3)]
+    )
+    assert progress == program.progress_after(
+        [("CS 109", probability, 5), ("CME 106", probability, 5)]
+    )
+
+    program.take_course(
+        search_problem.df_requirements,
+        (Course(1.0, (3, 5), "109", "Probability", "CS", "", "", ()), 5),
+    )
+    program.take_course(
+        search_problem.df_requirements,
+        (Course(1.0, (3, 5), "106", "Probability", "CME", "", "", ()), 3),
+    )
+    assert program.foundation_units_counted == 5
+    assert program.progress_key() == progress
+
+
+def test_actions_are_scored_cheapest_first(search_problem):
+    """
+    The vectorized scores match _get_quarter_cost and come out in ascending order.
+    """
+    for quarter in range(3):
+        state = search_problem.start_state()
+        state = State(
+            quarter, state.course_taken, state.remaining_units, state.program_object
+        )
+        costs = []
+        for cost, action in search_problem._get_actions(state):
+            assert cost == search_problem._get_quarter_cost(action)
+            costs.append(cost)
+        assert costs
+        assert costs == sorted(costs)
+
+
+def test_unit_splits_are_collapsed(search_problem):
+    """
+    Unit splits of a pair that make the same requirement progress only keep the cheapest.
+    """
+    state = search_problem.start_state()
+    program = state.program_object
+    df_requirements = search_problem.df_requirements
+    progress_by_pair = {}
+    for cost, action in search_problem._get_actions(state):
+        (course1, units1), (course2, units2) = action
+        progress = program.progress_after(
+            [
+                (
+                    course.course_id,
+                    df_requirements.loc[
+                        df_requirements["Course"] == course.course_id,
+                        ["Category", "Subcategory"],
+                    ]
+                    .to_records(index=False)
+                    .tolist(),
+                    units,
+                )
+                for course, units in action
+            ]
+        )
+        key = (course1, course2, progress)
+        assert key not in progress_by_pair
+        progress_by_pair[key] = cost
+
+    # CS 231N (3-5 units) and CS 238 (3-4 units) are both depth courses offered in
+    # quarter 2: 4 + 4 and 5 + 3 units make the same progress, so only one is kept.
+    second_quarter = State(
+        1, state.course_taken, state.remaining_units, state.program_object
+    )
+    splits = [
+        [units for _, units in action]
+        for _, action in search_problem._get_actions(second_quarter)
+        if [course.course_number for course, _ in action] == ["231N", "238"]
+    ]
+    assert len(splits) == 2
+    assert [5, 4] in splits
+
+
+def test_candidate_index(search_problem):
+    """
+    The per-quarter candidate index holds every offered course with 3-5 units and its
+    requirement rows, and taken courses are excluded through the course bitset.
+    """
+    for quarter, courses in search_problem.explore_course.class_database.items():
+        candidates = search_problem.candidates_by_quarter[quarter]
+        assert [candidate.course for candidate in candidates] == courses
+        for candidate in candidates:
+            rows = search_problem.df_requirements.loc[
+                search_problem.df_requirements["Course"] == candidate.course_code
+            ]
+            assert candidate.requirement_rows == list(
+                zip(rows["Category"], rows["Subcategory"])
+            )
+
+    state = search_problem.start_state()
+    taken = {course.course_number for course in state.course_taken}
+    assert taken == {"109"}
+    for _, action in search_problem._get_actions(state):
+        assert not taken & {course.course_number for course, _ in action}
+    for _, new_state, _ in search_problem.successors_and_cost(state):
+        for course in new_state.course_taken:
+            bit = search_problem.course_number_bits[course.course_number]
+            assert new_state.course_taken_mask & bit
+
+
+def test_dominance_pruning(short_problem):
+    """
+    Dominance pruning explores fewer states and on this problem finds a schedule with the same
+    cost. It is a heuristic: in general it may drop the optimal schedule, so it is off by default.
+    """
+    exhaustive = UniformCostSearch()
+    exhaustive.solve(short_problem)
+    pruned = UniformCostSearch(prune_dominated=True)
+    pruned.solve(short_problem)
+
+    assert exhaustive.path_cost is not None
+    assert pruned.path_cost == exhaustive.path_cost
+    assert exhaustive.num_states_pruned == 0
+    assert pruned.num_states_pruned > 0
+    assert pruned.num_states_explored < exhaustive.num_states_explored
+
+
+@pytest.mark.parametrize("prune_dominated", [False, True])
+@pytest.mark.parametrize("cost_step", [0.0, 10.0, 100.0])
+def test_iterative_deepening_matches_ucs(short_problem, prune_dominated, cost_step):
+    """
+    The memory-bounded search finds a schedule with the same cost as UCS.
+    """
+    ucs = UniformCostSearch(prune_dominated=prune_dominated)
+    ucs.solve(short_problem)
+    ida = IterativeDeepeningSearch(cost_step=cost_step, prune_dominated=prune_dominated)
+    ida.solve(short_problem)
+
+    assert ida.path_cost == ucs.path_cost
+    assert len(ida.actions) == len(ucs.actions)
+    assert ida.num_iterations >= 1
+
+
+@pytest.mark.parametrize("prune_dominated", [False, True])
+def test_iterative_deepening_memory_cap(short_problem, prune_dominated):
+    """
+    The transposition table is used with or without dominance pruning and never grows past the memory
+    cap.
+    """
+    ida = IterativeDeepeningSearch(memory_cap=3, prune_dominated=prune_dominated)
+    ida.solve(short_problem)
+    assert ida.path_cost is not None
+    assert len(ida.transposition_table) == 3
+
+
+def test_iterative_deepening_no_solution(search_problem):
+    """
+    When no schedule satisfies the program, the whole search space is searched.
+    """
+    ida = IterativeDeepeningSearch()
+    ida.solve(search_problem)
+    assert ida.actions is None
+    assert ida.path_cost is None
+
+
+@pytest.mark.parametrize("prune_dominated", [False, True])
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_hash_distributed_matches_ucs(short_problem, prune_dominated, num_workers):
+    """
+    The hash-distributed search finds a schedule with the same cost as UCS.
+    """
+    ucs = UniformCostSearch(prune_dominated=prune_dominated)
+    ucs.solve(short_problem)
+    hda = HashDistributedSearch(
+        num_workers=num_workers,
+        expansions_per_round=2,
+        prune_dominated=prune_dominated,
+    )
+    hda.solve(short_problem)
+
+    assert hda.path_cost == ucs.path_cost
+    assert len(hda.actions) == len(ucs.actions)
+    assert sum(hda.num_states_explored_per_worker) == hda.num_states_explored
+
+
+def test_hash_distributed_no_solution(search_problem):
+    """
+    When no schedule satisfies the program, the whole search space is searched.
+    """
+    hda = HashDistributedSearch(num_workers=2)
+    hda.solve(search_problem)
+    assert hda.actions is None
+    assert hda.path_cost is None
+    assert hda.num_states_explored > 0
+
+
+def test_priority_queue_order_and_closed_states():
+    """
+    States come out by priority, improvements replace the queued priority, and removed
+    states are released from the priorities and never queued again.
+    """
+    queue = PriorityQueue()
+    assert queue.update("a", 3.0)
+    assert queue.update("b", 2.0)
+    assert not queue.update("a", 4.0)
+    assert queue.update("a", 1.0)
+
+    assert queue.remove_min() == ("a", 1.0)
+    assert "a" not in queue.priorities
+    assert not queue.update("a", 0.0)
+    assert queue.remove_min() == ("b", 2.0)
+    assert queue.remove_min() == (None, None)
+
+    assert queue.num_pushes == 3
+    assert queue.num_stale_pops == 1
+    assert queue.peak_size == 3
+
+
+def test_priority_queue_compaction():
+    """
+    The heap is rebuilt once stale entries pass the threshold, without changing the order.
+    """
+    queue = PriorityQueue(compaction_threshold=0.5, min_compaction_size=8)
+    for priority in range(20, 0, -1):
+        queue.update("a", float(priority))
+        queue.update("b", priority + 0.5)
+    queue.update("c", 30.0)
+
+    assert queue.num_pushes == 41
+    assert queue.num_compactions > 0
+    assert len(queue.heap) < queue.num_pushes
+    assert queue.stale_ratio() <= 0.5
+
+    assert queue.remove_min() == ("a", 1.0)
+    assert queue.remove_min() == ("b", 1.5)
+    assert queue.remove_min() == ("c", 30.0)
+    assert queue.remove_min() == (None, None)
+
+
+def test_ucs_frontier_stats(short_problem):
+    """
+    The frontier counts every push and records its peak size.
+    """
+    ucs = UniformCostSearch()
+    ucs.solve(short_problem)
+    assert ucs.frontier.num_pushes >= ucs.num_states_explored
+    assert ucs.frontier.peak_size > 0
+
+
+class ChainNode:
+    """
+    A search state without value equality, like State: a node reached again is a new object.
+    """
+
+    def __init__(self, position):
+        self.position = position
+
+
+class ChainProblem:
+    """
+    A chain of nodes where every node also has a more expensive edge to the node after the next, so
+    UCS first reaches most nodes by the expensive edge and then by a cheaper path.
+    """
+
+    def __init__(self, length):
+        self.length = length
+
+    def start_state(self):
+        return ChainNode(0)
+
+    def is_end(self, state):
+        return state.position == self.length
+
+    def successors_and_cost(self, state):
+        return [
+            (step, ChainNode(state.position + step), cost)
+            for step, cost in [(1, 1.0), (2, 10.0)]
+            if state.position + step <= self.length
+        ]
+
+    def state_key(self, state):
+        return state.position
+
+
+def test_ucs_frontier_compaction(mocker):
+    """
+    States reached again by a cheaper path update their queued entry, and the stale entries are
+    compacted away, so the frontier stays small and every state is expanded once.
+    """
+    mocker.patch(
+        "src.search_problem.PriorityQueue",
+        functools.partial(PriorityQueue, min_compaction_size=4),
+    )
+    ucs = UniformCostSearch()
+    ucs.solve(ChainProblem(50))
+
+    assert ucs.path_cost == 50
+    assert ucs.actions == [1] * 50
+    frontier = ucs.frontier
+    # Every node but the first two was queued twice, and the outdated entries were compacted away
+    # before they were popped
+    assert frontier.num_pushes == 2 * 50
+    assert frontier.num_compactions > 0
+    assert frontier.num_stale_pops == 0
+    assert frontier.peak_size <= 5
+    assert len(frontier.closed) == ucs.num_states_explored == 51
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.mark.parametrize("prune_dominated", [False, True])
+def test_ucs_checkpoint_resume(short_problem, tmp_path, mocker, prune_dominated):
+    """
+    A search resumed from its last checkpoint, by a new process with a new problem, ends like a search
+    that wasn't stopped.
+    """
+    expected = UniformCostSearch(prune_dominated=prune_dominated)
+    expected.solve(short_problem)
+
+    save = Checkpointer.save
+
+    def save_and_crash(checkpointer, state):
+        save(checkpointer, state)
+        if checkpointer.num_saves == expected.num_states_explored // 2:
+            raise Crash()
+
+    mocker.patch.object(Checkpointer, "is_due", return_value=True)
+    crashing_save = mocker.patch.object(Checkpointer, "save", save_and_crash)
+    checkpoint_path = os.path.join(tmp_path, "search.pkl")
+    with pytest.raises(Crash):
+        UniformCostSearch(
+            prune_dominated=prune_dominated, checkpoint_path=checkpoint_path
+        ).solve(short_problem)
+    mocker.stop(crashing_save)
+
+    problem = ShortProgram(
+        ExploreCourse(build_class_database(), {}),
+        DEPARTMENT_REQUIREMENT["CS"],
+        max_quarter=3,
+        max_successors=4,
+        internship=False,
+        verbose=0,
+    )
+    successors_and_cost = mocker.spy(problem, "successors_and_cost")
+    ucs = UniformCostSearch(
+        prune_dominated=prune_dominated, checkpoint_path=checkpoint_path
+    )
+    ucs.solve(problem)
+
+    assert successors_and_cost.call_count < expected.num_states_explored
+    assert ucs.num_states_explored == expected.num_states_explored
+    assert ucs.path_cost == expected.path_cost
+    assert [
+        [(course.course_id, units) for course, units in action]
+        for action in ucs.actions
+    ] == [
+        [(course.course_id, units) for course, units in action]
+        for action in expected.actions
+    ]
+    assert not os.path.exists(checkpoint_path)
 
 
 # Need to create scenarios by hand and check our program runs them. All kinds of edge cases.
@@ -0,0 +1,95 @@
+import os
+
+from src.constants import DEPARTMENT_REQUIREMENT
+from src.course import ExploreCourse
+from src.search_problem import UniformCostSearch
+from src.solution_cache import SolutionCache, solution_cache_key, solve_search
+from tests.test_search_problem import ShortProgram, build_class_database
+
+
+def make_problem():
+    return ShortProgram(
+        ExploreCourse(build_class_database(), {}),
+        DEPARTMENT_REQUIREMENT["CS"],
+        max_quarter=3,
+        max_successors=4,
+        internship=False,
+        verbose=0,
+    )
+
+
+def test_solution_cache_key():
+    """
+    The key doesn't depend on the order of the fields.
+    """
+    key = solution_cache_key(profile={"a": 1, "b": [2]}, options={"mcv": True})
+    assert solution_cache_key(options={"mcv": True}, profile={"b": [2], "a": 1}) == key
+    assert solution_cache_key(profile={"a": 1, "b": [2]}, options={"mcv": False}) != key
+
+
+def test_lru():
+    """
+    Only the most recently used entries are kept in memory.
+    """
+    cache = SolutionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1}
+
+
+def test_disk_tier(tmp_path):
+    """
+    Results are shared through the directory, which keeps the most recently used max_disk_entries.
+    """
+    cache = SolutionCache(str(tmp_path), max_disk_entries=2)
+    for last_used, key in enumerate(["a", "b"]):
+        cache.put(key, {"assignment": key})
+        os.utime(tmp_path / f"{key}.pkl", (last_used, last_used))
+
+    other = SolutionCache(str(tmp_path), max_disk_entries=2)
+    assert other.get("a") == {"assignment": "a"}
+    assert other.get("a") == {"assignment": "a"}
+    assert other.stats() == {"hits": 2, "disk_hits": 1, "misses": 0}
+
+    other.put("c", {"assignment": "c"})
+    assert SolutionCache(str(tmp_path)).get("b") is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.pkl", "c.pkl"]
+
+
+def test_solve_search(tmp_path, mocker):
+    """
+    An unchanged problem gets the cached solution, with the Course objects of the problem.
+    """
+    cache = SolutionCache(str(tmp_path))
+    ucs = UniformCostSearch()
+    assert not solve_search(ucs, make_problem(), cache, {"algorithm": "ucs"})
+
+    problem = make_problem()
+    cached_ucs = UniformCostSearch()
+    solve = mocker.spy(cached_ucs, "solve")
+    assert solve_search(
+        cached_ucs, problem, SolutionCache(str(tmp_path)), {"algorithm": "ucs"}
+    )
+    assert solve.call_count == 0
+    assert cached_ucs.path_cost == ucs.path_cost
+    assert cached_ucs.actions == ucs.actions
+    courses = {
+        id(course)
+        for courses in problem.explore_course.class_database.values()
+        for course in courses
+    }
+    assert all(
+        id(course) in courses for quarter in cached_ucs.actions for course, _ in quarter
+    )
+
+    # Other search options or a longer program are other problems
+    assert not solve_search(
+        UniformCostSearch(), make_problem(), cache, {"algorithm": "ida"}
+    )
+    problem.max_quarter = 4
+    assert not solve_search(UniformCostSearch(), problem, cache, {"algorithm": "ucs"})
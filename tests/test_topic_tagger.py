@@ -0,0 +1,67 @@
+import pytest
+
+from src.constants import COURSE_TOPICS
+from src.course_catalog import CourseCatalog
+from src.topic_tagger import TopicTagger
+
+
+@pytest.fixture
+def catalog():
+    return CourseCatalog(
+        [0.0, 0.0, 0.0, 0.0],
+        [3, 3, 3, 3],
+        [4, 4, 4, 4],
+        ["223A", "231N", "224N", "273A"],
+        [
+            "Introduction to Robotics",
+            "Convolutional Neural Networks for Visual Recognition",
+            "Natural Language Processing with Deep Learning",
+            "Robotics for Health: Computer Vision in Biomedicine",
+        ],
+        ["CS", "CS", "CS", "CS"],
+        ["depth", "depth", "depth", "depth"],
+        [
+            "Robot kinematics.",
+            "Deep learning for computer vision.",
+            "Methods for natural language understanding.",
+            "",
+        ],
+        [1, 1, 1, 1],
+    )
+
+
+def test_courses_by_topic(catalog):
+    """
+    A course is tagged with every topic that has a keyword in its field, including several topics
+    from the same text.
+    """
+    courses_by_topic = TopicTagger(COURSE_TOPICS).courses_by_topic(catalog)
+    assert courses_by_topic == {
+        "nlp": {"CS 224N"},
+        "robotics": {"CS 223A", "CS 273A"},
+        "vision": {"CS 231N", "CS 273A"},
+        "health": {"CS 273A"},
+    }
+
+
+def test_tags_cached_on_catalog(catalog, mocker):
+    """
+    A catalog is only tagged once for the same topics.
+    """
+    tagger = TopicTagger(COURSE_TOPICS)
+    tag_text = mocker.spy(tagger, "tag_text")
+    topic_tags = tagger.tag_catalog(catalog)
+    assert tag_text.call_count == 2 * len(catalog)
+
+    assert TopicTagger(dict(COURSE_TOPICS)).tag_catalog(catalog) is topic_tags
+    assert tagger.tag_catalog(catalog) is topic_tags
+    assert tag_text.call_count == 2 * len(catalog)
+
+    other_topics = {"robotics": ("course_description", ["robot"])}
+    other_tags = TopicTagger(other_topics).tag_catalog(catalog)
+    assert other_tags["robotics"].tolist() == [True, False, False, False]
+
+
+def test_invalid_topic():
+    with pytest.raises(Exception):
+        TopicTagger({"robotics": ("course_subject", ["robot"])})